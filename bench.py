@@ -0,0 +1,712 @@
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+
+# -------------------- 基准注册 --------------------
+BENCHMARKS = {}
+
+def benchmark(name):
+    """注册一个基准测试函数（返回结果dict）"""
+    def deco(func):
+        BENCHMARKS[name] = func
+        return func
+    return deco
+
+def percentiles(samples, ps=(50, 99)):
+    """计算样本分位数（样本为空时返回0）"""
+    if not samples:
+        return {f"p{p}": 0.0 for p in ps}
+    s = sorted(samples)
+    return {f"p{p}": s[min(len(s) - 1, int(len(s) * p / 100))] for p in ps}
+
+def open_pty_pair(**kwargs):
+    """创建pty对：返回(主端fd, 从端pyserial对象)，用于无硬件的回环测试"""
+    import serial
+    master, slave = os.openpty()
+    ser = serial.Serial(os.ttyname(slave), timeout=kwargs.pop("timeout", 0.1), **kwargs)
+    os.close(slave)
+    return master, ser
+
+# -------------------- 读取延迟 --------------------
+def _legacy_poll(ser, alive):
+    """旧版接收循环：轮询in_waiting + sleep(10ms)"""
+    while alive() and ser.is_open:
+        if ser.in_waiting > 0:
+            yield ser.read(ser.in_waiting)
+        time.sleep(0.01)
+
+def _measure_reader(make_iter, samples, idle):
+    """测量字节写入主端到回调的延迟，以及空闲期间读线程CPU占用"""
+    master, ser = open_pty_pair()
+    got = threading.Event()
+    state = {"t": 0.0, "running": True}
+
+    def reader():
+        for _ in make_iter(ser, lambda: state["running"]):
+            state["t"] = time.perf_counter()
+            got.set()
+
+    th = threading.Thread(target=reader, daemon=True)
+    th.start()
+    lat = []
+    try:
+        for _ in range(samples):
+            # 随机间隔，避免与轮询周期同相
+            time.sleep(random.uniform(0.002, 0.006))
+            got.clear()
+            t0 = time.perf_counter()
+            os.write(master, b"x")
+            if got.wait(1.0):
+                lat.append((state["t"] - t0) * 1000)
+        cpu_before_idle = time.process_time()
+        time.sleep(idle)
+        idle_cpu = time.process_time() - cpu_before_idle
+    finally:
+        state["running"] = False
+        th.join(1.0)
+        ser.close()
+        os.close(master)
+    res = {"samples": len(lat), "mean_ms": sum(lat) / len(lat) if lat else 0.0,
+           "max_ms": max(lat) if lat else 0.0, "idle_cpu_pct": idle_cpu / idle * 100}
+    res.update({k + "_ms": v for k, v in percentiles(lat).items()})
+    return res
+
+@benchmark("reader_latency")
+def bench_reader_latency(samples=300, idle=1.0):
+    """pty回环：旧轮询读取 vs 事件驱动读取 的到达->回调延迟"""
+    from serial_io import iter_bursts
+    return {
+        "poll_10ms": _measure_reader(_legacy_poll, samples, idle),
+        "event_driven": _measure_reader(iter_bursts, samples, idle),
+    }
+
+# -------------------- DX帧解析 --------------------
+def make_rx_frame(cmd, x, z, grip):
+    """构造一帧下位机上报格式的DX帧（含LEN字段）"""
+    import struct
+    body = bytes([cmd, 9]) + struct.pack('<ff', x, z) + bytes([grip])
+    return b"DX" + body + bytes([sum(body) & 0xFF]) + b"XD"
+
+def make_capture(size, noise=0.05, seed=1):
+    """生成约size字节的抓包数据：混入随机噪声、伪协议头与损坏帧"""
+    rnd = random.Random(seed)
+    out = bytearray()
+    while len(out) < size:
+        f = bytearray(make_rx_frame(1, rnd.uniform(0, 1000), rnd.uniform(0, 500), rnd.randint(0, 1)))
+        r = rnd.random()
+        if r < noise:
+            out += bytes(rnd.getrandbits(8) for _ in range(rnd.randint(1, 12)))
+        elif r < noise * 1.5:
+            out += b"DX"          # 孤立的伪协议头
+        elif r < noise * 2:
+            f[-3] ^= 0xFF         # 校验和损坏
+        out += f
+    return bytes(out)
+
+def _legacy_parse(buffer, data, out):
+    """旧版切片式解析状态机（去掉打印），用于对比"""
+    buffer.extend(data)
+    while len(buffer) >= 2:
+        header_pos = buffer.find(b"DX")
+        if header_pos == -1:
+            if len(buffer) > 100:
+                buffer.clear()
+            break
+        if header_pos > 0:
+            buffer = buffer[header_pos:]
+        if len(buffer) < 7:
+            break
+        total_len = 7 + buffer[3]
+        if len(buffer) < total_len:
+            break
+        frame = bytes(buffer[:total_len])
+        buffer = buffer[total_len:]
+        if frame[-2:] != b"XD" or (sum(frame[2:-3]) & 0xFF) != frame[-3]:
+            continue
+        out.append(frame)
+    return buffer
+
+def _run_parser(feed, capture, burst):
+    """按burst大小分块喂入，返回帧数/耗时"""
+    t0 = time.perf_counter()
+    n = 0
+    for i in range(0, len(capture), burst):
+        n += feed(capture[i:i + burst])
+    dt = time.perf_counter() - t0
+    return {"frames": n, "frames_per_s": n / dt, "mb_per_s": len(capture) / dt / 1e6}
+
+@benchmark("dx_parser")
+def bench_dx_parser(size=4 * 1024 * 1024, bursts=(4096, 262144)):
+    """MB级带噪声抓包：旧切片解析 vs 偏移解析 的帧/秒"""
+    from py_serial import FrameParser
+    capture = make_capture(size)
+    res = {"capture_bytes": len(capture)}
+    for burst in bursts:
+        legacy = {"buf": bytearray()}
+
+        def feed_legacy(data):
+            out = []
+            legacy["buf"] = _legacy_parse(legacy["buf"], data, out)
+            return len(out)
+
+        parser = FrameParser()
+        res[f"legacy_burst_{burst}"] = _run_parser(feed_legacy, capture, burst)
+        res[f"offset_burst_{burst}"] = _run_parser(lambda d: len(parser.feed(d)), capture, burst)
+    return res
+
+# -------------------- 数据打包 --------------------
+def _legacy_build_packet(cmd, x, z, grip):
+    """旧版逐段拼接的build_packet，用于对比"""
+    import struct
+    from py_serial import HEADER, FOOTER, calculate_checksum
+    data = bytes([cmd]) + struct.pack('f', x) + struct.pack('f', z) + bytes([grip])
+    return HEADER + data + bytes([calculate_checksum(cmd, *data[1:])]) + FOOTER
+
+@benchmark("packet_build")
+def bench_packet_build(points=50000):
+    """轨迹编码：旧build_packet vs PacketEncoder.build / build_many 的包/秒"""
+    import protocol
+    import py_serial
+    rnd = random.Random(2)
+    traj = [(rnd.uniform(0, 1000), rnd.uniform(0, 500), rnd.randint(0, 1)) for _ in range(points)]
+    enc = py_serial.PacketEncoder()
+    res = {"points": points}
+
+    t0 = time.perf_counter()
+    legacy = b"".join(_legacy_build_packet(1, x, z, g) for x, z, g in traj)
+    res["legacy_pkts_per_s"] = points / (time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    single = b"".join(enc.build(1, x, z, g) for x, z, g in traj)
+    res["build_pkts_per_s"] = points / (time.perf_counter() - t0)
+
+    res["build_many_numpy"] = protocol.load_numpy() is not None  # 先导入，不计入编码耗时
+    t0 = time.perf_counter()
+    many = enc.build_many(traj, cmd=1)
+    res["build_many_pkts_per_s"] = points / (time.perf_counter() - t0)
+    res["identical"] = legacy == single == bytes(many)
+    return res
+
+# -------------------- 自动发送抖动 --------------------
+def _interval_errors(stamps, interval):
+    """相邻触发间隔与名义间隔之差(ms)"""
+    return [abs((b - a) - interval) * 1000 for a, b in zip(stamps, stamps[1:])]
+
+def _summarize(all_stamps, interval):
+    """汇总：实际/名义速率比与间隔误差分布"""
+    errs = [e for st in all_stamps for e in _interval_errors(st, interval)]
+    ratios = [(len(st) - 1) * interval / (st[-1] - st[0]) for st in all_stamps if len(st) > 1]
+    res = {"rate_ratio": sum(ratios) / len(ratios) if ratios else 0.0,
+           "mean_err_ms": sum(errs) / len(errs) if errs else 0.0,
+           "max_err_ms": max(errs) if errs else 0.0}
+    res.update({k + "_err_ms": v for k, v in percentiles(errs).items()})
+    return res
+
+def _run_threads(n, interval, duration):
+    """旧方式：每个组件一个线程 send() + sleep(interval)"""
+    stamps = [[] for _ in range(n)]
+    stop = threading.Event()
+
+    def worker(st):
+        while not stop.is_set():
+            st.append(time.perf_counter())
+            time.sleep(interval)
+
+    ths = [threading.Thread(target=worker, args=(st,), daemon=True) for st in stamps]
+    for th in ths:
+        th.start()
+    time.sleep(duration)
+    stop.set()
+    for th in ths:
+        th.join()
+    return _summarize(stamps, interval)
+
+def _run_scheduler(n, interval, duration):
+    """集中调度器：所有组件共用一个线程"""
+    from scheduler import Scheduler, PeriodicTask
+    stamps = [[] for _ in range(n)]
+    writes = []
+    sched = Scheduler(sink=writes.append)
+    tasks = []
+    for st in stamps:
+        tasks.append(sched.add(PeriodicTask(interval, lambda st=st: st.append(time.perf_counter()) or b"x")))
+    time.sleep(duration)
+    for t in tasks:
+        sched.cancel(t)
+    sched.stop()
+    res = _summarize(stamps, interval)
+    res["sends_per_write"] = sum(len(w) for w in writes) / len(writes) if writes else 0.0
+    return res
+
+@benchmark("autosend_jitter")
+def bench_autosend_jitter(components=50, intervals=(0.001, 0.01, 0.1), duration=2.0):
+    """多组件同时自动发送：线程+sleep vs 集中调度器 的间隔抖动与实际速率"""
+    res = {"components": components}
+    for itv in intervals:
+        res[f"{itv * 1000:g}ms"] = {
+            "threads": _run_threads(components, itv, duration),
+            "scheduler": _run_scheduler(components, itv, duration),
+        }
+    return res
+
+# -------------------- HEX渲染 --------------------
+@benchmark("hex_format")
+def bench_hex_format(size=8 * 1024 * 1024, chunk=4096):
+    """多MB缓冲区：旧hexlify+replace vs bytes.hex 以及十六进制转储的MB/s"""
+    import binascii
+    from recv_pipeline import to_hex, HexDumper
+    data = random.Random(3).randbytes(size)
+    chunks = [data[i:i + chunk] for i in range(0, size, chunk)]
+
+    def run(func):
+        t0 = time.perf_counter()
+        for c in chunks:
+            func(c)
+        return size / (time.perf_counter() - t0) / 1e6
+
+    dumper = HexDumper()
+    return {
+        "bytes": size,
+        "chunk": chunk,
+        "legacy_hexlify_mb_per_s": run(lambda b: binascii.hexlify(b).upper().decode().replace("", " ").strip()),
+        "to_hex_mb_per_s": run(to_hex),
+        "hexdump_mb_per_s": run(dumper.format),
+    }
+
+@benchmark("checksum")
+def bench_checksum(size=1024 * 1024, chunk=4096, baud=3000000):
+    """各校验算法分块增量计算的MB/s，及3Mbaud满速收发时校验所占CPU比例"""
+    import checksum
+    data = random.Random(4).randbytes(size)
+    chunks = [data[i:i + chunk] for i in range(0, size, chunk)]
+    line_rate = baud / 10  # 8N1每字节10位
+    res = {"bytes": size, "chunk": chunk, "line_bytes_per_s": line_rate}
+    for name, algo in checksum.ALGORITHMS.items():
+        if not algo.size:
+            continue
+        running = algo.new()
+        t0 = time.perf_counter()
+        for c in chunks:
+            running.update(c)
+        dt = time.perf_counter() - t0
+        assert running.value == algo.compute(data)
+        res[name] = {"mb_per_s": size / dt / 1e6, "cpu_share_at_line_rate": line_rate * dt / size}
+    return res
+
+@benchmark("capture")
+def bench_capture(chunks=200000, chunk=64, seeks=1000):
+    """抓包录制：读线程侧每块记录耗时、mmap顺序回放速率与随机定位耗时"""
+    import tempfile
+    import capture
+    data = random.Random(5).randbytes(chunk)
+    path = os.path.join(tempfile.mkdtemp(), "bench.cap")
+    w = capture.CaptureWriter(path)
+    t0 = time.perf_counter()
+    for i in range(chunks):
+        w.record(capture.RX, "bench", data)
+    record_s = time.perf_counter() - t0
+    w.close()
+    size = os.path.getsize(path)
+    with capture.CaptureReader(path) as r:
+        t0 = time.perf_counter()
+        n = sum(1 for _ in r)
+        scan_s = time.perf_counter() - t0
+        rnd = random.Random(6)
+        t0 = time.perf_counter()
+        for _ in range(seeks):
+            next(r.records(start=rnd.uniform(0, r.duration)), None)
+        seek_s = time.perf_counter() - t0
+    os.remove(path)
+    return {
+        "file_bytes": size,
+        "record_us_per_chunk": record_s / chunks * 1e6,
+        "record_mb_per_s": chunks * chunk / record_s / 1e6,
+        "replay_records": n,
+        "replay_mb_per_s": size / scan_s / 1e6,
+        "seek_us": seek_s / seeks * 1e6,
+    }
+
+# -------------------- 端到端接收吞吐 --------------------
+def _pump(target, data, chunk=4096):
+    """写线程：把数据分块写入pty主端（读端跟不上时阻塞）"""
+    def run():
+        for i in range(0, len(data), chunk):
+            target.write(data[i:i + chunk])
+    th = threading.Thread(target=run, daemon=True)
+    th.start()
+    return th
+
+def _run_reader(data, start_reader, done, timeout=30.0):
+    """经pty回环送入data，start_reader(ser)启动被测读取管线，done()返回是否已处理完，返回MB/s"""
+    import serial
+    from replay import PtyTarget
+    target = PtyTarget()
+    ser = serial.Serial(target.port, timeout=0.1)
+    try:
+        start_reader(ser)
+        t0 = time.perf_counter()
+        _pump(target, data)
+        deadline = t0 + timeout
+        while not done() and time.perf_counter() < deadline:
+            time.sleep(0.001)
+        dt = time.perf_counter() - t0
+    finally:
+        ser.close()
+        target.close()
+    return len(data) / dt / 1e6, dt
+
+@benchmark("reader_throughput")
+def bench_reader_throughput(size=4 * 1024 * 1024):
+    """pty回环满速写入：裸读取、命令行serial_receiver（含解码）、界面接收管线各格式的MB/s"""
+    from queue import Queue, Empty
+    import py_serial
+    from serial_io import iter_bursts, SerialSession
+    data = make_capture(size, noise=0.0)
+    n_frames = len(data) // py_serial.TELEMETRY_LEN
+    res = {"bytes": len(data)}
+
+    got = [0]
+
+    def raw(ser):
+        def run():
+            for b in iter_bursts(ser):
+                got[0] += len(b)
+        threading.Thread(target=run, daemon=True).start()
+    mbps, _ = _run_reader(data, raw, lambda: got[0] >= len(data))
+    res["raw_iter_bursts_mb_per_s"] = mbps
+
+    frames = [0]
+
+    def receiver(ser):
+        q = Queue()
+
+        def consume():
+            while ser.is_open or not q.empty():
+                try:
+                    ts, batch = q.get(timeout=0.05)
+                except Empty:
+                    continue
+                py_serial.decode_frames(batch, ts)
+                frames[0] += len(batch)
+        threading.Thread(target=py_serial.serial_receiver, args=(ser, q, py_serial.FrameParser()), daemon=True).start()
+        threading.Thread(target=consume, daemon=True).start()
+    mbps, dt = _run_reader(data, receiver, lambda: frames[0] >= n_frames)
+    res["serial_receiver"] = {"mb_per_s": mbps, "frames_per_s": frames[0] / dt}
+
+    # 界面接收管线：会话读线程 + RecvFormatter 格式化 + 合并缓冲（不含Tk插入，见console_insert）
+    # 读线程与界面程序一样只读RecvSettings快照，不访问Tk变量，结果可代表实际程序
+    try:
+        from types import SimpleNamespace
+        from serial_assistant import RecvFormatter, RecvSettings
+    except ImportError as e:
+        res["gui_pipeline"] = {"skipped": str(e)}
+        return res
+    for fmt in ("Text", "HEX", "HexDump", "协议"):
+        ctrl = SimpleNamespace(recv_settings=RecvSettings(fmt, "UTF-8", "\n", "DX_RX", False, ""))
+        formatter = RecvFormatter(ctrl)
+        seen = [0]
+        out = []
+
+        def on_data(session, ts, b):
+            s = formatter.format(b)
+            if s:
+                out.append(s)
+            seen[0] += len(b)
+
+        def gui(ser):
+            session = SerialSession(ser.port, on_data)
+            session.ser = ser
+            session._alive = True
+            threading.Thread(target=session._read, daemon=True).start()
+        mbps, _ = _run_reader(data, gui, lambda: seen[0] >= len(data))
+        res[f"gui_{fmt}_mb_per_s"] = mbps
+    return res
+
+@benchmark("console_insert")
+def bench_console_insert(batches=2000, lines=20, limit=20000):
+    """界面插入：合并后的文本批量插入Tk文本框并按回滚上限裁剪（需要图形显示）"""
+    import tkinter as tk
+    from recv_pipeline import Scrollback
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        return {"skipped": f"无图形显示: {e}"}
+    try:
+        tb = tk.Text(root)
+        sb = Scrollback("lines", limit)
+        chunk = "".join(f"[接收(UTF-8)] line {i:04d} 0123456789abcdef\n" for i in range(lines))
+        t0 = time.perf_counter()
+        for _ in range(batches):
+            tb.insert("end", chunk)
+            drop = sb.add(chunk)
+            if drop:
+                tb.delete("1.0", f"{drop + 1}.0")
+            tb.see("end")
+        root.update()
+        dt = time.perf_counter() - t0
+    finally:
+        root.destroy()
+    return {"lines_per_s": batches * lines / dt, "mb_per_s": batches * len(chunk.encode()) / dt / 1e6,
+            "batch_us": dt / batches * 1e6}
+
+@benchmark("plot_decimate")
+def bench_plot_decimate(rate=10000, channels=4, span=10.0, width=1200, frames=100):
+    """实时曲线：每通道rate点/s写入环形缓冲，按像素最小/最大抽取一帧的耗时（显示全部/最近一半）"""
+    from plot import TelemetryStore, decimate_minmax
+    store = TelemetryStore()
+    now = time.time()
+    n = int(rate * span)
+    ts = [now - span + i / rate for i in range(n)]
+    vs = [random.random() for _ in range(n)]
+    t0 = time.perf_counter()
+    for ch in range(channels):
+        for i in range(0, n, 100):  # 模拟读线程每批100点
+            store.extend(f"ch{ch}", ts[i:i + 100], vs[i:i + 100])
+    append_s = time.perf_counter() - t0
+
+    def frame(view):
+        # 与PlotPanel.redraw相同：只取可见时间窗的样本再抽取
+        t0 = time.perf_counter()
+        for _ in range(frames):
+            points = sum(len(decimate_minmax(t, v, now - view, now, width))
+                         for t, v in store.window(now - view, now).values())
+        return (time.perf_counter() - t0) / frames, points
+
+    frame_s, points = frame(span)
+    half_s, _ = frame(span / 2)
+    return {
+        "samples": n * channels,
+        "append_samples_per_s": n * channels / append_s,
+        "frame_ms": frame_s * 1000,
+        "frame_half_span_ms": half_s * 1000,
+        "max_fps": 1 / frame_s,
+        "points_per_frame": points,
+    }
+
+@benchmark("param_list")
+def bench_param_list(params=1000, legacy=200, scrolls=200):
+    """参数列表：数据模型增删与保存，以及虚拟列表滚动/增删的组件开销（界面部分需要图形显示）"""
+    import tempfile
+    from params import ParamDef, ParamModel, PARAM, TEXT
+    model = ParamModel()
+    t0 = time.perf_counter()
+    for i in range(params):
+        model.add(ParamDef(TEXT if i % 5 == 4 else PARAM, name=f"p{i}", fmt="P{VAL}"))
+    add_s = time.perf_counter() - t0
+    path = os.path.join(tempfile.mkdtemp(), "params.json")
+    t0 = time.perf_counter()
+    model.save(path)
+    model.load(path)
+    io_s = time.perf_counter() - t0
+    res = {"params": params, "model_add_us": add_s / params * 1e6, "save_load_ms": io_s * 1000}
+
+    import tkinter as tk
+    import customtkinter as ctk
+    try:
+        root = ctk.CTk()
+    except tk.TclError as e:
+        res["gui"] = {"skipped": f"无图形显示: {e}"}
+        return res
+    try:
+        from theme import ThemeRegistry
+        from serial_assistant import VirtualParamList
+        root.geometry("1200x900")
+        root.theme = ThemeRegistry(root)
+        page = ctk.CTkFrame(root)
+        page.pack(fill="both", expand=True)
+        plist = VirtualParamList(page, root, ParamModel())
+        plist.pack(fill="both", expand=True)
+        root.update()
+        t0 = time.perf_counter()
+        for p in list(model):
+            plist.model.add(p)
+            plist.layout()
+        root.update()
+        add_s = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        for k in range(scrolls):
+            plist.yview("moveto", k / scrolls)
+            root.update()
+        scroll_s = time.perf_counter() - t0
+        widgets = plist.created
+        t0 = time.perf_counter()
+        for p in list(plist.model):
+            plist.model.remove(p)
+            plist.layout()
+        root.update()
+        remove_s = time.perf_counter() - t0
+        # 参照：每个参数一个组件（旧实现）的创建开销
+        box = ctk.CTkFrame(page)
+        t0 = time.perf_counter()
+        for p in list(model)[:legacy]:
+            w = plist.ROW_CLASSES[p.kind](box, root, page)
+            w.attach(p)
+            w.pack(fill="x", pady=8, padx=5)
+        root.update()
+        legacy_s = time.perf_counter() - t0
+        res["gui"] = {
+            "widgets_created": widgets,
+            "add_ms": add_s / params * 1000,
+            "scroll_frame_ms": scroll_s / scrolls * 1000,
+            "remove_ms": remove_s / params * 1000,
+            "legacy_add_ms": legacy_s / legacy * 1000,
+        }
+    finally:
+        root.destroy()
+    return res
+
+@benchmark("tracing")
+def bench_tracing(size=1024 * 1024, chunk=64, rounds=5):
+    """延迟追踪：小块喂给帧解析器（与serial_receiver相同的判断），比较追踪关闭/开启的每块耗时"""
+    import tracing
+    from py_serial import FrameParser
+    data = make_capture(size)
+    chunks = [data[i:i + chunk] for i in range(0, len(data), chunk)]
+
+    def run():
+        parser = FrameParser()
+        t0 = time.perf_counter()
+        for c in chunks:
+            if tracing.ENABLED:
+                t1 = time.perf_counter()
+                parser.feed(c)
+                tracing.record_since("cli.parse", t1)
+            else:
+                parser.feed(c)
+        return (time.perf_counter() - t0) / len(chunks)
+
+    was = tracing.ENABLED
+    try:
+        tracing.enable(False)
+        off = min(run() for _ in range(rounds))
+        tracing.enable(True)
+        on = min(run() for _ in range(rounds))
+    finally:
+        tracing.enable(was)
+        tracing.reset()
+    return {"chunks": len(chunks), "off_chunk_us": off * 1e6, "on_chunk_us": on * 1e6,
+            "on_overhead_pct": (on / off - 1) * 100}
+
+@benchmark("startup")
+def bench_startup(rounds=5):
+    """启动耗时：新进程导入界面模块的时间，以及主窗口首次显示前各阶段耗时（界面部分需要图形显示）"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    code = "import time; t0 = time.perf_counter(); import serial_assistant; print(time.perf_counter() - t0)"
+    samples = []
+    for _ in range(rounds):
+        out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=here, timeout=60)
+        if out.returncode:
+            return {"skipped": out.stderr.strip().splitlines()[-1] if out.stderr.strip() else "导入失败"}
+        samples.append(float(out.stdout.strip().splitlines()[-1]))
+    res = {"import_ms": min(samples) * 1000}
+
+    out = subprocess.run([sys.executable, "serial_assistant.py", "--startup-report"], capture_output=True,
+                         text=True, cwd=here, timeout=60)
+    lines = out.stdout.strip().splitlines()
+    if out.returncode or not lines:
+        err = out.stderr.strip().splitlines()
+        res["gui"] = {"skipped": f"无图形显示: {err[-1] if err else out.returncode}"}
+        return res
+    phases = json.loads(lines[-1])
+    res["gui"] = {f"{name}_ms": p["ms"] for name, p in phases.items()}
+    res["gui"]["first_window_total_ms"] = phases["first_window"]["total_ms"]
+    return res
+
+# -------------------- 结果保存与对比 --------------------
+# 指标方向：按键名后缀判断，越大越好 / 越小越好；其它键（计数、配置）不参与对比
+HIGHER_BETTER = ("_per_s", "per_s", "speedup", "ratio")
+LOWER_BETTER = ("_ms", "_us", "_pct")
+# 旧实现的参照测量（legacy_*、轮询、每组件一线程）只显示不判定退化
+REFERENCE = ("legacy", "poll_10ms", "threads")
+
+def flatten(res, prefix=""):
+    """把嵌套结果展开为 {"a.b.c": 数值}"""
+    out = {}
+    for k, v in res.items():
+        key = f"{prefix}{k}"
+        if isinstance(v, dict):
+            out.update(flatten(v, key + "."))
+        elif isinstance(v, (int, float)) and not isinstance(v, bool):
+            out[key] = v
+    return out
+
+def run_metadata():
+    """记录运行环境，便于跨版本对比时判断是否同一机器"""
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        rev = ""
+    return {"time": time.strftime("%Y-%m-%d %H:%M:%S"), "git": rev, "python": sys.version.split()[0],
+            "platform": platform.platform(), "machine": platform.machine()}
+
+def compare(base, results, threshold=0.1):
+    """与基线对比，返回 [(指标, 基线值, 本次值, 变化比例, 是否退化)]"""
+    old, new = flatten(base), flatten(results)
+    rows = []
+    for key, v in new.items():
+        b = old.get(key)
+        parts = key.split(".")
+        if b is None or not b:
+            continue
+        ref = any(p.startswith(REFERENCE) for p in parts)
+        if parts[-1].endswith(HIGHER_BETTER):
+            change = v / b - 1
+            rows.append((key, b, v, change, not ref and change < -threshold))
+        elif parts[-1].endswith(LOWER_BETTER):
+            change = v / b - 1
+            rows.append((key, b, v, change, not ref and change > threshold))
+    return rows
+
+# -------------------- 主程序 --------------------
+def print_result(name, res, indent=0):
+    """逐层打印结果"""
+    pad = "  " * indent
+    print(f"{pad}{name}:")
+    for k, v in res.items():
+        if isinstance(v, dict):
+            print_result(k, v, indent + 1)
+        elif isinstance(v, float):
+            print(f"{pad}  {k:<24} {v:.4f}")
+        else:
+            print(f"{pad}  {k:<24} {v}")
+
+def main():
+    parser = argparse.ArgumentParser(description="串口助手性能基准")
+    parser.add_argument("names", nargs="*", help=f"要运行的基准（默认全部）: {', '.join(BENCHMARKS)}")
+    parser.add_argument("--json", metavar="PATH", help="将结果（含运行环境）保存为JSON")
+    parser.add_argument("--compare", metavar="BASE", help="与之前保存的JSON结果对比，存在退化时返回码为1")
+    parser.add_argument("--threshold", type=float, default=0.1, help="判定退化的变化比例（默认0.1）")
+    args = parser.parse_args()
+
+    for name in args.names:
+        if name not in BENCHMARKS:
+            parser.error(f"未知基准: {name}")
+    results = {}
+    for name in args.names or list(BENCHMARKS):
+        results[name] = BENCHMARKS[name]()
+        print_result(name, results[name])
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"meta": run_metadata(), "results": results}, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存: {args.json}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            base = json.load(f)
+        rows = compare(base.get("results", {}), results, args.threshold)
+        print(f"\n与基线对比 ({base.get('meta', {}).get('git') or args.compare}):")
+        for key, b, v, change, bad in rows:
+            print(f"  {key:<48} {b:>12.4g} -> {v:<12.4g} {change:+7.1%}{'  退化' if bad else ''}")
+        if any(r[4] for r in rows):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+import bisect
+import mmap
+import os
+import struct
+import threading
+import time
+from array import array
+from collections import namedtuple
+
+# -------------------- 文件格式 --------------------
+# 文件头: 魔数 + 开始录制时的系统时间
+# 记录:   记录头(相对开始的单调时间, 类型, 端口号, 长度) + 数据
+#   RX/TX  - 收发的原始字节
+#   PORT   - 端口号首次出现时登记端口名
+#   INDEX  - 周期索引块: 上一个索引块偏移 + 若干(时间, 记录偏移)采样点
+# 正常结束时追加端口表(PORT记录，端口号ALL_PORTS，换行分隔的端口名)
+# 与文件尾: 最后一个索引块偏移 + 端口表偏移 + 结束魔数；缺少文件尾（异常退出）时顺序扫描重建索引
+MAGIC = b"SACAP01\0"
+END_MAGIC = b"SACAPEND"
+FILE_HEADER = struct.Struct("<8sd")
+RECORD = struct.Struct("<dBHI")
+INDEX_HEAD = struct.Struct("<QI")
+TRAILER = struct.Struct("<QQ8s")
+
+RX, TX, PORT, INDEX = 0, 1, 2, 3
+ALL_PORTS = 0xFFFF
+DIRECTIONS = {RX: "RX", TX: "TX"}
+
+INDEX_STRIDE = 64             # 每隔多少条数据记录采样一个索引点
+INDEX_INTERVAL = 1024 * 1024  # 每写入多少字节输出一个索引块
+FLUSH_SIZE = 256 * 1024       # 缓冲超过此大小时唤醒落盘线程
+FLUSH_INTERVAL = 0.5          # 落盘线程最长间隔(秒)
+
+Record = namedtuple("Record", "t direction port data")
+
+class CaptureError(ValueError):
+    """抓包文件格式错误"""
+
+# -------------------- 录制 --------------------
+class CaptureWriter:
+    """二进制抓包录制：调用方线程只把记录追加到内存缓冲，由后台线程批量写盘"""
+    def __init__(self, path):
+        self.path = path
+        self._f = open(path, "wb")
+        self._t0 = time.monotonic()
+        self._buf = bytearray(FILE_HEADER.pack(MAGIC, time.time()))
+        self._offset = len(self._buf)  # 逻辑文件偏移（已写盘 + 缓冲中）
+        self._ports = {}
+        self._samples = []             # 待写入下一个索引块的(时间, 偏移)
+        self._records = 0
+        self._last_index = 0
+        self._next_index = INDEX_INTERVAL
+        self.bytes = {RX: 0, TX: 0}
+        self._cond = threading.Condition()
+        self._closed = False
+        self.error = None              # 落盘失败时的OSError，此后不再接受记录
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _append(self, t, kind, port_id, data):
+        self._buf += RECORD.pack(t, kind, port_id, len(data))
+        self._buf += data
+        self._offset += RECORD.size + len(data)
+
+    def record(self, direction, port, data):
+        """追加一块收发数据（线程安全，可在读线程中直接调用）"""
+        if not data:
+            return
+        t = time.monotonic() - self._t0
+        with self._cond:
+            if self._closed:
+                return
+            pid = self._ports.get(port)
+            if pid is None:
+                pid = self._ports[port] = len(self._ports)
+                self._append(t, PORT, pid, port.encode("utf-8"))
+            if self._records % INDEX_STRIDE == 0:
+                self._samples.append((t, self._offset))
+            self._records += 1
+            self.bytes[direction] += len(data)
+            self._append(t, direction, pid, data)
+            if self._offset >= self._next_index:
+                self._write_index(t)
+            if len(self._buf) >= FLUSH_SIZE:
+                self._cond.notify()
+
+    def _write_index(self, t):
+        """输出索引块（持有锁时调用）"""
+        offset = self._offset
+        samples = array("d")
+        for st, so in self._samples:
+            samples.append(st)
+            samples.append(so)  # 偏移以double存放，2^53字节以内精确
+        payload = INDEX_HEAD.pack(self._last_index, len(self._samples)) + samples.tobytes()
+        self._append(t, INDEX, 0, payload)
+        self._samples = []
+        self._last_index = offset
+        self._next_index = self._offset + INDEX_INTERVAL
+
+    def _run(self):
+        """落盘线程：交换缓冲后在锁外写文件"""
+        while True:
+            with self._cond:
+                if not self._closed and len(self._buf) < FLUSH_SIZE:
+                    self._cond.wait(FLUSH_INTERVAL)
+                buf, self._buf = self._buf, bytearray()
+                closed = self._closed
+            if buf:
+                try:
+                    self._f.write(buf)
+                except OSError as e:  # 磁盘满等：记录错误并停止接受记录，缓冲不再增长
+                    with self._cond:
+                        self.error = e
+                        self._closed = True
+                        self._buf = bytearray()
+                    return
+            if closed:
+                return
+
+    def close(self):
+        """写出最后的索引块与文件尾并关闭；落盘曾经失败时关闭文件后抛出该OSError"""
+        with self._cond:
+            if not self._closed:
+                t = time.monotonic() - self._t0
+                self._write_index(t)
+                ports_offset = self._offset
+                self._append(t, PORT, ALL_PORTS, "\n".join(self._ports).encode("utf-8"))
+                self._buf += TRAILER.pack(self._last_index, ports_offset, END_MAGIC)
+                self._closed = True
+                self._cond.notify()
+        self._thread.join()
+        if not self._f.closed:
+            self._f.close()
+            if self.error:
+                raise self.error
+
+# -------------------- 回放读取 --------------------
+class CaptureReader:
+    """以mmap打开抓包文件，仅在内存中保留稀疏索引，可按时间随机定位"""
+    def __init__(self, path):
+        self.path = path
+        self._f = open(path, "rb")
+        size = os.fstat(self._f.fileno()).st_size
+        if size < FILE_HEADER.size:
+            self._f.close()
+            raise CaptureError(f"{path} 不是抓包文件")
+        self._mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.start_time = FILE_HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            self.close()
+            raise CaptureError(f"{path} 不是抓包文件")
+        self.size = size
+        self.ports = {}
+        self.complete = False
+        self._times = array("d")
+        self._offsets = array("d")
+        if not self._load_index():
+            self._scan()
+
+    def _load_index(self):
+        """从文件尾沿索引块链读取索引，文件尾缺失或损坏时返回False"""
+        mm = self._mm
+        if self.size < FILE_HEADER.size + TRAILER.size:
+            return False
+        last, ports_offset, magic = TRAILER.unpack_from(mm, self.size - TRAILER.size)
+        if magic != END_MAGIC:
+            return False
+        self.end = self.size - TRAILER.size
+        blocks = []
+        off = last
+        while off:
+            t, kind, _, n = RECORD.unpack_from(mm, off)
+            if kind != INDEX:
+                return False
+            prev, count = INDEX_HEAD.unpack_from(mm, off + RECORD.size)
+            pairs = array("d", mm[off + RECORD.size + INDEX_HEAD.size:off + RECORD.size + n])
+            blocks.append(pairs)
+            off = prev
+        for pairs in reversed(blocks):
+            self._times.extend(pairs[0::2])
+            self._offsets.extend(pairs[1::2])
+        self.duration, kind, pid, n = RECORD.unpack_from(mm, ports_offset)
+        if kind != PORT or pid != ALL_PORTS:
+            return False
+        names = mm[ports_offset + RECORD.size:ports_offset + RECORD.size + n].decode("utf-8", "replace")
+        self.ports = dict(enumerate(names.split("\n"))) if names else {}
+        self.complete = True
+        return True
+
+    def _scan(self):
+        """无文件尾时顺序扫描：登记端口并按INDEX_STRIDE采样重建索引，截断在最后一条完整记录处"""
+        mm, off, size = self._mm, FILE_HEADER.size, self.size
+        unpack = RECORD.unpack_from
+        i = 0
+        t = 0.0
+        while off + RECORD.size <= size:
+            t, kind, pid, n = unpack(mm, off)
+            if off + RECORD.size + n > size:
+                break
+            if kind == PORT:
+                self.ports[pid] = mm[off + RECORD.size:off + RECORD.size + n].decode("utf-8", "replace")
+            elif kind in DIRECTIONS:
+                if i % INDEX_STRIDE == 0:
+                    self._times.append(t)
+                    self._offsets.append(off)
+                i += 1
+            off += RECORD.size + n
+        self.end = off
+        self.duration = t
+
+    def seek(self, t):
+        """返回时间不早于t的第一条记录所在区域的起始偏移（用稀疏索引定位）"""
+        # 取时间严格早于t的最后一个采样点，同一时刻的多条记录不会被跳过
+        i = bisect.bisect_left(self._times, t) - 1
+        return int(self._offsets[i]) if i >= 0 else FILE_HEADER.size
+
+    def records(self, start=0.0, end=None, directions=(RX, TX)):
+        """按时间顺序产出 Record(t, direction, port, data)，从start秒开始，到end秒（不含）结束"""
+        mm, limit = self._mm, self.end
+        unpack, hs = RECORD.unpack_from, RECORD.size
+        ports = self.ports
+        off = self.seek(start)
+        while off + hs <= limit:
+            t, kind, pid, n = unpack(mm, off)
+            body = off + hs
+            off = body + n
+            if kind not in directions or t < start:
+                continue
+            if end is not None and t >= end:
+                return
+            yield Record(t, kind, ports.get(pid, str(pid)), mm[body:off])
+
+    def __iter__(self):
+        return self.records()
+
+    def close(self):
+        self._mm.close()
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,113 @@
+import binascii
+
+# -------------------- 校验算法 --------------------
+class Checksum:
+    """校验算法：init/update/final 三段式，支持跨多个数据块增量计算
+
+    update(state, data) 返回新的中间值，final(state) 得到最终校验值；
+    compute(data) 为一次性计算，new() 返回可逐块喂数据的计算器。
+    endian 非None时校验值固定按此字节序存放（如MODBUS低字节在前），否则跟随协议字节序。
+    """
+    def __init__(self, name, size, update, init=0, xorout=0, endian=None, check=None):
+        self.name = name
+        self.size = size        # 校验值字节数
+        self.update = update
+        self.init = init
+        self.xorout = xorout
+        self.endian = endian
+        self.check = check      # 对b"123456789"的标准校验值，用于自检
+
+    def final(self, state):
+        return state ^ self.xorout
+
+    def compute(self, data):
+        """一次性计算data的校验值"""
+        return self.update(self.init, data) ^ self.xorout
+
+    def new(self):
+        return RunningChecksum(self)
+
+class RunningChecksum:
+    """增量计算器：数据分批到达时逐块update，随时读取value"""
+    def __init__(self, algo):
+        self.algo = algo
+        self.state = algo.init
+
+    def update(self, data):
+        self.state = self.algo.update(self.state, data)
+        return self
+
+    @property
+    def value(self):
+        return self.algo.final(self.state)
+
+    def reset(self):
+        self.state = self.algo.init
+
+# -------------------- 查表CRC --------------------
+def _make_table(width, poly, reflect):
+    """预计算256项CRC表"""
+    mask = (1 << width) - 1
+    table = []
+    if reflect:
+        rpoly = int(f"{poly:0{width}b}"[::-1], 2)
+        for i in range(256):
+            c = i
+            for _ in range(8):
+                c = (c >> 1) ^ rpoly if c & 1 else c >> 1
+            table.append(c)
+    else:
+        top = 1 << (width - 1)
+        for i in range(256):
+            c = i << (width - 8)
+            for _ in range(8):
+                c = ((c << 1) ^ poly) & mask if c & top else (c << 1) & mask
+            table.append(c)
+    return tuple(table)
+
+def crc_update(width, poly, reflect=False):
+    """按参数生成查表CRC的update函数（宽度为8的倍数）"""
+    table = _make_table(width, poly, reflect)
+    if width == 8:
+        def update(crc, data):
+            for b in data:
+                crc = table[crc ^ b]
+            return crc
+    elif reflect:
+        def update(crc, data):
+            for b in data:
+                crc = (crc >> 8) ^ table[(crc ^ b) & 0xFF]
+            return crc
+    else:
+        shift, mask = width - 8, (1 << width) - 1
+        def update(crc, data):
+            for b in data:
+                crc = ((crc << 8) & mask) ^ table[((crc >> shift) ^ b) & 0xFF]
+            return crc
+    return update
+
+# -------------------- 内置算法 --------------------
+ALGORITHMS = {}
+
+def register(algo):
+    """注册校验算法，协议定义中按名称引用"""
+    ALGORITHMS[algo.name] = algo
+    return algo
+
+def get(name):
+    """按名称取校验算法，未知名称抛出KeyError"""
+    return ALGORITHMS[name]
+
+NONE = register(Checksum("none", 0, lambda crc, data: 0))
+# 所有字节相加取低8位（sum()在C层完成，无需查表）
+SUM8 = register(Checksum("sum8", 1, lambda s, data: (s + sum(data)) & 0xFF, check=0xDD))
+# CRC-8/SMBUS: poly=0x07 init=0x00
+CRC8 = register(Checksum("crc8", 1, crc_update(8, 0x07), check=0xF4))
+# CRC-16/MODBUS: poly=0x8005(反射) init=0xFFFF，低字节在前
+CRC16_MODBUS = register(Checksum("crc16_modbus", 2, crc_update(16, 0x8005, reflect=True),
+                                 init=0xFFFF, endian="<", check=0x4B37))
+# CRC-16/CCITT-FALSE: poly=0x1021 init=0xFFFF，binascii.crc_hqx在C层计算
+CRC16_CCITT = register(Checksum("crc16_ccitt", 2, lambda crc, data: binascii.crc_hqx(data, crc),
+                                init=0xFFFF, check=0x29B1))
+# CRC-32 (IEEE 802.3)，binascii.crc32 自带初值与结果取反，可直接传入上次结果续算
+CRC32 = register(Checksum("crc32", 4, lambda crc, data: binascii.crc32(data, crc), check=0xCBF43926))
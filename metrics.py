@@ -0,0 +1,149 @@
+import json
+import os
+import threading
+import time
+
+# -------------------- 计数器与仪表 --------------------
+class Counter:
+    """累加计数器：每个线程累加自己的分片，读取时求和，热路径上不加锁"""
+    def __init__(self, name):
+        self.name = name
+        self._local = threading.local()
+        self._cells = []                # 各线程的分片 [值]
+        self._lock = threading.Lock()   # 仅在线程首次使用时登记分片
+
+    def add(self, n=1):
+        try:
+            self._local.cell[0] += n
+        except AttributeError:
+            cell = self._local.cell = [n]
+            with self._lock:
+                self._cells.append(cell)
+
+    @property
+    def value(self):
+        return sum(c[0] for c in list(self._cells))
+
+class MetricsRegistry:
+    """指标注册表：计数器由热路径累加，仪表（队列深度等）在采样时调用函数读取，平时零开销"""
+    def __init__(self):
+        self.counters = {}
+        self.gauges = {}
+        self.last = {}
+        self._prev = None
+        self._lock = threading.Lock()
+
+    def counter(self, name):
+        """取得（必要时创建）计数器"""
+        c = self.counters.get(name)
+        if c is None:
+            with self._lock:
+                c = self.counters.setdefault(name, Counter(name))
+        return c
+
+    def gauge(self, name, fn):
+        """登记仪表：采样时调用 fn() 取当前值（同名覆盖）"""
+        self.gauges[name] = fn
+
+    def remove_gauge(self, name):
+        self.gauges.pop(name, None)
+
+    def sample(self):
+        """采样一次：计数器总量及自上次采样以来的速率(/s)，仪表当前值"""
+        now = time.monotonic()
+        totals = {name: c.value for name, c in list(self.counters.items())}
+        t0, prev = self._prev or (now, totals)
+        dt = now - t0
+        gauges = {}
+        for name, fn in list(self.gauges.items()):
+            try:
+                gauges[name] = fn()
+            except Exception:  # 仪表所属对象已关闭等，跳过本次
+                continue
+        snap = {
+            "time": time.time(),
+            "counters": {name: {"total": v, "rate": (v - prev.get(name, 0)) / dt if dt > 0 else 0.0}
+                         for name, v in totals.items()},
+            "gauges": gauges,
+        }
+        self._prev = (now, totals)
+        self.last = snap
+        return snap
+
+    def write_json(self, path, snap=None):
+        """写出JSON快照（先写临时文件再替换，外部读取不会读到半个文件）"""
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(snap or self.last, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, path)
+
+# 全局注册表：各模块在导入时取得自己的计数器
+REGISTRY = MetricsRegistry()
+
+def counter(name):
+    return REGISTRY.counter(name)
+
+# 各热路径使用的计数器
+RX_BYTES = counter("rx_bytes")
+TX_BYTES = counter("tx_bytes")
+RX_FRAMES = counter("rx_frames")
+FOOTER_ERRORS = counter("footer_errors")
+CHECKSUM_ERRORS = counter("checksum_errors")
+DISCARDED_BYTES = counter("discarded_bytes")
+
+# -------------------- 显示 --------------------
+# 仪表显示名（JSON快照中保持英文键）
+GAUGE_LABELS = {"ui_pending": "待刷新块", "tx_queue": "发送队列B", "rx_queue": "接收队列"}
+
+def _human(v):
+    for unit in ("", "K", "M", "G"):
+        if abs(v) < 1000:
+            return f"{v:.0f}{unit}" if not unit else f"{v:.1f}{unit}"
+        v /= 1000
+    return f"{v:.1f}T"
+
+def format_line(snap):
+    """一行摘要：收发速率、帧率、错误与各仪表"""
+    c = snap.get("counters", {})
+
+    def rate(name):
+        return c.get(name, {}).get("rate", 0.0)
+
+    def total(name):
+        return c.get(name, {}).get("total", 0)
+
+    parts = [f"RX {_human(rate('rx_bytes'))}B/s", f"TX {_human(rate('tx_bytes'))}B/s",
+             f"帧 {_human(rate('rx_frames'))}/s",
+             f"帧尾错 {total('footer_errors')}", f"校验错 {total('checksum_errors')}",
+             f"丢弃 {_human(total('discarded_bytes'))}B"]
+    parts += [f"{GAUGE_LABELS.get(name, name)} {v}" for name, v in snap.get("gauges", {}).items()]
+    return " | ".join(parts)
+
+class Reporter:
+    """后台线程按间隔采样：打印一行摘要（命令行）和/或写出JSON快照"""
+    def __init__(self, interval=1.0, out=print, json_path=None, registry=REGISTRY):
+        self.interval = interval
+        self.out = out
+        self.json_path = json_path
+        self.registry = registry
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="metrics")
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        self.registry.sample()
+        while not self._stop.wait(self.interval):
+            snap = self.registry.sample()
+            if self.out:
+                self.out(f"[指标] {format_line(snap)}")
+            if self.json_path:
+                try:
+                    self.registry.write_json(self.json_path, snap)
+                except OSError:
+                    pass
+
+    def stop(self):
+        self._stop.set()
@@ -0,0 +1,111 @@
+import json
+import protocol
+from recv_pipeline import to_hex
+
+# -------------------- 参数数据模型 --------------------
+PARAM, TEXT = "param", "text"
+
+class ParamDef:
+    """一个参数/文本指令组件的定义与当前值：纯数据，界面行可随时绑定、解绑、复用
+
+    输入框内容按原文保存（如 value="0.00"），发送时再解析，与直接读输入框的行为一致。
+    """
+    FIELDS = ("kind", "name", "proto", "fmt", "lo", "hi", "bounds", "value", "mode", "interval", "times", "text")
+
+    def __init__(self, kind=PARAM, name="", proto="文本", fmt="", lo="0", hi="100", bounds=None,
+                 value="0.00", mode="manual", interval="100", times="0", text=""):
+        self.kind = kind
+        self.name = name
+        self.proto = proto          # "文本" 或协议名
+        self.fmt = fmt
+        self.lo, self.hi = lo, hi   # 范围输入框内容
+        self.bounds = tuple(bounds) if bounds else (float(lo), float(hi))  # 已生效的滑块范围
+        self.value = value
+        self.mode = mode            # "manual" / "auto"
+        self.interval = interval    # 自动发送间隔(ms)
+        self.times = times          # 自动发送次数，0=无限
+        self.text = text            # 文本指令内容（kind=TEXT）
+        # 运行状态（不保存）
+        self.task = None
+        self.payload = (b"", "")
+        self.stats = ""
+
+    @property
+    def auto_sending(self):
+        return self.task is not None and not self.task.cancelled
+
+    def build_send(self, encode_send):
+        """按当前数值生成(待发送字节, 回显文本)：文本格式替换{VAL}，二进制协议按字段编码
+
+        encode_send 为文本发送时的编码函数（按发送格式返回(字节, 回显文本)）。
+        """
+        val = float(self.value)
+        if self.proto == "文本":
+            fmt = self.fmt or "{VAL}"
+            s = fmt.replace("{VAL}", f"{val:.2f}")
+            return encode_send(f"[{self.name or '参数'}] {s}")
+        schema = protocol.SCHEMAS.get(self.proto)
+        if schema is None:
+            # 配置文件中的协议可能已被删除或改名
+            raise protocol.ProtocolError(f"未知的协议: {self.proto}")
+        b = schema.encode(schema.parse_values(self.fmt, val))
+        return b, f"[发送({self.proto})] {to_hex(b)}\n"
+
+    def to_dict(self):
+        return {f: getattr(self, f) for f in self.FIELDS}
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(**{k: d[k] for k in cls.FIELDS if k in d})
+
+class ParamModel:
+    """参数列表：增删只改列表并通知视图，视图自行决定创建/复用哪些界面行"""
+    def __init__(self):
+        self.items = []
+        self._listeners = []
+
+    def subscribe(self, fn):
+        """fn(事件, 条目)：事件为 "add" / "remove" / "reset"（reset时条目为None）"""
+        self._listeners.append(fn)
+
+    def unsubscribe(self, fn):
+        if fn in self._listeners:
+            self._listeners.remove(fn)
+
+    def _notify(self, event, item):
+        for fn in list(self._listeners):
+            fn(event, item)
+
+    def add(self, item):
+        self.items.append(item)
+        self._notify("add", item)
+        return item
+
+    def remove(self, item):
+        self.items.remove(item)
+        self._notify("remove", item)
+
+    def index(self, item):
+        return self.items.index(item)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __getitem__(self, i):
+        return self.items[i]
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def save(self, path):
+        """保存参数表为JSON"""
+        data = [p.to_dict() for p in self.items]
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=1)
+
+    def load(self, path):
+        """从JSON加载参数表，替换当前全部条目"""
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        self.items = [ParamDef.from_dict(d) for d in data]
+        self._notify("reset", None)
@@ -0,0 +1,276 @@
+import bisect
+import re
+import threading
+import time
+import tkinter as tk
+from array import array
+
+from protocol import load_numpy  # NumPy首次建缓冲时才导入，无NumPy时退化为array + 逐点循环
+
+# -------------------- 环形缓冲 --------------------
+class RingSeries:
+    """单通道预分配环形缓冲：(时间, 数值) 写满后覆盖最旧样本，追加不分配新内存"""
+    def __init__(self, capacity=100000):
+        self.capacity = capacity
+        self._np = np = load_numpy()
+        if np is not None:
+            self.t = np.zeros(capacity)
+            self.v = np.zeros(capacity)
+        else:
+            self.t = array("d", bytes(8 * capacity))
+            self.v = array("d", bytes(8 * capacity))
+        self.head = 0   # 下一个写入位置
+        self.count = 0
+
+    def extend(self, ts, vs):
+        """批量追加，ts/vs 为等长序列（调用方持锁）"""
+        n = len(vs)
+        if not n:
+            return
+        cap = self.capacity
+        if n > cap:
+            ts, vs, n = ts[-cap:], vs[-cap:], cap
+        h = self.head
+        first = min(n, cap - h)
+        if self._np is not None:
+            self.t[h:h + first] = ts[:first]
+            self.v[h:h + first] = vs[:first]
+            if first < n:
+                self.t[:n - first] = ts[first:]
+                self.v[:n - first] = vs[first:]
+        else:
+            self.t[h:h + first] = array("d", ts[:first])
+            self.v[h:h + first] = array("d", vs[:first])
+            if first < n:
+                self.t[:n - first] = array("d", ts[first:])
+                self.v[:n - first] = array("d", vs[first:])
+        self.head = (h + n) % cap
+        self.count = min(self.count + n, cap)
+
+    def snapshot(self):
+        """按时间顺序复制出全部有效样本 (t, v)（调用方持锁）"""
+        h, c = self.head, self.count
+        if c < self.capacity:
+            return self.t[:c], self.v[:c]
+        np = self._np
+        if np is not None:
+            return np.concatenate((self.t[h:], self.t[:h])), np.concatenate((self.v[h:], self.v[:h]))
+        return self.t[h:] + self.t[:h], self.v[h:] + self.v[:h]
+
+    def window(self, t0, t1):
+        """按时间顺序复制出[t0, t1)内的样本 (t, v)（调用方持锁）
+
+        环形缓冲最多分为两段、各段时间递增，二分定位可见范围后只复制这一部分。
+        """
+        h, c = self.head, self.count
+        segs = ((0, c),) if c < self.capacity else ((h, c), (0, h))
+        np = self._np
+        ts, vs = [], []
+        for a, b in segs:
+            if np is not None:
+                lo, hi = np.searchsorted(self.t[a:b], (t0, t1)) + a
+            else:
+                lo, hi = bisect.bisect_left(self.t, t0, a, b), bisect.bisect_left(self.t, t1, a, b)
+            if hi > lo:
+                ts.append(self.t[lo:hi])
+                vs.append(self.v[lo:hi])
+        if np is not None:
+            if len(ts) == 1:
+                return ts[0].copy(), vs[0].copy()
+            return (np.concatenate(ts), np.concatenate(vs)) if ts else (self.t[:0].copy(), self.v[:0].copy())
+        if len(ts) == 1:
+            return ts[0], vs[0]
+        return (ts[0] + ts[1], vs[0] + vs[1]) if ts else (array("d"), array("d"))
+
+class TelemetryStore:
+    """多通道遥测样本：读线程批量写入，界面线程按帧取快照，锁内只做内存复制"""
+    def __init__(self, capacity=100000):
+        self.capacity = capacity
+        self.channels = {}
+        self._lock = threading.Lock()
+        self.samples = 0
+
+    def extend(self, name, ts, vs):
+        """追加一个通道的一批样本（读线程调用）"""
+        with self._lock:
+            series = self.channels.get(name)
+            if series is None:
+                series = self.channels[name] = RingSeries(self.capacity)
+            series.extend(ts, vs)
+            self.samples += len(vs)
+
+    def snapshot(self):
+        """{通道名: (t, v)}，t 按时间递增（界面线程调用）"""
+        with self._lock:
+            return {name: s.snapshot() for name, s in self.channels.items()}
+
+    def window(self, t0, t1):
+        """{通道名: (t, v)}，只含[t0, t1)内的样本（界面线程按帧调用，锁内只复制可见部分）"""
+        with self._lock:
+            return {name: s.window(t0, t1) for name, s in self.channels.items()}
+
+    def clear(self):
+        with self._lock:
+            self.channels = {}
+            self.samples = 0
+
+# -------------------- 数据提取 --------------------
+class TextExtractor:
+    """从文本行中按正则提取数值：有命名分组时以组名为通道名，否则按出现顺序命名 ch0/ch1/…"""
+    def __init__(self, pattern=r"-?\d+(?:\.\d+)?"):
+        self.regex = re.compile(pattern)
+
+    def extract(self, lines):
+        """返回 {通道名: [数值, ...]}，每行最多贡献每通道一个样本"""
+        out = {}
+        named = bool(self.regex.groupindex)
+        for ln in lines:
+            if named:
+                m = self.regex.search(ln)
+                if not m:
+                    continue
+                items = m.groupdict().items()
+            else:
+                items = ((f"ch{i}", s) for i, s in enumerate(self.regex.findall(ln)))
+            for name, s in items:
+                if s is None:
+                    continue
+                try:
+                    out.setdefault(name, []).append(float(s))
+                except ValueError:
+                    pass
+        return out
+
+def spread_times(t_prev, t_now, n):
+    """一批样本共用一个接收时间戳时，将其均匀分布在(上一批, 本批]区间内，避免曲线竖直堆叠"""
+    if n <= 1 or t_prev is None or t_now - t_prev > 0.5:
+        return [t_now] * n
+    step = (t_now - t_prev) / n
+    return [t_prev + step * (i + 1) for i in range(n)]
+
+# -------------------- 每像素最小/最大值抽取 --------------------
+def decimate_minmax(t, v, t0, t1, width):
+    """把[t0, t1)内的样本按像素列分箱，返回 (列号, 最小值, 最大值) 列表
+
+    绘制每列的最小-最大竖线即可保留所有尖峰，点数与样本量无关，只与像素宽度有关。
+    """
+    if width <= 0 or t1 <= t0 or not len(t):
+        return []
+    scale = width / (t1 - t0)
+    np = load_numpy()
+    if np is not None:
+        lo, hi = np.searchsorted(t, (t0, t1))
+        if hi <= lo:
+            return []
+        t, v = t[lo:hi], v[lo:hi]
+        cols = ((t - t0) * scale).astype(np.int64)
+        np.clip(cols, 0, width - 1, out=cols)
+        # t递增，同一列的样本连续：取每段起点后用reduceat求段内最小/最大
+        starts = np.flatnonzero(np.r_[True, cols[1:] != cols[:-1]])
+        return list(zip(cols[starts].tolist(), np.minimum.reduceat(v, starts).tolist(),
+                        np.maximum.reduceat(v, starts).tolist()))
+    out = []
+    last = -1
+    for tt, vv in zip(t, v):
+        if tt < t0 or tt >= t1:
+            continue
+        c = min(int((tt - t0) * scale), width - 1)
+        if c != last:
+            out.append([c, vv, vv])
+            last = c
+        else:
+            cell = out[-1]
+            if vv < cell[1]:
+                cell[1] = vv
+            elif vv > cell[2]:
+                cell[2] = vv
+    return [tuple(c) for c in out]
+
+# -------------------- 绘图面板 --------------------
+PLOT_COLORS = ("#00FF00", "#FF6B6B", "#4FC3F7", "#FFD54F", "#BA68C8", "#FF8A65", "#AED581", "#F06292")
+
+class PlotPanel(tk.Canvas):
+    """实时曲线：运行时定时按帧率上限重绘，复用画布图元，只更新坐标；页面隐藏或关闭曲线时停止定时器"""
+    def __init__(self, parent, store, span=10.0, fps=25, **kw):
+        kw.setdefault("bg", "#1e1e1e")
+        kw.setdefault("highlightthickness", 0)
+        super().__init__(parent, **kw)
+        self.store = store
+        self.span = span          # 显示最近多少秒
+        self.fps = fps            # 重绘帧率上限
+        self.running = False
+        self._lines = {}
+        self._labels = {}
+        self._ymax = self.create_text(4, 2, anchor="nw", fill="#888888", font=("Consolas", 9))
+        self._ymin = self.create_text(4, 0, anchor="sw", fill="#888888", font=("Consolas", 9))
+        self.draw_ms = 0.0
+        self._job = None
+
+    def set_running(self, running):
+        """开始/停止定时重绘"""
+        if running == self.running:
+            return
+        self.running = running
+        if running:
+            self._job = self.after(0, self._tick)
+        elif self._job:
+            self.after_cancel(self._job)
+            self._job = None
+
+    def _tick(self):
+        t0 = time.perf_counter()
+        self.redraw()
+        self.draw_ms = (time.perf_counter() - t0) * 1000
+        self._job = self.after(int(1000 / self.fps), self._tick)
+
+    def redraw(self):
+        """按当前数据重绘所有通道"""
+        w, h = self.winfo_width(), self.winfo_height()
+        if w < 10 or h < 10:
+            return
+        t1 = time.time()
+        t0 = t1 - self.span
+        data = self.store.window(t0, t1)
+        cols = {name: decimate_minmax(t, v, t0, t1, w) for name, (t, v) in data.items()}
+        values = [x for c in cols.values() for _, lo, hi in c for x in (lo, hi)]
+        if values:
+            lo, hi = min(values), max(values)
+        else:
+            lo, hi = 0.0, 1.0
+        if hi - lo < 1e-9:
+            lo, hi = lo - 0.5, hi + 0.5
+        pad = (hi - lo) * 0.05
+        lo, hi = lo - pad, hi + pad
+        ky = (h - 4) / (hi - lo)
+        for i, (name, c) in enumerate(cols.items()):
+            color = PLOT_COLORS[i % len(PLOT_COLORS)]
+            coords = []
+            for x, vmin, vmax in c:
+                coords += (x, h - 2 - (vmin - lo) * ky, x, h - 2 - (vmax - lo) * ky)
+            if len(coords) < 4:
+                coords = [0, -10, 0, -10]
+            line = self._lines.get(name)
+            if line is None:
+                line = self._lines[name] = self.create_line(*coords, fill=color, width=1)
+                self._labels[name] = self.create_text(w - 4, 4 + 14 * i, anchor="ne", fill=color,
+                                                      text=name, font=("Consolas", 9))
+            else:
+                self.coords(line, coords)
+                self.coords(self._labels[name], w - 4, 4 + 14 * i)
+        for name in [n for n in self._lines if n not in cols]:
+            self.delete(self._lines.pop(name))
+            self.delete(self._labels.pop(name))
+        self.itemconfigure(self._ymax, text=f"{hi:.4g}")
+        self.itemconfigure(self._ymin, text=f"{lo:.4g}  (最近{self.span:g}s)")
+        self.coords(self._ymin, 4, h - 2)
+
+    def clear(self):
+        self.store.clear()
+        for item in list(self._lines.values()) + list(self._labels.values()):
+            self.delete(item)
+        self._lines.clear()
+        self._labels.clear()
+
+    def destroy(self):
+        self.set_running(False)
+        super().destroy()
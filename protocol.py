@@ -0,0 +1,485 @@
+import json
+import struct
+from array import array
+import checksum as checksums
+from metrics import RX_FRAMES, FOOTER_ERRORS, CHECKSUM_ERRORS, DISCARDED_BYTES
+
+# NumPy只在批量编解码时才用到，首次使用时再导入（导入约100ms，避免拖慢界面启动）
+np = None
+_numpy_tried = False
+
+def load_numpy():
+    """导入并返回numpy，无NumPy时返回None（批量解码退化为struct.iter_unpack）"""
+    global np, _numpy_tried
+    if not _numpy_tried:
+        _numpy_tried = True
+        try:
+            import numpy
+            np = numpy
+        except ImportError:
+            np = None
+    return np
+
+# -------------------- 字段类型 --------------------
+# 类型名 -> (struct格式字符, 字节数, numpy类型, array类型)
+FIELD_TYPES = {
+    "u8":  ("B", 1, "u1", "B"), "i8":  ("b", 1, "i1", "b"),
+    "u16": ("H", 2, "u2", "H"), "i16": ("h", 2, "i2", "h"),
+    "u32": ("I", 4, "u4", "L"), "i32": ("i", 4, "i4", "l"),
+    "u64": ("Q", 8, "u8", "Q"), "i64": ("q", 8, "i8", "q"),
+    "f32": ("f", 4, "f4", "f"), "f64": ("d", 8, "f8", "d"),
+}
+
+# 字节序（不支持struct的"@"，其按本机对齐会插入填充字节）
+BYTE_ORDERS = ("<", ">", "!", "=")
+
+# 校验算法名 -> checksum.Checksum（sum8/crc8/crc16_modbus/crc16_ccitt/crc32等，见checksum.py）
+CHECKSUMS = checksums.ALGORITHMS
+
+class ProtocolError(ValueError):
+    """协议定义或编码参数错误"""
+
+# -------------------- 协议描述 --------------------
+class ProtocolSchema:
+    """声明式帧协议：帧头 + 字段（类型/字节序）+ 校验和 + 帧尾
+
+    定义时一次性编译出各字段偏移与预计算的struct.Struct，编码/解码/解析均直接使用。
+    length_field 指定的字段记录其后字段的总字节数（编码时自动填写，解析时据此确定帧长）；
+    校验和覆盖帧头之后、校验和之前的全部字节。
+    """
+    def __init__(self, name, header, fields, footer=b"", length_field=None,
+                 checksum="sum8", endian="<"):
+        if checksum not in CHECKSUMS:
+            raise ProtocolError(f"未知的校验算法: {checksum}")
+        if endian not in BYTE_ORDERS:
+            raise ProtocolError(f"字节序必须为 {'/'.join(BYTE_ORDERS)} 之一: {endian}")
+        self.name = name
+        self.header = bytes(header)
+        self.footer = bytes(footer)
+        self.endian = endian
+        self.checksum = checksum
+        algo = CHECKSUMS[checksum]
+        self.checksum_size = algo.size
+        self._checksum_func = algo.compute if algo.size else None
+        self._checksum_endian = algo.endian or endian
+        self.length_field = length_field
+
+        # 字段布局: (名称, 类型, 字节序, 偏移)
+        self.fields = []
+        offset = len(self.header)
+        for f in fields:
+            fname, ftype = f[0], f[1]
+            fendian = f[2] if len(f) > 2 else endian
+            if fendian not in BYTE_ORDERS:
+                raise ProtocolError(f"字段{fname}字节序无效: {fendian}")
+            if ftype not in FIELD_TYPES:
+                raise ProtocolError(f"字段{fname}类型未知: {ftype}")
+            self.fields.append((fname, ftype, fendian, offset))
+            offset += FIELD_TYPES[ftype][1]
+        self.names = [f[0] for f in self.fields]
+        self.checksum_offset = offset
+        self.size = offset + self.checksum_size + len(self.footer)
+        self._compile()
+
+    def _compile(self):
+        """按字节序把连续字段合并为若干struct.Struct段，并生成整帧Struct与NumPy dtype"""
+        self._runs = []
+        for fname, ftype, fendian, offset in self.fields:
+            code = FIELD_TYPES[ftype][0]
+            if self._runs and self._runs[-1][0] == fendian:
+                self._runs[-1][2].append(code)
+                self._runs[-1][3].append(fname)
+            else:
+                self._runs.append([fendian, offset, [code], [fname]])
+        self._runs = [(off, struct.Struct(e + "".join(codes)), tuple(names))
+                      for e, off, codes, names in self._runs]
+
+        ck = {0: "", 1: "B", 2: "H", 4: "I"}[self.checksum_size]
+        self._checksum_struct = struct.Struct(self._checksum_endian + ck) if ck else None
+
+        # 所有字段同一字节序时可用单个Struct描述整帧，用于iter_unpack批量解码
+        if len(self._runs) <= 1:
+            # 校验和位置先以填充字节占位，编码后再按校验算法自身的字节序写入
+            fmt = (f"{len(self.header)}s" + "".join(FIELD_TYPES[f[1]][0] for f in self.fields)
+                   + (f"{self.checksum_size}x" if ck else "") + (f"{len(self.footer)}s" if self.footer else ""))
+            self.frame_struct = struct.Struct(self.endian + fmt)
+            self._frame_pack = self.frame_struct.pack_into
+            self._frame_prefix = (self.header,)
+            self._frame_suffix = (self.footer,) if self.footer else ()
+        else:
+            self.frame_struct = None
+
+        self._dtype = None
+
+        if self.length_field:
+            idx = self.names.index(self.length_field)
+            _, ltype, lendian, loff = self.fields[idx]
+            self._len_struct = struct.Struct(lendian + FIELD_TYPES[ltype][0])
+            self._len_offset = loff
+            # 帧长 = 长度字段之前（含）的字节 + 长度值 + 校验和 + 帧尾
+            self._len_extra = loff + self._len_struct.size + self.checksum_size + len(self.footer)
+            self.payload_len = self.checksum_offset - loff - self._len_struct.size
+            self.min_size = self._len_extra
+        else:
+            self.min_size = self.size
+
+    @property
+    def dtype(self):
+        """帧的NumPy结构化类型（首次使用时构建），无NumPy时为None"""
+        if self._dtype is None and load_numpy() is not None:
+            self._dtype = np.dtype({
+                "names": self.names,
+                "formats": [FIELD_TYPES[t][2] if FIELD_TYPES[t][1] == 1 else e.replace("!", ">") + FIELD_TYPES[t][2]
+                            for _, t, e, _ in self.fields],
+                "offsets": [f[3] for f in self.fields],
+                "itemsize": self.size,
+            })
+        return self._dtype
+
+    # ---------- 帧长与校验 ----------
+    def frame_len(self, buf, pos):
+        """根据buf[pos:]处的帧内容返回完整帧长度"""
+        if not self.length_field:
+            return self.size
+        return self._len_extra + self._len_struct.unpack_from(buf, pos + self._len_offset)[0]
+
+    def compute_checksum(self, frame):
+        """计算帧的校验值（覆盖帧头之后、校验和之前的字节）"""
+        if not self._checksum_func:
+            return 0
+        end = len(frame) - self.checksum_size - len(self.footer)
+        return self._checksum_func(frame[len(self.header):end])
+
+    def stored_checksum(self, frame):
+        """读取帧中携带的校验值"""
+        if not self._checksum_struct:
+            return 0
+        return self._checksum_struct.unpack_from(frame, len(frame) - self.checksum_size - len(self.footer))[0]
+
+    def verify(self, frame):
+        """校验帧头、帧尾与校验和"""
+        return (frame[:len(self.header)] == self.header
+                and (not self.footer or frame[-len(self.footer):] == self.footer)
+                and self.compute_checksum(frame) == self.stored_checksum(frame))
+
+    # ---------- 编码 ----------
+    def _values(self, values):
+        """将dict或按字段顺序的序列整理为字段值序列（缺省为0，长度字段自动填写）"""
+        if type(values) is tuple and len(values) == len(self.names) and not self.length_field:
+            return values
+        if isinstance(values, dict):
+            unknown = set(values) - set(self.names)
+            if unknown:
+                raise ProtocolError(f"协议{self.name}没有字段: {', '.join(sorted(unknown))}")
+            vals = [values.get(n, 0) for n in self.names]
+        else:
+            vals = list(values)
+            if len(vals) == len(self.names) - (1 if self.length_field else 0) and self.length_field:
+                vals.insert(self.names.index(self.length_field), 0)
+            if len(vals) != len(self.names):
+                raise ProtocolError(f"协议{self.name}需要{len(self.names)}个字段值")
+        if self.length_field:
+            vals[self.names.index(self.length_field)] = self.payload_len
+        return vals
+
+    def encode_into(self, buf, offset, values):
+        """将一帧编码写入buf[offset:offset+size]"""
+        vals = self._values(values)
+        hl, ck = len(self.header), self.checksum_offset
+        try:
+            if self.frame_struct:
+                # 单一字节序：整帧一次pack_into（校验和先占位）
+                self._frame_pack(buf, offset, *self._frame_prefix, *vals, *self._frame_suffix)
+            else:
+                buf[offset:offset + hl] = self.header
+                i = 0
+                for off, st, names in self._runs:
+                    st.pack_into(buf, offset + off, *vals[i:i + len(names)])
+                    i += len(names)
+                if self.footer:
+                    buf[offset + ck + self.checksum_size:offset + self.size] = self.footer
+        except struct.error as e:
+            raise ProtocolError(f"协议{self.name}字段值超出范围: {e}") from None
+        if self.checksum_size == 1:
+            buf[offset + ck] = self._checksum_func(buf[offset + hl:offset + ck])
+        elif self._checksum_struct:
+            self._checksum_struct.pack_into(buf, offset + ck, self._checksum_func(buf[offset + hl:offset + ck]))
+
+    def encode(self, values=None, **kw):
+        """编码单帧，返回bytes；字段值可以dict/序列传入或用关键字参数"""
+        buf = bytearray(self.size)
+        self.encode_into(buf, 0, kw if values is None else values)
+        return bytes(buf)
+
+    def encode_many(self, rows):
+        """将多帧编码进一个连续缓冲区（可一次write()发出），rows 为dict或字段值序列的列表"""
+        rows = rows if hasattr(rows, "__len__") else list(rows)
+        buf = bytearray(len(rows) * self.size)
+        for i, row in enumerate(rows):
+            self.encode_into(buf, i * self.size, row)
+        return buf
+
+    def encode_columns(self, columns, n):
+        """按列批量编码n帧：columns 为 {字段名: 长度n的序列或标量}，未给出的字段为0
+
+        有NumPy时整批填充结构化数组，sum8/none校验一次向量化求出；否则逐帧编码。
+        """
+        unknown = set(columns) - set(self.names)
+        if unknown:
+            raise ProtocolError(f"协议{self.name}没有字段: {', '.join(sorted(unknown))}")
+        np = load_numpy()
+        if np is None or not n:
+            cols = [columns.get(name, 0) for name in self.names]
+            cols = [c if hasattr(c, "__len__") else [c] * n for c in cols]
+            return self.encode_many(list(zip(*cols)) if n else [])
+
+        raw = np.zeros((n, self.size), dtype=np.uint8)
+        rec = raw.view(self.dtype).reshape(n)
+        for name, ftype, _, _ in self.fields:
+            if name == self.length_field:
+                rec[name] = self.payload_len
+                continue
+            col = np.asarray(columns.get(name, 0))
+            if not ftype.startswith("f"):
+                info = np.iinfo(FIELD_TYPES[ftype][2])
+                if ((col < info.min) | (col > info.max) | (col != np.floor(col))).any():
+                    raise ProtocolError(f"协议{self.name}字段{name}必须为{info.min}-{info.max}的整数")
+            rec[name] = col
+        hl, ck = len(self.header), self.checksum_offset
+        raw[:, :hl] = np.frombuffer(self.header, dtype=np.uint8)
+        if self.footer:
+            raw[:, ck + self.checksum_size:] = np.frombuffer(self.footer, dtype=np.uint8)
+        if self.checksum == "sum8":
+            raw[:, ck] = raw[:, hl:ck].sum(axis=1) & 0xFF
+        elif self._checksum_struct:
+            buf = bytearray(raw.tobytes())
+            for off in range(0, len(buf), self.size):
+                self._checksum_struct.pack_into(buf, off + ck, self._checksum_func(buf[off + hl:off + ck]))
+            return buf
+        return bytearray(raw.tobytes())
+
+    # ---------- 解码 ----------
+    def decode(self, frame):
+        """解码单帧为 {字段名: 值}，帧长不符合定义时返回None"""
+        if len(frame) != self.size:
+            return None
+        values = {}
+        for off, st, names in self._runs:
+            values.update(zip(names, st.unpack_from(frame, off)))
+        return values
+
+    def decode_many(self, frames):
+        """批量解码为列数据 {字段名: 列}，并返回被跳过（帧长不符）的帧序号
+
+        有NumPy时各列为ndarray（frombuffer结构化dtype），否则为array.array。
+        frames 也可以是已拼接好的bytes。
+        """
+        if isinstance(frames, (bytes, bytearray, memoryview)):
+            raw, skipped = bytes(frames), []
+            raw = raw[:len(raw) - len(raw) % self.size]
+        else:
+            skipped = [i for i, f in enumerate(frames) if len(f) != self.size]
+            if skipped:
+                bad = set(skipped)
+                raw = b"".join(f for i, f in enumerate(frames) if i not in bad)
+            else:
+                raw = b"".join(frames)
+
+        np = load_numpy()
+        if np is not None:
+            rec = np.frombuffer(raw, dtype=self.dtype)
+            return {n: rec[n] for n in self.names}, skipped
+
+        cols = {n: array(FIELD_TYPES[t][3]) for n, t, _, _ in self.fields}
+        if self.frame_struct:
+            first = 1  # 跳过帧头
+            for row in self.frame_struct.iter_unpack(raw):
+                for n, v in zip(self.names, row[first:first + len(self.names)]):
+                    cols[n].append(v)
+        else:
+            for i in range(0, len(raw), self.size):
+                for n, v in self.decode(raw[i:i + self.size]).items():
+                    cols[n].append(v)
+        return cols, skipped
+
+    def format(self, values):
+        """将解码结果格式化为 name=value 文本"""
+        return " ".join(f"{k}={v:.3f}" if isinstance(v, float) else f"{k}={v}" for k, v in values.items())
+
+    def parser(self, verbose=False):
+        """创建该协议的流式帧解析器"""
+        return FrameParser(self, verbose)
+
+    def parse_values(self, spec, val=None):
+        """解析 "cmd=1 x={VAL} z=0" 形式的字段赋值，{VAL}替换为val"""
+        values = {}
+        types = {n: t for n, t, _, _ in self.fields}
+        for item in spec.replace(",", " ").split():
+            if "=" not in item:
+                raise ProtocolError(f"字段赋值格式错误: {item}")
+            k, v = item.split("=", 1)
+            if k not in types:
+                raise ProtocolError(f"协议{self.name}没有字段: {k}")
+            if val is not None:
+                v = v.replace("{VAL}", repr(float(val)))
+            values[k] = float(v) if types[k].startswith("f") else int(float(v)) if "." in v else int(v, 0)
+        return values
+
+    # ---------- 序列化 ----------
+    @classmethod
+    def from_dict(cls, d):
+        """从dict（JSON）定义创建协议，header/footer 为HEX字符串"""
+        return cls(
+            d["name"], bytes.fromhex(d["header"]), [tuple(f) for f in d["fields"]],
+            footer=bytes.fromhex(d.get("footer", "")), length_field=d.get("length_field"),
+            checksum=d.get("checksum", "sum8"), endian=d.get("endian", "<"),
+        )
+
+    def to_dict(self):
+        """导出为可写入JSON的dict"""
+        return {
+            "name": self.name, "header": self.header.hex(" "), "footer": self.footer.hex(" "),
+            "endian": self.endian, "checksum": self.checksum, "length_field": self.length_field,
+            "fields": [[n, t] if e == self.endian else [n, t, e] for n, t, e, _ in self.fields],
+        }
+
+# -------------------- 流式帧解析 --------------------
+class FrameParser:
+    """通用帧解析器：在单一增长缓冲区上移动读偏移，仅偶尔压缩，避免每帧切片复制整个缓冲区"""
+    COMPACT_THRESHOLD = 64 * 1024  # 已消费数据超过该值时才压缩缓冲区
+
+    def __init__(self, schema, verbose=False):
+        self.schema = schema
+        self._buf = bytearray()
+        self._pos = 0
+        self.verbose = verbose
+        self.frames = 0
+        self.footer_errors = 0
+        self.checksum_errors = 0
+        self.discarded = 0
+
+    def _discard(self, start, end):
+        """丢弃[start, end)范围内的无效数据"""
+        if end <= start:
+            return
+        self.discarded += end - start
+        DISCARDED_BYTES.add(end - start)
+        if self.verbose:
+            junk = bytes(self._buf[start:min(end, start + 100)]).hex(' ')
+            print(f"[丢弃] 无效数据: {junk}{'...' if end - start > 100 else ''}")
+
+    def feed(self, data):
+        """追加数据，返回本次解析出的完整帧列表（每帧为独立的bytes）
+
+        帧尾与校验直接在缓冲区上按偏移检查，只为通过校验的帧复制出bytes；
+        sum8校验内联计算，省去每帧两层函数调用（小块数据时逐帧开销占主导）。
+        """
+        sc = self.schema
+        header, footer = sc.header, sc.footer
+        hl, fl, cs = len(header), len(footer), sc.checksum_size
+        checksum, min_size = sc._checksum_func, sc.min_size
+        sum8 = sc.checksum == "sum8"
+        # 长度字段为单字节时直接取值，省去unpack调用
+        len_off = sc._len_offset if sc.length_field else None
+        len_extra = sc._len_extra if sc.length_field else sc.size
+        len_byte = sc.length_field and sc._len_struct.size == 1
+        buf = self._buf
+        buf += data
+        find, startswith = buf.find, buf.startswith
+        pos, end = self._pos, len(buf)
+        frames = []
+        append = frames.append
+        while True:
+            # 查找协议头（紧接上一帧时只需一次find与比较）
+            h = find(header, pos)
+            if h != pos:
+                if h == -1:
+                    # 末尾可能是半个协议头，保留等待后续数据
+                    keep = end
+                    for k in range(min(len(header) - 1, end - pos), 0, -1):
+                        if buf[end - k:end] == header[:k]:
+                            keep = end - k
+                            break
+                    self._discard(pos, keep)
+                    pos = keep
+                    break
+                self._discard(pos, h)
+                pos = h
+
+            # 检查最小帧长度与完整帧长度
+            if end - pos < min_size:
+                break
+            if len_byte:
+                total_len = len_extra + buf[pos + len_off]
+            elif len_off is None:
+                total_len = len_extra
+            else:
+                total_len = sc.frame_len(buf, pos)
+            if end - pos < total_len:
+                break
+
+            stop = pos + total_len
+            if fl and not startswith(footer, stop - fl):
+                self.footer_errors += 1
+                FOOTER_ERRORS.add()
+                if self.verbose:
+                    print(f"[错误] 帧尾不匹配: {bytes(buf[pos:stop]).hex(' ')}")
+                pos += 1  # 从协议头下一字节重新同步
+                continue
+
+            if checksum:
+                cend = stop - cs - fl
+                if sum8:
+                    calc, recv = sum(buf[pos + hl:cend]) & 0xFF, buf[cend]
+                else:
+                    frame = bytes(buf[pos:stop])
+                    calc = checksum(frame[hl:cend - pos])
+                    recv = frame[cend - pos] if cs == 1 else sc.stored_checksum(frame)
+                if calc != recv:
+                    self.checksum_errors += 1
+                    CHECKSUM_ERRORS.add()
+                    if self.verbose:
+                        print(f"[错误] 校验和失败 (接收:{recv:02X} 计算:{calc:02X})")
+                    pos += 1
+                    continue
+
+            append(bytes(buf[pos:stop]))
+            pos = stop
+
+        # 全部消费时直接清空，否则累计到阈值再压缩
+        if pos == end:
+            buf.clear()
+            pos = 0
+        elif pos > self.COMPACT_THRESHOLD:
+            del buf[:pos]
+            pos = 0
+        self._pos = pos
+        if frames:
+            self.frames += len(frames)
+            RX_FRAMES.add(len(frames))
+        return frames
+
+    def pending(self):
+        """缓冲区中尚未解析的字节数"""
+        return len(self._buf) - self._pos
+
+# -------------------- 内置协议与注册表 --------------------
+# 下位机上报帧: 头"DX" + CMD + LEN + X(f32) + Z(f32) + 抓取 + 校验和 + 尾"XD"
+DX_RX = ProtocolSchema("DX_RX", b"DX", [("cmd", "u8"), ("len", "u8"), ("x", "f32"), ("z", "f32"), ("grip", "u8")],
+                       footer=b"XD", length_field="len")
+# 上位机下发帧: 头"DX" + CMD + X(f32) + Z(f32) + 抓取 + 校验和 + 尾"XD"
+DX_TX = ProtocolSchema("DX_TX", b"DX", [("cmd", "u8"), ("x", "f32"), ("z", "f32"), ("grip", "u8")],
+                       footer=b"XD")
+
+SCHEMAS = {s.name: s for s in (DX_RX, DX_TX)}
+
+def load_schemas(path):
+    """从JSON文件加载协议定义（单个对象或列表）并注册，返回加载的协议名列表"""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    loaded = []
+    for d in data if isinstance(data, list) else [data]:
+        schema = ProtocolSchema.from_dict(d)
+        SCHEMAS[schema.name] = schema
+        loaded.append(schema.name)
+    return loaded
@@ -1,18 +1,31 @@
 import serial
-import serial.tools.list_ports
 import threading
-from queue import Queue
+from queue import Queue, Full, Empty
 import time
+import argparse
+import asyncio
 import struct
+from array import array
+import protocol
+from checksum import SUM8
+from protocol import DX_RX, DX_TX
+from serial_io import iter_bursts, PortWatcher
+import metrics
+import tracing
+from metrics import RX_BYTES, TX_BYTES
 
 # -------------------- 协议配置 --------------------
-HEADER = bytes([0x44, 0x58])  # 协议头 "DX"
-FOOTER = bytes([0x58, 0x44])  # 协议尾 "XD"
+HEADER = DX_TX.header        # 协议头 "DX"
+FOOTER = DX_TX.footer        # 协议尾 "XD"
 DEFAULT_CMD = 0x01            # 默认命令字节
 BAUDRATE = 115200             # 默认波特率
+RX_QUEUE_SIZE = 256           # 接收队列最多缓存的批次数，满时丢弃最旧批次
 MAX_X = 1000.0                # X坐标最大值(mm)
 MAX_Z = 500.0                 # Z坐标最大值(mm)
 
+# 下位机遥测帧长度（帧格式见 protocol.DX_RX）
+TELEMETRY_LEN = DX_RX.size
+
 # -------------------- 功能函数 --------------------
 def float_to_bytes(f):
     """将浮点数转换为4字节bytes"""
@@ -31,14 +44,14 @@ def validate_input(x, z, grip):
 
 def calculate_checksum(cmd, *data_bytes):
     """计算校验和（所有字段相加取低8位）"""
-    checksum = cmd
-    for b in data_bytes:
-        checksum += b
-    return checksum & 0xFF
+    return SUM8.update(cmd, data_bytes)
+
+# 后台串口枚举：list/connect读取缓存，不再每次同步扫描
+PORTS = PortWatcher()
 
 def list_available_ports():
-    """列出所有可用串口"""
-    return [port.device for port in serial.tools.list_ports.comports()]
+    """列出所有可用串口（后台枚举的缓存，首轮枚举完成前最多等待5秒）"""
+    return PORTS.start().devices(wait=5.0)
 
 def connect_serial(port, baudrate, receive_queue):
     """连接串口并启动接收线程"""
@@ -57,84 +70,111 @@ def connect_serial(port, baudrate, receive_queue):
         print(f"\n[错误] 连接失败: {e}")
         return None
 
-def serial_receiver(ser, queue):
-    """增强型接收线程（支持协议解析）"""
-    buffer = bytearray()
+class FrameParser(protocol.FrameParser):
+    """DX上报帧解析器（protocol.DX_RX）"""
+    def __init__(self, verbose=False):
+        super().__init__(DX_RX, verbose)
+
+def serial_receiver(ser, queue, parser=None):
+    """增强型接收线程（支持协议解析），parser 默认为打印错误的DX帧解析器"""
+    parser = parser or FrameParser(verbose=True)
     while ser and ser.is_open:
         try:
-            data = ser.read(ser.in_waiting or 1)
-            if data:
-                buffer.extend(data)
-                
-                # 协议解析状态机
-                while len(buffer) >= 2:
-                    # 查找协议头
-                    header_pos = buffer.find(HEADER)
-                    if header_pos == -1:
-                        if len(buffer) > 100:
-                            print(f"[警告] 丢弃无效数据: {bytes(buffer[:100]).hex(' ')}...")
-                            buffer.clear()
-                        break
-                    
-                    # 移除头之前的无效数据
-                    if header_pos > 0:
-                        print(f"[丢弃] 无效数据: {bytes(buffer[:header_pos]).hex(' ')}")
-                        buffer = buffer[header_pos:]
-                    
-                    # 检查最小帧长度
-                    if len(buffer) < 7:  # 头2 + CMD1 + LEN1 + 校验和1 + 尾2
-                        break
-                    
-                    # 解析数据长度
-                    data_len = buffer[3]
-                    total_len = 7 + data_len  # 完整帧长度
-                    
-                    if len(buffer) < total_len:
-                        break
-                    
-                    # 提取完整帧并校验
-                    frame = bytes(buffer[:total_len])
-                    buffer = buffer[total_len:]
-                    
-                    if frame[-2:] != FOOTER:
-                        print(f"[错误] 帧尾不匹配: {frame.hex(' ')}")
-                        continue
-                    
-                    # 校验和验证
-                    calc_checksum = sum(frame[2:-3]) & 0xFF
-                    if calc_checksum != frame[-3]:
-                        print(f"[错误] 校验和失败 (接收:{frame[-3]:02X} 计算:{calc_checksum:02X})")
-                        continue
-                    
-                    queue.put(frame)
-                    
+            for data in iter_bursts(ser):
+                RX_BYTES.add(len(data))
+                if tracing.ENABLED:
+                    t0 = time.perf_counter()
+                    frames = parser.feed(data)
+                    tracing.record_since("cli.parse", t0)
+                else:
+                    frames = parser.feed(data)
+                if frames:
+                    queue.put((time.time(), frames))  # 按批入队，附带接收时间
         except Exception as e:
             print(f"[接收错误] {e}")
             time.sleep(0.01)
 
+# -------------------- 批量解码 --------------------
+def decode_frames(frames, timestamps=None):
+    """批量解码已校验的遥测帧为列数据: cmd/x/z/grip/timestamp
+
+    frames 为帧列表（或已拼接好的bytes），长度不是TELEMETRY_LEN的帧会被跳过并计入skipped；
+    timestamps 可为与帧一一对应的序列或整批共用的单个时间（默认当前时间）。
+    有NumPy时各列为ndarray（frombuffer结构化dtype），否则为array.array。
+    """
+    cols, skipped = DX_RX.decode_many(frames)
+    np = protocol.load_numpy()  # decode_many已按需导入，这里只取模块
+    n = len(cols["x"])
+    if timestamps is None:
+        timestamps = time.time()
+    if isinstance(timestamps, (int, float)):
+        ts = [float(timestamps)] * n
+    elif skipped:
+        bad = set(skipped)
+        ts = [t for i, t in enumerate(timestamps) if i not in bad]
+    else:
+        ts = list(timestamps)
+    ts = np.asarray(ts, dtype=np.float64) if np is not None else array('d', ts)
+    return {"cmd": cols["cmd"], "x": cols["x"], "z": cols["z"], "grip": cols["grip"],
+            "timestamp": ts, "skipped": len(skipped)}
+
+def decode_capture(buf, timestamp=None):
+    """从原始抓包缓冲区中解析并批量解码全部有效遥测帧"""
+    return decode_frames(FrameParser().feed(buf), timestamp)
+
 # -------------------- 数据打包函数 --------------------
+class PacketEncoder:
+    """DX下发帧编码器（protocol.DX_TX）：可写入复用缓冲区或整条轨迹一次编码"""
+    SIZE = DX_TX.size
+
+    def pack_into(self, buf, offset, cmd, x, z, grip):
+        """将一帧写入buf[offset:offset+SIZE]"""
+        DX_TX.encode_into(buf, offset, (cmd, x, z, grip))
+
+    def build(self, cmd, x, z, grip):
+        """构建单帧，返回bytes"""
+        return DX_TX.encode((cmd, x, z, grip))
+
+    def build_many(self, points, cmd=DEFAULT_CMD):
+        """将轨迹点序列[(x, z, grip), ...]编码进一个连续缓冲区，可一次write()发出"""
+        points = points if hasattr(points, "__len__") else list(points)
+        n = len(points)
+        np = protocol.load_numpy() if n else None
+        if np is not None:
+            pts = np.asarray(points, dtype=np.float64).reshape(n, 3)
+            return DX_TX.encode_columns({"cmd": cmd, "x": pts[:, 0], "z": pts[:, 1], "grip": pts[:, 2]}, n)
+        return DX_TX.encode_many([(cmd, x, z, grip) for x, z, grip in points])
+
+_ENCODER = PacketEncoder()
+
 def build_packet(cmd, x, z, grip):
     """构建协议数据包"""
-    # 将浮点数转换为字节
-    x_bytes = float_to_bytes(x)
-    z_bytes = float_to_bytes(z)
-    
-    # 构造数据域
-    data = bytes([cmd]) + x_bytes + z_bytes + bytes([grip])
-    data_len = len(data) - 1  # 不包含cmd的长度
-    
-    # 计算校验和
-    checksum = calculate_checksum(cmd, *data[1:])
-    
-    # 完整协议帧
-    return HEADER + data + bytes([checksum]) + FOOTER
+    return _ENCODER.build(cmd, x, z, grip)
 
 # -------------------- 主程序 --------------------
-def main():
-    current_ser = None
-    current_cmd = DEFAULT_CMD
-    receive_queue = Queue()
+def print_frames(frames, cols):
+    """打印一批接收帧及其解码结果"""
+    i = 0
+    for frame in frames:
+        print(f"\n[RX] {frame.hex(' ').upper()}")
+        if len(frame) != TELEMETRY_LEN:
+            print(f"[解析错误] 帧长度{len(frame)}字节，应为{TELEMETRY_LEN}字节")
+            continue
+        x, z, grip = cols["x"][i], cols["z"][i], cols["grip"][i]
+        i += 1
+        print(f"解析结果: X={x:.2f}mm Z={z:.2f}mm 抓取={'是' if grip else '否'}")
 
+def show_frames(ts, frames):
+    """打印一批接收帧（追踪开启时记录排队与打印耗时）"""
+    if not tracing.ENABLED:
+        print_frames(frames, decode_frames(frames, ts))
+        return
+    t0 = time.perf_counter()
+    tracing.record("cli.queue", max(time.time() - ts, 0.0))
+    print_frames(frames, decode_frames(frames, ts))
+    tracing.record_since("cli.print", t0)
+
+def print_help(current_cmd):
     print("=== 机械臂控制协议调试工具 ===")
     print("命令:")
     print("  list    - 列出串口")
@@ -144,22 +184,66 @@ def main():
     print("  exit    - 退出程序")
     print("数据格式: X坐标(0-{}) Z坐标(0-{}) 抓取标志(0/1)".format(MAX_X, MAX_Z))
 
+def start_metrics(args, rx_depth):
+    """按命令行参数启动周期指标输出，未开启时返回None"""
+    if not args.metrics and not args.metrics_json:
+        return None
+    metrics.REGISTRY.gauge("rx_queue", rx_depth)
+    return metrics.Reporter(args.metrics or 1.0, out=print if args.metrics else None,
+                            json_path=args.metrics_json).start()
+
+class FrameQueue:
+    """接收线程到命令行主循环的有界队列：满时丢弃最旧批次并计数（与AsyncFrameQueue一致）
+
+    默认模式下只在input()返回后才取出显示，长时间不按回车时内存不会无限增长。
+    """
+    def __init__(self, maxsize=RX_QUEUE_SIZE):
+        self.queue = Queue(maxsize)
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def put(self, item):
+        with self._lock:
+            while True:
+                try:
+                    self.queue.put_nowait(item)
+                    return
+                except Full:
+                    try:
+                        self.queue.get_nowait()
+                        self.dropped += 1
+                    except Empty:
+                        pass
+
+    def drain(self):
+        """取出当前全部批次"""
+        items = []
+        while True:
+            try:
+                items.append(self.queue.get_nowait())
+            except Empty:
+                return items
+
+def main(args=None):
+    """同步控制台（默认模式），args为None时解析命令行参数"""
+    if args is None:
+        args = parse_args()
+    current_ser = None
+    current_cmd = DEFAULT_CMD
+    receive_queue = FrameQueue()
+    start_metrics(args, receive_queue.queue.qsize)
+    reported = 0
+
+    print_help(current_cmd)
+
     try:
         while True:
             # 实时处理接收数据
-            while not receive_queue.empty():
-                frame = receive_queue.get()
-                print(f"\n[RX] {frame.hex(' ').upper()}")
-                
-                # 解析数据包
-                try:
-                    cmd = frame[2]
-                    x = struct.unpack('f', frame[4:8])[0]
-                    z = struct.unpack('f', frame[8:12])[0]
-                    grip = frame[12]
-                    print(f"解析结果: X={x:.2f}mm Z={z:.2f}mm 抓取={'是' if grip else '否'}")
-                except Exception as e:
-                    print(f"[解析错误] {e}")
+            for ts, frames in receive_queue.drain():
+                show_frames(ts, frames)
+            if receive_queue.dropped != reported:
+                print(f"[警告] 等待输入期间接收队列已满，已丢弃最旧的{receive_queue.dropped - reported}批数据")
+                reported = receive_queue.dropped
 
             # 用户输入处理
             status = []
@@ -234,7 +318,8 @@ def main():
 
                     # 构建并发送数据包
                     packet = build_packet(current_cmd, x, z, grip)
-                    current_ser.write(packet)
+                    sent = current_ser.write(packet)
+                    TX_BYTES.add(len(packet) if sent is None else sent)
                     
                     print(f"\n[TX] {packet.hex(' ').upper()}")
                     print(f"发送数据: X={x:.2f}mm Z={z:.2f}mm 抓取={'是' if grip else '否'}")
@@ -255,5 +340,173 @@ def main():
         if current_ser:
             current_ser.close()
 
+# -------------------- 异步控制台 --------------------
+class AsyncFrameQueue:
+    """接收线程到事件循环的有界队列：put()可在任意线程调用，满时丢弃最旧批次并计数"""
+    def __init__(self, loop, maxsize=RX_QUEUE_SIZE):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize)
+        self.dropped = 0
+
+    def put(self, item):
+        self.loop.call_soon_threadsafe(self._put, item)
+
+    def _put(self, item):
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(item)
+
+    async def get(self):
+        return await self.queue.get()
+
+async def ainput(prompt=""):
+    """在后台线程中读取一行输入，不阻塞事件循环
+
+    使用守护线程而非默认线程池：Ctrl+C退出时不必等待阻塞中的input()返回。
+    """
+    loop = asyncio.get_running_loop()
+    fut = loop.create_future()
+
+    def settle(result, exc):
+        if not fut.done():
+            fut.set_exception(exc) if exc else fut.set_result(result)
+
+    def run():
+        try:
+            result, exc = input(prompt), None
+        except BaseException as e:
+            result, exc = None, e
+        try:
+            loop.call_soon_threadsafe(settle, result, exc)
+        except RuntimeError:  # 事件循环已关闭
+            pass
+
+    threading.Thread(target=run, daemon=True).start()
+    return await fut
+
+async def print_received(rx):
+    """接收帧一到即打印，不等待用户输入"""
+    reported = 0
+    while True:
+        ts, frames = await rx.get()
+        show_frames(ts, frames)
+        if rx.dropped != reported:
+            print(f"[警告] 显示跟不上接收，已丢弃{rx.dropped - reported}批数据")
+            reported = rx.dropped
+
+async def async_main(args=None):
+    """异步控制台：接收帧实时打印，同时并发读取命令，发送为可等待的写操作"""
+    if args is None:
+        args = parse_args()
+    loop = asyncio.get_running_loop()
+    rx = AsyncFrameQueue(loop)
+    start_metrics(args, rx.queue.qsize)
+    printer = asyncio.create_task(print_received(rx))
+    current_ser = None
+    current_cmd = DEFAULT_CMD
+
+    print_help(current_cmd)
+    try:
+        while True:
+            status = f"端口:{current_ser.port}" if current_ser and current_ser.is_open else "[未连接]"
+            try:
+                user_input = (await ainput(f"\n[{status}|CMD:0x{current_cmd:02X}] 输入: ")).strip()
+            except EOFError:
+                break
+            cmd = user_input.lower()
+
+            if cmd == 'exit':
+                break
+
+            elif cmd == 'list':
+                ports = list_available_ports()
+                print("\n可用串口:" + ("\n".join(ports) if ports else " 无"))
+
+            elif cmd == 'connect':
+                ports = list_available_ports()
+                if not ports:
+                    print("无可用串口")
+                    continue
+                print("\n选择串口:")
+                for i, port in enumerate(ports):
+                    print(f"{i+1}. {port}")
+                try:
+                    choice = int(await ainput("序号: ")) - 1
+                    if current_ser:
+                        current_ser.close()
+                    current_ser = connect_serial(ports[choice], BAUDRATE, rx)
+                except (ValueError, IndexError):
+                    print("输入无效")
+
+            elif cmd == 'close':
+                if current_ser:
+                    current_ser.close()
+                    print("已断开连接")
+                else:
+                    print("当前未连接")
+
+            elif cmd.startswith('cmd '):
+                try:
+                    new_cmd = int(user_input[4:], 16)
+                    if 0 <= new_cmd <= 255:
+                        current_cmd = new_cmd
+                        print(f"命令字节已设为 0x{current_cmd:02X}")
+                    else:
+                        print("CMD需在0x00-0xFF之间")
+                except ValueError:
+                    print("格式错误 (示例: cmd 0x05)")
+
+            elif current_ser and current_ser.is_open:
+                try:
+                    x, z, grip = map(float, user_input.split())
+                    grip = int(grip)
+                    if errors := validate_input(x, z, grip):
+                        print("\n".join(f"[错误] {err}" for err in errors))
+                        continue
+                    packet = build_packet(current_cmd, x, z, grip)
+                    sent = await loop.run_in_executor(None, current_ser.write, packet)
+                    TX_BYTES.add(len(packet) if sent is None else sent)
+                    print(f"\n[TX] {packet.hex(' ').upper()}")
+                    print(f"发送数据: X={x:.2f}mm Z={z:.2f}mm 抓取={'是' if grip else '否'}")
+                except ValueError:
+                    print("[错误] 输入格式: X坐标 Z坐标 抓取标志 (如: 150.5 300.0 1)")
+                except Exception as e:
+                    print(f"[发送错误] {e}")
+                    current_ser.close()
+
+            else:
+                print("[错误] 请先连接串口")
+    finally:
+        printer.cancel()
+        if current_ser:
+            current_ser.close()
+    print("程序已退出")
+
+def parse_args(argv=None):
+    """解析命令行参数（argv为None时取sys.argv）"""
+    ap = argparse.ArgumentParser(description="机械臂控制协议调试工具")
+    ap.add_argument("--async", dest="use_async", action="store_true",
+                    help="异步控制台：接收数据实时显示，不必等待按回车")
+    ap.add_argument("--metrics", type=float, metavar="SEC", default=0,
+                    help="每隔SEC秒打印一行收发速率/帧率/错误计数")
+    ap.add_argument("--metrics-json", metavar="PATH", help="每秒（或按--metrics间隔）写出指标JSON快照供外部采集")
+    ap.add_argument("--trace", metavar="PATH", help="记录各阶段延迟直方图，退出时打印汇总并写出JSON")
+    return ap.parse_args(argv)
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    args = parse_args()
+    tracing.enable(bool(args.trace))
+    PORTS.start()  # 提示符出现前即开始枚举，首次list/connect无需等待
+    try:
+        if args.use_async:
+            try:
+                asyncio.run(async_main(args))
+            except KeyboardInterrupt:
+                print("\n程序被中断")
+        else:
+            main(args)
+    finally:
+        if args.trace:
+            print(tracing.format_table())
+            tracing.dump(args.trace)
\ No newline at end of file
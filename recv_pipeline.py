@@ -0,0 +1,312 @@
+import codecs
+import math
+import threading
+import time
+from collections import deque
+from itertools import islice
+
+# -------------------- 接收合并缓冲 --------------------
+class CoalescingBuffer:
+    """线程侧接收缓冲：读线程追加文本块，UI线程按帧预算一次性取出"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._chunks = []
+        self._stamps = []
+        self.stamps = []    # 最近一次取出的各块时间戳（仅追踪开启时附带）
+        self.reset_stats()
+
+    def append(self, s, t=None):
+        """追加一块文本（读线程调用），t 为可选的读取时间戳（time.perf_counter）"""
+        with self._lock:
+            self._chunks.append(s)
+            if t is not None:
+                self._stamps.append(t)
+
+    def drain(self):
+        """取出全部待刷新文本并合并为一个字符串（UI线程调用）"""
+        with self._lock:
+            chunks, self._chunks = self._chunks, []
+            self.stamps, self._stamps = self._stamps, []
+        if not chunks:
+            return ""
+        n = len(chunks)
+        self.flushes += 1
+        self.merged_total += n
+        self.last_merged = n
+        if n > self.max_merged:
+            self.max_merged = n
+        return "".join(chunks)
+
+    def pending(self):
+        """待刷新的块数"""
+        return len(self._chunks)
+
+    def reset_stats(self):
+        """清零合并计数"""
+        self.flushes = 0
+        self.merged_total = 0
+        self.last_merged = 0
+        self.max_merged = 0
+
+    def stats(self):
+        """合并计数：刷新次数、累计块数、最近/平均/最大每次合并块数"""
+        return {
+            "flushes": self.flushes,
+            "chunks": self.merged_total,
+            "last": self.last_merged,
+            "avg": self.merged_total / self.flushes if self.flushes else 0.0,
+            "max": self.max_merged,
+        }
+
+# -------------------- 回滚上限 --------------------
+class Scrollback:
+    """文本框回滚上限：记录每批插入的行数/字节数，超限时一次性裁剪最旧的若干行到低水位"""
+    def __init__(self, mode="lines", limit=0, low_water=0.8):
+        self.mode = mode            # "lines" 按行 / "bytes" 按字节
+        self.limit = limit          # 0 表示不限制
+        self.low_water = low_water  # 裁剪后保留到上限的比例，避免每批都裁剪
+        self._batches = deque()     # 每批 [行数, 字节数]，裁剪可只去掉最旧一批的前若干行
+        self.lines = 0
+        self.bytes = 0
+
+    def configure(self, mode, limit):
+        """更新限制方式与上限"""
+        self.mode, self.limit = mode, limit
+
+    def fit(self, s):
+        """一次插入超过上限的文本（如隐藏视图补齐积压）时只保留能显示的末尾整行，返回(文本, 是否截断)"""
+        if not self.limit:
+            return s, False
+        if self.mode == "lines":
+            i = len(s) - 1 if s.endswith("\n") else len(s)
+            for _ in range(self.limit):
+                i = s.rfind("\n", 0, i)
+                if i == -1:
+                    return s, False
+            return s[i + 1:], True
+        # 按UTF-8字节计（与add一致），字符数的4倍都不超限时不必编码
+        if len(s) * 4 <= self.limit:
+            return s, False
+        b = s.encode("utf-8", errors="ignore")
+        if len(b) <= self.limit:
+            return s, False
+        tail = b[-self.limit:].decode("utf-8", errors="ignore")
+        return tail[tail.find("\n") + 1:], True
+
+    def add(self, s):
+        """记录一批已插入的文本，返回需要从头部删除的行数（0表示无需裁剪）"""
+        n_lines, n_bytes = s.count("\n"), len(s.encode("utf-8", errors="ignore"))
+        self._batches.append([n_lines, n_bytes])
+        self.lines += n_lines
+        self.bytes += n_bytes
+        if not self.limit:
+            return 0
+        used = self.lines if self.mode == "lines" else self.bytes
+        if used <= self.limit:
+            return 0
+        # 裁剪到低水位：最旧的批整批去掉，最后涉及的一批按行部分去掉（字节按该批平均行长折算）
+        target = self.limit * self.low_water
+        drop = 0
+        while used > target and self._batches:
+            batch = self._batches[0]
+            bl, bb = batch
+            if self.mode == "lines":
+                k = min(bl, math.ceil(used - target))
+            else:
+                k = min(bl, math.ceil((used - target) * bl / bb)) if bb else bl
+            if k == bl:
+                self._batches.popleft()
+                kb = bb
+            else:
+                kb = bb * k // bl
+                batch[0] -= k
+                batch[1] -= kb
+            self.lines -= k
+            self.bytes -= kb
+            drop += k
+            used = self.lines if self.mode == "lines" else self.bytes
+        return drop
+
+    def clear(self):
+        """文本框清空时同步清零"""
+        self._batches.clear()
+        self.lines = 0
+        self.bytes = 0
+
+# -------------------- 接收记录文件 --------------------
+class TextSpill:
+    """将完整接收历史追加写入磁盘文件，界面裁剪后内容不丢失"""
+    def __init__(self):
+        self._f = None
+        self.path = None
+
+    @property
+    def is_open(self):
+        return self._f is not None
+
+    def open(self, path, encoding="utf-8"):
+        """打开记录文件（追加模式，带缓冲）"""
+        self.close()
+        self._f = open(path, "a", encoding=encoding, buffering=1 << 16)
+        self.path = path
+
+    def write(self, s):
+        """写入一批文本（未打开时忽略）"""
+        if self._f:
+            self._f.write(s)
+
+    def close(self):
+        """刷新并关闭记录文件"""
+        if self._f:
+            self._f.close()
+            self._f = None
+
+# -------------------- HEX渲染 --------------------
+# 可打印ASCII原样保留，其余字节显示为"."
+_ASCII_TABLE = bytes(b if 0x20 <= b < 0x7F else 0x2E for b in range(256))
+
+def to_hex(b):
+    """字节转大写HEX，字节之间以空格分隔（整段一次C级转换）"""
+    return b.hex(' ').upper()
+
+class HexDumper:
+    """经典 偏移/HEX/ASCII 十六进制转储：每行固定16字节，偏移跨数据块连续累计"""
+    def __init__(self):
+        self.offset = 0
+
+    def reset(self):
+        """偏移归零"""
+        self.offset = 0
+
+    def format(self, b):
+        """渲染一块数据为若干行（每行以换行结尾）"""
+        if not b:
+            return ""
+        hexs = b.hex(' ').upper()
+        asc = b.translate(_ASCII_TABLE).decode("ascii")
+        off = self.offset
+        full = len(b) - len(b) % 16
+        # 整行：前后8字节之间多留一个空格
+        rows = [f"{off + i:08X}  {hexs[i * 3:i * 3 + 23]}  {hexs[i * 3 + 24:i * 3 + 47]}  |{asc[i:i + 16]}|\n"
+                for i in range(0, full, 16)]
+        if full < len(b):
+            h = hexs[full * 3:]
+            h = h[:23] + " " + h[23:] if len(h) > 23 else h
+            rows.append(f"{off + full:08X}  {h:<48}  |{asc[full:]}|\n")
+        self.offset += len(b)
+        return "".join(rows)
+
+# -------------------- 流式文本解码 --------------------
+class StreamDecoder:
+    """流式文本解码：codecs增量解码器保留跨块的半个多字节字符，可选按分隔符组装整行"""
+    def __init__(self, encoding="utf-8", delimiter=None, errors="ignore"):
+        self.encoding = encoding
+        self.delimiter = delimiter  # None 表示不分行，每块解码结果原样输出
+        self._dec = codecs.getincrementaldecoder(encoding)(errors=errors)
+        self._partial = ""
+        self._partial_since = None
+
+    def feed(self, b):
+        """解码一块数据，返回本次得到的完整文本段列表（分行模式下不含分隔符）"""
+        text = self._dec.decode(b)
+        if not self.delimiter:
+            return [text] if text else []
+        if not text:
+            return []
+        parts = (self._partial + text).split(self.delimiter)
+        self._partial = parts.pop()
+        if not self._partial:
+            self._partial_since = None
+        elif parts or self._partial_since is None:
+            self._partial_since = time.monotonic()
+        if self.delimiter == "\n":
+            parts = [p[:-1] if p.endswith("\r") else p for p in parts]
+        return parts
+
+    def stale(self, timeout):
+        """未完成的行是否已等待超过timeout秒（例如没有换行的提示符）"""
+        return self._partial_since is not None and time.monotonic() - self._partial_since >= timeout
+
+    def take_partial(self):
+        """取出当前未完成的行（不影响增量解码器中的半个字符）"""
+        p, self._partial, self._partial_since = self._partial, "", None
+        return [p] if p else []
+
+    def flush(self):
+        """结束解码：返回剩余的未完成行与解码器中残留的字符"""
+        tail = self._dec.decode(b"", final=True)
+        self._partial += tail
+        return self.take_partial()
+
+# -------------------- 共享接收记录 --------------------
+class ReceiveLog:
+    """按回滚上限限长的共享接收记录：各显示视图只保存游标（块序号），按需取出游标之后的新内容
+
+    隐藏的视图不必随每次刷新插入文本，显示时用 since() 一次取回积压内容；
+    游标早于已丢弃的最旧块时视图需要用现存内容重建。
+    记录只保留文本框回滚上限能显示的内容（configure与Scrollback相同的方式/上限），不限制时以max_chars为上限。
+    """
+    def __init__(self, max_chars=4 * 1024 * 1024):
+        self.max_chars = max_chars
+        self.mode, self.limit = "lines", 0
+        self._chunks = deque()
+        self._sizes = deque()   # 各块 (行数, UTF-8字节数)，与Scrollback计数方式一致
+        self.size = 0           # 字符数
+        self.lines = 0
+        self.bytes = 0
+        self.base = 0   # 最旧块的序号
+
+    @property
+    def end(self):
+        """下一块的序号（视图追上记录后的游标）"""
+        return self.base + len(self._chunks)
+
+    def configure(self, mode, limit):
+        """按文本框回滚上限设置保留量（"lines"/"bytes"，0表示不限制）"""
+        if (mode, limit) != (self.mode, self.limit):
+            self.mode, self.limit = mode, limit
+            self._trim()
+
+    def append(self, s):
+        n, nb = s.count("\n"), len(s.encode("utf-8", errors="ignore"))
+        self._chunks.append(s)
+        self._sizes.append((n, nb))
+        self.size += len(s)
+        self.lines += n
+        self.bytes += nb
+        self._trim()
+
+    def _trim(self):
+        """丢弃最旧的块，只要剩余内容仍填得满回滚上限"""
+        chunks, sizes = self._chunks, self._sizes
+        while len(chunks) > 1:
+            if not self.limit:
+                drop = self.size > self.max_chars
+            elif self.mode == "lines":
+                drop = self.lines - sizes[0][0] >= self.limit
+            else:
+                drop = self.bytes - sizes[0][1] >= self.limit
+            if not drop:
+                break
+            n, nb = sizes.popleft()
+            self.size -= len(chunks.popleft())
+            self.lines -= n
+            self.bytes -= nb
+            self.base += 1
+
+    def since(self, cursor):
+        """返回(游标之后的文本, 是否连续)；不连续时文本为全部现存内容"""
+        if cursor < self.base:
+            return "".join(self._chunks), False
+        return "".join(islice(self._chunks, cursor - self.base, None)), True
+
+    def text(self):
+        return "".join(self._chunks)
+
+    def clear(self):
+        self.base = self.end
+        self._chunks.clear()
+        self._sizes.clear()
+        self.size = 0
+        self.lines = 0
+        self.bytes = 0
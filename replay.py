@@ -0,0 +1,261 @@
+import argparse
+import math
+import os
+import threading
+import time
+from queue import Queue, Empty
+import serial
+import capture
+import protocol
+
+# -------------------- 回放目标 --------------------
+class PtyTarget:
+    """虚拟串口（POSIX pty）：回放数据写入主端，应用像打开真实串口一样打开 port（从端路径）"""
+    def __init__(self):
+        import tty
+        self.master, self._slave = os.openpty()
+        tty.setraw(self._slave)  # 关闭回显与换行转换，按原始字节传递
+        self.port = os.ttyname(self._slave)
+
+    def write(self, data):
+        """阻塞写入全部数据；读端跟不上时pty缓冲写满，写入随之变慢"""
+        view = memoryview(data)
+        while view:
+            view = view[os.write(self.master, view):]
+
+    def close(self):
+        os.close(self.master)
+        os.close(self._slave)
+
+class UrlTarget:
+    """写入任意pyserial端口或URL（如 socket://host:port、虚拟串口对的另一端）"""
+    def __init__(self, url, **settings):
+        self.port = url
+        self.ser = serial.serial_for_url(url, **settings)
+        self.write = self.ser.write
+
+    def close(self):
+        self.ser.close()
+
+def open_target(spec="pty"):
+    """按描述创建回放目标：'pty' 为虚拟串口对，其它按pyserial端口名/URL打开"""
+    return PtyTarget() if spec == "pty" else UrlTarget(spec)
+
+# -------------------- 回放引擎 --------------------
+class Replayer:
+    """按录制时的时间节奏把抓包数据写入sink：原速、N倍速，speed=0 时尽快写出
+
+    截止时间按回放开始时刻绝对计算，不累积误差；落后时把到期的记录合并为一次写入。
+    """
+    def __init__(self, reader, sink, speed=1.0, directions=(capture.RX,), ports=None,
+                 start=0.0, end=None, repeat=1, max_batch=65536, on_done=None):
+        self.reader = reader
+        self.sink = sink
+        self.speed = speed
+        self.directions = directions
+        self.ports = ports          # 只回放这些端口的数据，None=全部
+        self.start = start
+        self.end = end
+        self.repeat = repeat        # 循环回放次数，0=无限
+        self.max_batch = max_batch
+        self.on_done = on_done
+        self.bytes = 0
+        self.records = 0
+        self.max_late = 0.0
+        self.elapsed = 0.0
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._running = False
+        self._on_exit = []          # 回放线程退出后执行的清理函数
+        self._thread = None
+
+    def start_thread(self):
+        self._running = True        # 线程尚未进入run()时stop()也要等它退出
+        self._thread = threading.Thread(target=self.run, daemon=True)
+        self._thread.start()
+        return self
+
+    def run(self):
+        """回放主循环（可直接在调用线程中运行）"""
+        sink, speed, ports = self.sink, self.speed, self.ports
+        span = (self.end if self.end is not None else self.reader.duration) - self.start
+        pending = []
+        size = 0
+        with self._lock:
+            self._running = True
+        t0 = time.perf_counter()
+        n = 0
+        try:
+            while not self._stop.is_set() and (not self.repeat or n < self.repeat):
+                shift = n * span - self.start
+                for rec in self.reader.records(self.start, self.end, self.directions):
+                    if self._stop.is_set():
+                        break
+                    if ports and rec.port not in ports:
+                        continue
+                    if speed:
+                        due = t0 + (rec.t + shift) / speed
+                        now = time.perf_counter()
+                        if due - now > 0.001:
+                            # 等待前先写出已到期的数据
+                            if pending:
+                                sink(b"".join(pending))
+                                pending, size = [], 0
+                            # 可被stop()立即唤醒
+                            if self._stop.wait(max(due - time.perf_counter(), 0)):
+                                break
+                        elif now - due > self.max_late:
+                            self.max_late = now - due
+                    pending.append(rec.data)
+                    size += len(rec.data)
+                    self.records += 1
+                    self.bytes += len(rec.data)
+                    if size >= self.max_batch:
+                        sink(b"".join(pending))
+                        pending, size = [], 0
+                n += 1
+            if pending:
+                sink(b"".join(pending))
+        finally:
+            self.elapsed = time.perf_counter() - t0
+            try:
+                if self.on_done:
+                    self.on_done(self)
+            finally:
+                with self._lock:
+                    self._running = False
+                    hooks, self._on_exit = self._on_exit, []
+                for f in hooks:
+                    f()
+
+    def stop(self, on_exit=None):
+        """停止回放；on_exit 在回放循环退出后执行（join超时时由回放线程在退出时执行），
+        用于关闭reader与写入目标，避免在回放线程仍在读写时关闭它们"""
+        self._stop.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(1.0)
+        if on_exit:
+            with self._lock:
+                if self._running:
+                    self._on_exit.append(on_exit)
+                    return
+            on_exit()
+
+    def stats(self):
+        return {
+            "records": self.records,
+            "bytes": self.bytes,
+            "elapsed_s": self.elapsed,
+            "bytes_per_s": self.bytes / self.elapsed if self.elapsed else 0.0,
+            "max_late_ms": self.max_late * 1000,
+        }
+
+# -------------------- 无界面最大速率测试 --------------------
+def _expected_frames(reader, schema, directions=(capture.RX,)):
+    """离线解析一遍抓包，得到每轮回放应收到的帧数"""
+    parser = schema.parser()
+    return sum(len(parser.feed(r.data)) for r in reader.records(directions=directions))
+
+def run_pipeline_step(reader, schema, speed, step=2.0, drain=0.5):
+    """以给定倍速回放约step秒，数据经pty进入py_serial.serial_receiver及解码，返回本级统计"""
+    import py_serial
+    per_pass = _expected_frames(reader, schema)
+    repeat = max(1, math.ceil(step * speed / reader.duration)) if speed and reader.duration else 1
+    target = PtyTarget()
+    ser = serial.Serial(target.port, timeout=0.1)
+    q = Queue()
+    got = [0]
+    done = threading.Event()
+
+    def consume():
+        # 与命令行主循环相同：批量取出并解码
+        while not done.is_set() or not q.empty():
+            try:
+                _, frames = q.get(timeout=0.05)
+            except Empty:
+                continue
+            schema.decode_many(frames)
+            got[0] += len(frames)
+
+    threading.Thread(target=py_serial.serial_receiver, args=(ser, q, schema.parser()), daemon=True).start()
+    consumer = threading.Thread(target=consume, daemon=True)
+    consumer.start()
+    rp = Replayer(reader, target.write, speed=speed, repeat=repeat)
+    rp.run()
+    expected = per_pass * repeat
+    deadline = time.perf_counter() + drain
+    while got[0] < expected and time.perf_counter() < deadline:
+        time.sleep(0.005)
+    lag = time.perf_counter() - (deadline - drain)
+    done.set()
+    consumer.join(1.0)
+    ser.close()
+    target.close()
+    res = rp.stats()
+    res.update(speed=speed, frames=got[0], expected=expected, drain_ms=lag * 1000)
+    return res
+
+def measure_max_rate(reader, schema, speeds=None, step=2.0, late_tolerance=0.05, drain=0.5):
+    """倍速逐级翻倍回放，直到回放写入明显落后或接收端未能在drain秒内处理完，返回最大可持续速率"""
+    speeds = speeds or [2 ** i for i in range(0, 15)]
+    steps = []
+    best = None
+    for speed in speeds:
+        res = run_pipeline_step(reader, schema, speed, step, drain)
+        res["sustained"] = res["frames"] >= res["expected"] and res["max_late_ms"] <= late_tolerance * 1000
+        steps.append(res)
+        if not res["sustained"]:
+            break
+        best = res
+    return best, steps
+
+# -------------------- 主程序 --------------------
+def main():
+    ap = argparse.ArgumentParser(description="抓包回放：经虚拟串口把录制数据送入接收管线")
+    ap.add_argument("capture", help="capture.py录制的抓包文件")
+    ap.add_argument("--speed", type=float, default=1.0, help="回放倍速，0=尽快（默认1）")
+    ap.add_argument("--to", default="pty", help="回放目标：pty（默认，虚拟串口对）或pyserial端口名/URL")
+    ap.add_argument("--tx", action="store_true", help="同时回放发送方向的数据")
+    ap.add_argument("--repeat", type=int, default=1, help="循环次数，0=无限")
+    ap.add_argument("--ramp", action="store_true", help="无界面测试：逐级提高倍速，报告接收管线的最大可持续速率")
+    ap.add_argument("--protocol", default="DX_RX", help=f"--ramp 时用于解析的协议: {', '.join(protocol.SCHEMAS)}")
+    ap.add_argument("--step", type=float, default=2.0, help="--ramp 每级持续秒数")
+    args = ap.parse_args()
+
+    with capture.CaptureReader(args.capture) as reader:
+        print(f"抓包: {args.capture} | {reader.duration:.2f}s | 端口: {', '.join(reader.ports.values()) or '无'}"
+              + ("" if reader.complete else " | 文件未正常结束，已扫描重建索引"))
+        if args.ramp:
+            schema = protocol.SCHEMAS[args.protocol]
+            if not reader.duration or not _expected_frames(reader, schema):
+                ap.error(f"抓包中没有可按{args.protocol}解析的接收帧")
+            best, steps = measure_max_rate(reader, schema, step=args.step)
+            for s in steps:
+                print(f"  {s['speed']:>6g}x  {s['bytes_per_s'] / 1024:10.1f} KB/s  帧 {s['frames']}/{s['expected']}"
+                      f"  最大延迟 {s['max_late_ms']:.1f}ms  {'OK' if s['sustained'] else '落后'}")
+            if best:
+                print(f"最大可持续回放: {best['speed']:g}x ({best['bytes_per_s'] / 1024:.1f} KB/s)")
+            else:
+                print("原速回放即已落后")
+            return
+
+        target = open_target(args.to)
+        try:
+            if isinstance(target, PtyTarget):
+                input(f"虚拟串口: {target.port}\n请在串口助手或 py_serial 中打开该端口后按回车开始回放...")
+            directions = (capture.RX, capture.TX) if args.tx else (capture.RX,)
+            rp = Replayer(reader, target.write, speed=args.speed, directions=directions, repeat=args.repeat)
+            try:
+                rp.run()
+            except KeyboardInterrupt:
+                rp.stop()
+            st = rp.stats()
+            print(f"回放完成: {st['records']}块 {st['bytes']}字节 用时{st['elapsed_s']:.2f}s"
+                  f" | {st['bytes_per_s'] / 1024:.1f}KB/s | 最大延迟{st['max_late_ms']:.1f}ms")
+            if isinstance(target, PtyTarget):
+                input("按回车关闭虚拟串口...")
+        finally:
+            target.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+import heapq
+import itertools
+import math
+import os
+import threading
+import time
+
+# -------------------- 周期任务 --------------------
+class PeriodicTask:
+    """周期发送任务：按绝对截止时间触发，并记录实际速率与抖动"""
+    def __init__(self, interval, produce, count=0, on_done=None):
+        self.interval = interval  # 发送间隔(秒)
+        self.produce = produce    # 每次触发时调用，返回要发送的bytes（返回空表示本次不发送）
+        self.count = count        # 发送次数上限，0=无限
+        self.on_done = on_done    # 达到次数或produce出错而结束时回调（在调度线程中调用）；cancel()取消的任务不回调
+        self.deadline = 0.0
+        self.cancelled = False
+        self.started = None
+        self.last_fire = None
+        self.fired = 0
+        self.missed = 0           # 因处理不及跳过的周期数
+        self._late_sum = 0.0
+        self._late_sq = 0.0
+        self.max_late = 0.0
+
+    def _record(self, now):
+        """记录一次触发相对截止时间的延迟"""
+        late = now - self.deadline
+        self._late_sum += late
+        self._late_sq += late * late
+        if late > self.max_late:
+            self.max_late = late
+        self.fired += 1
+        self.last_fire = now
+
+    def stats(self):
+        """实际发送速率(Hz)与抖动(ms)：平均延迟、标准差、最大延迟"""
+        n = self.fired
+        if not n:
+            return {"fired": 0, "rate": 0.0, "late_ms": 0.0, "jitter_ms": 0.0, "max_late_ms": 0.0, "missed": 0}
+        mean = self._late_sum / n
+        span = self.last_fire - self.started
+        return {
+            "fired": n,
+            "rate": (n - 1) / span if span > 0 else 0.0,
+            "late_ms": mean * 1000,
+            "jitter_ms": math.sqrt(max(self._late_sq / n - mean * mean, 0.0)) * 1000,
+            "max_late_ms": self.max_late * 1000,
+            "missed": self.missed,
+        }
+
+# -------------------- 集中调度器 --------------------
+class Scheduler:
+    """单线程集中调度所有周期发送：最小堆按绝对截止时间排序，漂移不累积，
+    同一时刻到期的任务合并为一次sink写入"""
+    def __init__(self, sink, spin=None, merge_window=0.0005):
+        self.sink = sink                  # 接收合并后的bytes，如 SerialWriter.write
+        # 提前醒来后忙等的时长：Windows睡眠精度较差默认2ms，其它平台不忙等；
+        # 实际忙等不超过最早到期任务间隔的1/4，避免1ms间隔时调度线程一直空转
+        self.spin = (0.002 if os.name == "nt" else 0.0) if spin is None else spin
+        self.merge_window = merge_window  # 截止时间相差在此范围内的任务视为同一时刻
+        self.merged_writes = 0
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def add(self, task, delay=0.0):
+        """加入任务，delay秒后首次触发"""
+        now = time.perf_counter()
+        task.started = now
+        task.deadline = now + delay
+        with self._cond:
+            heapq.heappush(self._heap, (task.deadline, next(self._seq), task))
+            self._cond.notify()
+        return task
+
+    def cancel(self, task):
+        """取消任务（惰性删除，不打断调度线程）"""
+        task.cancelled = True
+        with self._cond:
+            self._cond.notify()
+
+    def active(self):
+        """当前未取消的任务数"""
+        return sum(1 for _, _, t in self._heap if not t.cancelled)
+
+    def _wait_due(self):
+        """等待到最早截止时间，返回到期任务列表；调度器停止时返回None"""
+        with self._cond:
+            while self._running:
+                while self._heap and self._heap[0][2].cancelled:
+                    heapq.heappop(self._heap)
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                deadline, _, task = self._heap[0]
+                wait = deadline - time.perf_counter() - min(self.spin, task.interval / 4)
+                if wait <= 0:
+                    break
+                self._cond.wait(wait)
+            if not self._running:
+                return None
+            deadline = self._heap[0][0]
+        while time.perf_counter() < deadline:
+            time.sleep(0)  # 忙等时让出GIL，读线程与界面线程不被饿死
+        now = time.perf_counter()
+        due = []
+        with self._cond:
+            while self._heap and self._heap[0][0] <= now + self.merge_window:
+                task = heapq.heappop(self._heap)[2]
+                if not task.cancelled:
+                    due.append(task)
+        return now, due
+
+    def _run(self):
+        """调度线程"""
+        while True:
+            got = self._wait_due()
+            if got is None:
+                return
+            now, due = got
+            payloads = []
+            for task in due:
+                task._record(now)
+                try:
+                    data = task.produce()
+                except Exception:
+                    task.cancelled = True
+                    data = None
+                if data:
+                    payloads.append(data)
+                if task.cancelled or (task.count and task.fired >= task.count):
+                    task.cancelled = True
+                    if task.on_done:
+                        task.on_done()
+                    continue
+                # 下一个绝对截止时间；落后超过一个周期时跳过错过的周期而不是补发
+                nxt = task.deadline + task.interval
+                if nxt < now:
+                    skip = math.ceil((now - nxt) / task.interval)
+                    task.missed += skip
+                    nxt += skip * task.interval
+                task.deadline = nxt
+                with self._cond:
+                    heapq.heappush(self._heap, (nxt, next(self._seq), task))
+            if payloads:
+                self.merged_writes += 1
+                self.sink(payloads[0] if len(payloads) == 1 else b"".join(payloads))
+
+    def stop(self):
+        """停止调度线程"""
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        self._thread.join(1.0)
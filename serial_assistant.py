@@ -1,25 +1,50 @@
+import time
+START_TIME = time.perf_counter()  # 启动计时起点（在导入其它模块之前）
 import tkinter as tk
-from tkinter import colorchooser, messagebox
+from tkinter import messagebox
 import customtkinter as ctk
 import serial
-import serial.tools.list_ports
-import threading
-import time
+import os
+import re
+import sys
+import json
+from collections import namedtuple
 import binascii
+import bisect
+from serial_io import SessionManager, PortWatcher
+from recv_pipeline import CoalescingBuffer, ReceiveLog, Scrollback, TextSpill, HexDumper, StreamDecoder, to_hex
+from scheduler import Scheduler, PeriodicTask
+from capture import CaptureWriter, CaptureReader, CaptureError
+from plot import TelemetryStore, TextExtractor, PlotPanel, spread_times
+from theme import ThemeRegistry
+import metrics
+import tracing
+from params import ParamDef, ParamModel, PARAM, TEXT
+import protocol
 
 ctk.set_appearance_mode("Dark")
 
-# 简化UI线程安全装饰器
-def ui_thread_safe(func):
-    def wrapper(*args, **kwargs):
-        self = args[0]
-        ctrl = self.controller if hasattr(self, 'controller') else self
-        ctrl.after(0, lambda: func(*args, **kwargs))
-    return wrapper
+# 发送队列满时的处理策略（界面名称 -> SerialWriter策略）
+WRITE_POLICIES = {"阻塞等待": "block", "丢弃最旧": "drop_oldest", "丢弃最新": "drop_newest"}
+
+# Text接收模式的分行方式（界面名称 -> 分隔符，None=不分行），以及半行超时(秒)
+LINE_DELIMITERS = {"不分行": None, "\\n": "\n", "\\r\\n": "\r\n"}
+PARTIAL_LINE_TIMEOUT = 0.2
+
+# 接收格式设置快照：在Tk线程中随变量变更整体替换，读线程只读这个普通对象，不跨线程访问Tk变量
+RecvSettings = namedtuple("RecvSettings", "format encoding delimiter protocol plotting plot_regex")
+
+# 接收视图：汇合所有串口的视图名称（其余视图以端口名命名）
+ALL_SESSIONS = "全部"
+
+# 抓包回放倍速（界面名称 -> 倍速，0=尽快）
+REPLAY_SPEEDS = {"1x": 1.0, "10x": 10.0, "100x": 100.0, "最快": 0.0}
 
 class MotorApp(ctk.CTk):
     def __init__(self):
+        self.startup = [("imports", time.perf_counter())]  # 启动各阶段完成时刻
         super().__init__()
+        self.mark("root")
         self.version = "v1.4.1_Final"
         self.title(f"串口助手_极客翔 ({self.version})")
         
@@ -36,24 +61,71 @@ class MotorApp(ctk.CTk):
         self.recv_format = tk.StringVar(value="Text")
         self.send_encoding = tk.StringVar(value="UTF-8")
         self.recv_encoding = tk.StringVar(value="UTF-8")
+        self.recv_delimiter = tk.StringVar(value="不分行")  # 默认与原版一致：收到即显示，需要时再开启分行
+        self.recv_protocol = tk.StringVar(value="DX_RX")
 
         self.baudrate = tk.StringVar(value="9600")
         self.databits = tk.StringVar(value="8")
         self.stopbits = tk.StringVar(value="1")
         self.parity = tk.StringVar(value="N-无校验")
+
+        # 接收刷新帧预算(ms)
+        self.flush_interval = tk.IntVar(value=30)
+
+        # 接收区回滚上限（0=不限制）与完整记录文件
+        self.scrollback_unit = tk.StringVar(value="行")
+        self.scrollback_limit = tk.StringVar(value="20000")
+        self.spill_enabled = tk.BooleanVar(value=False)
+
+        # 发送队列：写超时(秒)与队列满策略
+        self.write_timeout = tk.StringVar(value="1.0")
+        self.write_policy = tk.StringVar(value="阻塞等待")
         
-        # 绑定主题更新
+        # 绑定主题更新（多次变更合并为一次，只应用差异）
+        self.theme = ThemeRegistry(self)
         self.font_size.trace_add("write", lambda *args: self.apply_global_theme())
         self.font_family.trace_add("write", lambda *args: self.apply_global_theme())
         self.text_bg_color.trace_add("write", lambda *args: self.apply_global_theme())
         self.text_fg_color.trace_add("write", lambda *args: self.apply_global_theme())
         self.send_format.trace_add("write", self.on_format_change)
         self.recv_format.trace_add("write", self.on_format_change)
-
-        # 串口相关
-        self.ser = None
-        self.running = False
-        self.receive_thread = None
+        self.write_timeout.trace_add("write", self.apply_writer_settings)
+        self.write_policy.trace_add("write", self.apply_writer_settings)
+
+        # 串口会话：可同时打开多个端口，各自独立的读写线程，接收数据汇合到ConsolePage
+        self.sessions = SessionManager(on_data=lambda *a: self.frames['ConsolePage'].on_session_data(*a))
+        self.view_session = tk.StringVar(value=ALL_SESSIONS)
+        # 自动发送目标的写线程：调度线程只读这个普通属性，由Tk线程在切换视图/开关串口时更新
+        self.tx_writer = None
+        self.view_session.trace_add("write", self.update_tx_target)
+        # 串口枚举在后台线程进行，增删推送到串口下拉框；拔出的串口可在重新插入时自动重连
+        self.auto_reconnect = tk.BooleanVar(value=False)
+        self.port_watcher = PortWatcher(on_change=lambda added, removed: self.after(
+            0, lambda: self.frames['ConsolePage'].on_ports_changed(added, removed)))
+        self.capture = None
+        self.replay = None  # 回放中时为 (Replayer, 虚拟端口, 抓包读取器, 回放目标)
+        self.replay_speed = tk.StringVar(value="1x")
+
+        # 实时曲线：协议模式绘制解码字段，Text模式按正则提取数值
+        self.plot_enabled = tk.BooleanVar(value=False)
+        self.plot_regex = tk.StringVar(value=r"-?\d+(?:\.\d+)?")
+        self.plot_span = tk.StringVar(value="10s")
+        self.telemetry = TelemetryStore()
+        self.recv_settings = None
+        for var in (self.recv_format, self.recv_encoding, self.recv_delimiter, self.recv_protocol,
+                    self.plot_enabled, self.plot_regex):
+            var.trace_add("write", self.update_recv_settings)
+        self.update_recv_settings()
+        # 运行指标：状态栏每秒刷新，可选写出JSON快照供外部采集
+        self.metrics_json = tk.BooleanVar(value=False)
+        # 参数页面反馈区的记录（汇合接收数据与发送回显），页面未构建时也持续记录
+        self.feedback_log = ReceiveLog()
+        self.diagnostics = None
+        # 所有自动发送组件共用的调度器，同一时刻到期的发送合并为一次写入
+        self.scheduler = Scheduler(sink=self.send_scheduled)
+        self.tx_echo = CoalescingBuffer()
+        self.recv_buffer = CoalescingBuffer()
+        self.recv_spill = TextSpill()
 
         # 布局配置
         self.grid_columnconfigure(1, weight=1)
@@ -70,16 +142,53 @@ class MotorApp(ctk.CTk):
         self.container.grid_columnconfigure(0, weight=1)
         self.container.grid_rowconfigure(0, weight=1)
 
-        # 页面切换
-        self.frames = {}
-        for F in (ConsolePage, ParamPage, SettingPage):
-            frame = F(parent=self.container, controller=self)
-            self.frames[F.__name__] = frame
-            frame.grid(row=0, column=0, sticky="nsew")
+        # 状态栏
+        self.status_lbl = ctk.CTkLabel(self, text="", anchor="w", font=("Consolas", 12))
+        self.status_lbl.grid(row=1, column=0, columnspan=2, sticky="ew", padx=10)
+        self.status_note = None  # 状态栏临时提示 (文本, 消失时刻)
+
+        self.mark("layout")
 
+        # 页面切换：页面在首次显示时才构建，启动时只构建串口页面
+        self.pages = {F.__name__: F for F in (ConsolePage, ParamPage, SettingPage)}
+        self.frames = {}
+        # 先登记已有控件（侧边栏等），之后构建的页面与组件自行登记；状态栏保持等宽字体，不跟随主题
+        self.theme.register_tree(self, skip=(self.status_lbl,))
         self.show_frame("ConsolePage")
+        self.mark("console_page")
         self.on_format_change()
+        self.port_watcher.start()
         self.apply_global_theme()
+        self.theme.flush()
+        self.mark("theme")
+        self.on_first_window = None  # 主窗口首次显示后的回调（启动计时报告用）
+        self.bind("<Map>", self.on_first_map, add="+")
+        self.after(self.get_flush_interval(), self.frames['ConsolePage'].flush_recv)
+        metrics.REGISTRY.gauge("ui_pending", lambda: sum(buf.pending() for buf, _ in self.frames['ConsolePage'].views.values()))
+        metrics.REGISTRY.gauge("tx_queue", lambda: sum(s.writer.depth()[1] for s in list(self.sessions.sessions.values()) if s.writer))
+        metrics.REGISTRY.sample()
+        self.after(1000, self.refresh_metrics)
+        self.mark("init")
+
+    def mark(self, phase):
+        """记录启动阶段完成时刻"""
+        self.startup.append((phase, time.perf_counter()))
+
+    def on_first_map(self, event):
+        """主窗口首次显示：记录启动耗时"""
+        if event.widget is not self or self.startup[-1][0] == "first_window":
+            return
+        self.mark("first_window")
+        if self.on_first_window:
+            self.after(0, self.on_first_window)
+
+    def startup_times(self):
+        """启动各阶段耗时(ms)：{阶段: (本阶段耗时, 距进程开始导入的累计时间)}"""
+        out, prev = {}, START_TIME
+        for phase, t in self.startup:
+            out[phase] = ((t - prev) * 1000, (t - START_TIME) * 1000)
+            prev = t
+        return out
 
     def setup_sidebar(self):
         """侧边栏按钮"""
@@ -90,42 +199,233 @@ class MotorApp(ctk.CTk):
                           command=lambda p=page: self.show_frame(p)).pack(pady=20)
 
     def apply_global_theme(self):
-        """应用全局主题"""
-        bg, fg = self.text_bg_color.get(), self.text_fg_color.get()
-        fs, ff = self.font_size.get(), self.font_family.get()
-        
-        def update_recursive(parent):
-            for child in parent.winfo_children():
-                if isinstance(child, ctk.CTkTextbox):
-                    child.configure(fg_color=bg, text_color=fg, font=(ff, fs))
-                elif isinstance(child, tk.Text):
-                    child.configure(bg=bg, fg=fg, font=(ff, fs))
-                elif isinstance(child, ctk.CTkLabel):
-                    child.configure(text_color=fg, font=(ff, fs))
-                elif isinstance(child, ctk.CTkButton):
-                    child.configure(font=(ff, fs))
-                elif isinstance(child, ctk.CTkEntry):
-                    child.configure(fg_color=bg, text_color=fg, font=(ff, fs))
-                elif isinstance(child, ctk.CTkOptionMenu):
-                    child.configure(font=(ff, fs))
-                elif isinstance(child, ctk.CTkRadioButton):
-                    child.configure(font=(ff, fs))
-                if hasattr(child, "preview_tag"):
-                    child.configure(fg_color=bg if child.preview_tag=="bg" else fg)
-                if child.winfo_children():
-                    update_recursive(child)
-        update_recursive(self)
+        """应用全局主题（合并到下一次刷新，只更新变化的部分）"""
+        try:
+            fs = self.font_size.get()
+        except tk.TclError:
+            return
+        self.theme.set(bg=self.text_bg_color.get(), fg=self.text_fg_color.get(),
+                       font=(self.font_family.get(), fs))
 
     def on_format_change(self, *args):
         """格式变更处理"""
         cf = self.frames['ConsolePage']
         cf.send_encoding_opt.configure(state="normal" if self.send_format.get() == "Text" else "disabled")
         cf.recv_encoding_opt.configure(state="normal" if self.recv_format.get() == "Text" else "disabled")
+        cf.recv_delim_opt.configure(state="normal" if self.recv_format.get() == "Text" else "disabled")
+        cf.recv_proto_opt.configure(state="normal" if self.recv_format.get() == "协议" else "disabled")
+
+    def get_page(self, page_name):
+        """取得页面，首次使用时构建并登记主题"""
+        frame = self.frames.get(page_name)
+        if frame is None:
+            frame = self.frames[page_name] = self.pages[page_name](parent=self.container, controller=self)
+            frame.grid(row=0, column=0, sticky="nsew")
+            self.theme.register_tree(frame)
+        return frame
 
     def show_frame(self, page_name):
-        """切换页面"""
-        self.frames[page_name].tkraise()
-        self.apply_global_theme()
+        """切换页面：隐藏页面的文本视图只记游标、曲线停止重绘，显示时再补齐/恢复"""
+        page = self.get_page(page_name)
+        for name, frame in self.frames.items():
+            for view in getattr(frame, "log_views", ()):
+                view.set_visible(name == page_name)
+            if hasattr(frame, "set_visible"):
+                frame.set_visible(name == page_name)
+        page.tkraise()
+
+    def refresh_metrics(self):
+        """每秒采样一次运行指标，刷新状态栏并按需写出JSON快照"""
+        snap = metrics.REGISTRY.sample()
+        self.update_status(snap)
+        if self.capture and self.capture.error:
+            self.stop_capture()
+        if self.metrics_json.get():
+            try:
+                metrics.REGISTRY.write_json("metrics.json", snap)
+            except OSError:
+                self.metrics_json.set(False)
+        self.after(1000, self.refresh_metrics)
+
+    def update_status(self, snap):
+        """刷新状态栏：临时提示（未过期时）+ 指标行"""
+        line = metrics.format_line(snap)
+        if self.status_note and time.monotonic() < self.status_note[1]:
+            line = f"{self.status_note[0]} | {line}"
+        self.status_lbl.configure(text=line)
+
+    def show_status(self, text, seconds=5.0):
+        """在状态栏显示一条提示，seconds秒后随指标刷新消失"""
+        self.status_note = (text, time.monotonic() + seconds)
+        self.update_status(metrics.REGISTRY.last)
+
+    def on_write_error(self, port, e):
+        """发送写线程报告的错误（超时丢弃、写失败），在写线程中调用"""
+        self.after(0, self.show_status, f"[{port}] 发送失败: {e}")
+
+    def open_diagnostics(self):
+        """打开（或前置）延迟诊断面板"""
+        if self.diagnostics is not None and self.diagnostics.winfo_exists():
+            self.diagnostics.focus()
+            return
+        self.diagnostics = DiagnosticsWindow(self)
+        # 汇总表按等宽字体对齐，只跟随颜色
+        box = self.diagnostics.box
+        self.theme.register_tree(self.diagnostics, skip=(box,))
+        self.theme.register(box, ["table"])
+
+    def get_flush_interval(self):
+        """接收刷新间隔(ms)，限制在5-500之间"""
+        try:
+            return min(max(int(self.flush_interval.get()), 5), 500)
+        except (tk.TclError, ValueError):
+            return 30
+
+    def get_scrollback(self):
+        """回滚限制方式与上限，输入无效时视为不限制"""
+        mode = "lines" if self.scrollback_unit.get() == "行" else "bytes"
+        try:
+            return mode, max(int(self.scrollback_limit.get()), 0)
+        except ValueError:
+            return mode, 0
+
+    def toggle_spill(self):
+        """开启/关闭完整接收记录文件"""
+        if self.spill_enabled.get():
+            path = time.strftime("recv_%Y%m%d_%H%M%S.log")
+            try:
+                self.recv_spill.open(path)
+            except OSError as e:
+                self.spill_enabled.set(False)
+                messagebox.showerror("错误", f"无法创建记录文件: {e}")
+                return
+            messagebox.showinfo("成功", f"接收记录写入: {path}")
+        else:
+            self.recv_spill.close()
+
+    def toggle_capture(self):
+        """开始/停止二进制抓包录制（所有串口的原始收发数据，含之后打开的串口）"""
+        btn = self.frames['ConsolePage'].btn_capture
+        if self.capture:
+            self.stop_capture()
+            return
+        path = time.strftime("capture_%Y%m%d_%H%M%S.cap")
+        try:
+            self.capture = CaptureWriter(path)
+        except OSError as e:
+            messagebox.showerror("错误", f"无法创建录制文件: {e}")
+            return
+        self.sessions.set_recorder(self.capture)
+        btn.configure(text="停止录制")
+        messagebox.showinfo("成功", f"正在录制: {path}")
+
+    def stop_capture(self):
+        """停止录制并写出索引，录制文件写入失败时提示"""
+        if self.capture:
+            self.sessions.set_recorder(None)
+            capture, self.capture = self.capture, None
+            self.frames['ConsolePage'].btn_capture.configure(text="开始录制")
+            try:
+                capture.close()
+            except OSError as e:
+                messagebox.showerror("错误", f"录制文件写入失败，录制已中止: {e}")
+
+    def toggle_replay(self):
+        """开始/停止抓包回放：录制的接收数据经虚拟串口进入与真实串口相同的接收管线"""
+        cf = self.frames['ConsolePage']
+        if self.replay:
+            self.stop_replay()
+            return
+        from tkinter import filedialog
+        from replay import Replayer, PtyTarget
+        path = filedialog.askopenfilename(title="选择抓包文件", filetypes=[("抓包", "*.cap"), ("所有文件", "*.*")])
+        if not path:
+            return
+        try:
+            reader = CaptureReader(path)
+        except (OSError, CaptureError) as e:
+            messagebox.showerror("错误", f"抓包文件打开失败: {e}")
+            return
+        # POSIX下用pty对，走与真实串口相同的select读取；其它平台用pyserial的loop://回环
+        target = PtyTarget() if os.name == "posix" else None
+        port = target.port if target else "loop://"
+        session = cf.open_session(port, baudrate=int(self.baudrate.get()))
+        if session is None:
+            reader.close()
+            if target:
+                target.close()
+            return
+        rp = Replayer(reader, target.write if target else session.ser.write,
+                      speed=REPLAY_SPEEDS.get(self.replay_speed.get(), 1.0),
+                      on_done=lambda r: self.after(0, self.on_replay_done, r))
+        self.replay = (rp, port, reader, target)
+        self.view_session.set(port)
+        cf.switch_view()
+        cf.btn_replay.configure(text="停止回放")
+        rp.start_thread()
+
+    def on_replay_done(self, rp):
+        """回放数据已全部写出：保留虚拟串口以便查看，按钮改为结束回放"""
+        if self.replay and self.replay[0] is rp:
+            self.frames['ConsolePage'].btn_replay.configure(text="结束回放")
+
+    def stop_replay(self):
+        """停止回放并关闭虚拟串口"""
+        if not self.replay:
+            return
+        rp, port, reader, target = self.replay
+        self.replay = None
+
+        def release():
+            # 回放线程已退出：此后关闭会话、抓包文件与虚拟串口才不会与其读写冲突
+            self.frames['ConsolePage'].close_session(port)
+            reader.close()
+            if target:
+                target.close()
+
+        rp.stop(on_exit=lambda: self.after(0, release))
+        self.frames['ConsolePage'].btn_replay.configure(text="回放")
+
+    def writer_settings(self):
+        """发送队列设置：(写超时秒数, 策略名)，超时输入无效或不大于0时按1秒"""
+        policy = WRITE_POLICIES.get(self.write_policy.get(), "block")
+        try:
+            timeout = float(self.write_timeout.get())
+        except ValueError:
+            return 1.0, policy
+        return (timeout if timeout > 0 else 1.0), policy
+
+    def apply_writer_settings(self, *args):
+        """运行中修改发送队列设置（作用于所有已打开的会话）"""
+        for session in list(self.sessions.sessions.values()):
+            session.writer.configure(*self.writer_settings())
+
+    def update_recv_settings(self, *args):
+        """接收格式相关变量变更时更新快照（Tk线程）"""
+        self.recv_settings = RecvSettings(self.recv_format.get(), self.recv_encoding.get(),
+                                          LINE_DELIMITERS.get(self.recv_delimiter.get()), self.recv_protocol.get(),
+                                          self.plot_enabled.get(), self.plot_regex.get())
+
+    def update_tx_target(self, *args):
+        """重新确定自动发送的目标写线程（Tk线程：切换查看的串口、打开/关闭串口后调用）"""
+        self.tx_writer = self.writer
+
+    def active_session(self):
+        """发送目标会话：当前查看的串口；查看"全部"时为最先打开的串口"""
+        session = self.sessions.get(self.view_session.get())
+        if session is None and len(self.sessions):
+            session = self.sessions.get(self.sessions.names()[0])
+        return session
+
+    @property
+    def ser(self):
+        session = self.active_session()
+        return session.ser if session else None
+
+    @property
+    def writer(self):
+        session = self.active_session()
+        return session.writer if session else None
 
     def hex_to_bytes(self, hex_str):
         """HEX转字节"""
@@ -135,36 +435,80 @@ class MotorApp(ctk.CTk):
         return binascii.unhexlify(h)
 
     def bytes_to_hex(self, b):
-        """字节转HEX"""
-        return binascii.hexlify(b).upper().decode().replace("", " ").strip()
+        """字节转HEX（每字节以空格分隔）"""
+        return to_hex(b)
 
     def send_raw(self, data):
         """发送原始数据"""
-        if not self.ser or not self.ser.is_open:
+        self.send_bytes(*self.encode_send(data))
+
+    def send_bytes(self, b, txt):
+        """发送已编码的数据并回显"""
+        writer = self.writer
+        if not self.ser or not self.ser.is_open or not writer:
             messagebox.showwarning("提示", "请先打开串口")
             return
         
+        if not writer.write(b):
+            txt = "[发送队列已满，已丢弃] " + txt
+        self.tx_echo.append(txt)
+
+    def encode_send(self, data):
+        """按发送格式编码，返回(字节, 回显文本)"""
         if self.send_format.get() == "Text":
             b = data.encode(self.send_encoding.get(), errors="ignore")
-        else:
-            b = self.hex_to_bytes(data)
-        
-        self.ser.write(b)
-        txt = f"[发送({self.send_encoding.get()})] {data}\n" if self.send_format.get() == "Text" else \
-              f"[发送(HEX)] {self.bytes_to_hex(b)}\n"
-        self._update_textbox(self.frames['ParamPage'].feedback_box, txt)
-
-    @ui_thread_safe
-    def _update_textbox(self, tb, s):
-        """更新文本框"""
+            return b, f"[发送({self.send_encoding.get()})] {data}\n"
+        b = self.hex_to_bytes(data)
+        return b, f"[发送(HEX)] {self.bytes_to_hex(b)}\n"
+
+    def load_protocols(self):
+        """从JSON文件加载协议定义，并刷新各处协议选项"""
+        from tkinter import filedialog
+        path = filedialog.askopenfilename(title="加载协议定义", filetypes=[("JSON", "*.json"), ("所有文件", "*.*")])
+        if not path:
+            return
+        try:
+            names = protocol.load_schemas(path)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            messagebox.showerror("错误", f"协议定义加载失败: {e}")
+            return
+        names_all = list(protocol.SCHEMAS)
+        self.frames['ConsolePage'].recv_proto_opt.configure(values=names_all)
+        param_page = self.frames.get('ParamPage')  # 未构建时新组件创建时自会读取最新协议
+        for w in param_page.plist.widgets() if param_page else ():
+            if isinstance(w, CustomParamComponent):
+                w.proto_opt.configure(values=["文本"] + names_all)
+        messagebox.showinfo("成功", f"已加载协议: {', '.join(names)}")
+
+    def send_scheduled(self, b):
+        """调度器合并后的自动发送数据（调度线程调用，只读普通属性）"""
+        writer = self.tx_writer
+        if writer:
+            writer.write(b)
+
+    def append_text(self, tb, s):
+        """追加文本并按回滚上限批量裁剪最旧内容"""
         tb.insert("end", s)
+        sb = tb.scrollback
+        sb.configure(*self.get_scrollback())
+        drop = sb.add(s)
+        if drop:
+            tb.delete("1.0", f"{drop + 1}.0")
         tb.see("end")
 
+    def clear_textbox(self, tb):
+        """清空文本框及其回滚计数"""
+        tb.delete("1.0", "end")
+        if hasattr(tb, "scrollback"):
+            tb.scrollback.clear()
+
     def clear_all_terminal_text(self):
         """清空所有终端"""
-        self.frames['ConsolePage'].recv_box.delete("1.0", "end")
-        self.frames['ConsolePage'].send_box.delete("1.0", "end")
-        self.frames['ParamPage'].feedback_box.delete("1.0", "end")
+        self.frames['ConsolePage'].clear_recv(all_views=True)
+        self.clear_textbox(self.frames['ConsolePage'].send_box)
+        self.feedback_log.clear()
+        if 'ParamPage' in self.frames:
+            self.frames['ParamPage'].feedback_view.clear()
         messagebox.showinfo("成功", "已清空所有终端")
 
 # ====================== 串口页面（核心修复：移除weight参数） ======================
@@ -178,7 +522,8 @@ class ConsolePage(ctk.CTkFrame):
         cfg_top.pack(fill="x", pady=5)
 
         ctk.CTkLabel(cfg_top, text="串口号：", width=60).pack(side="left", padx=2)
-        self.port_sel = ctk.CTkOptionMenu(cfg_top, values=self.get_serial_ports(), width=100)
+        self.port_sel = ctk.CTkOptionMenu(cfg_top, values=self.get_serial_ports(), width=100,
+                                          command=lambda v: self.update_open_btn())
         self.port_sel.pack(side="left", padx=5)
         ctk.CTkButton(cfg_top, text="刷新", width=60, command=self.refresh_serial_ports).pack(side="left", padx=5)
 
@@ -202,20 +547,43 @@ class ConsolePage(ctk.CTkFrame):
         self.btn_open = ctk.CTkButton(cfg_top, text="打开串口", width=100, command=self.toggle_ser)
         self.btn_open.pack(side="left", padx=10)
 
+        # 会话视图：查看全部串口的汇合数据或单个串口，发送也发往所查看的串口
+        ctk.CTkLabel(cfg_top, text="查看：", width=50).pack(side="left", padx=2)
+        self.view_opt = ctk.CTkOptionMenu(cfg_top, values=[ALL_SESSIONS], variable=controller.view_session,
+                                          width=100, command=lambda v: self.switch_view())
+        self.view_opt.pack(side="left", padx=5)
+
         # 清除按钮
         ctk.CTkButton(cfg_top, text="清除所有终端", width=100, command=controller.clear_all_terminal_text,
                       fg_color="#8e44ad").pack(side="right", padx=5)
         ctk.CTkButton(cfg_top, text="清除接收", width=80,
-                      command=lambda: self.recv_box.delete("1.0", "end")).pack(side="right", padx=5)
+                      command=self.clear_recv).pack(side="right", padx=5)
+        self.btn_capture = ctk.CTkButton(cfg_top, text="开始录制", width=80, command=controller.toggle_capture)
+        self.btn_capture.pack(side="right", padx=5)
+        self.btn_replay = ctk.CTkButton(cfg_top, text="回放", width=70, command=controller.toggle_replay)
+        self.btn_replay.pack(side="right", padx=2)
+        ctk.CTkOptionMenu(cfg_top, values=list(REPLAY_SPEEDS), variable=controller.replay_speed,
+                          width=70).pack(side="right", padx=2)
+
+        # 各视图的待刷新缓冲与接收记录：视图名 -> (CoalescingBuffer, ReceiveLog)；各会话的接收格式化状态
+        self.views = {ALL_SESSIONS: (controller.recv_buffer, ReceiveLog())}
+        self.formatters = {}
+        self._flush_due = None  # 追踪开启时下一次刷新的预定时间
+        self.lost = {}          # 被拔出的已打开串口：适配器标识 -> 端口参数（用于重连）
 
         # 格式编码配置
         cfg_bottom = ctk.CTkFrame(self)
         cfg_bottom.pack(fill="x", pady=5)
         ctk.CTkLabel(cfg_bottom, text="接收格式：", width=80).pack(side="left", padx=5)
-        ctk.CTkOptionMenu(cfg_bottom, values=["Text","HEX"], variable=controller.recv_format, width=80).pack(side="left", padx=2)
+        ctk.CTkOptionMenu(cfg_bottom, values=["Text","HEX","HexDump","协议"], variable=controller.recv_format, width=100).pack(side="left", padx=2)
+        self.recv_proto_opt = ctk.CTkOptionMenu(cfg_bottom, values=list(protocol.SCHEMAS), variable=controller.recv_protocol, width=100)
+        self.recv_proto_opt.pack(side="left", padx=2)
         ctk.CTkLabel(cfg_bottom, text="编码：", width=50).pack(side="left")
         self.recv_encoding_opt = ctk.CTkOptionMenu(cfg_bottom, values=["UTF-8","GBK"], variable=controller.recv_encoding, width=80)
         self.recv_encoding_opt.pack(side="left", padx=5)
+        ctk.CTkLabel(cfg_bottom, text="分行：", width=50).pack(side="left")
+        self.recv_delim_opt = ctk.CTkOptionMenu(cfg_bottom, values=list(LINE_DELIMITERS), variable=controller.recv_delimiter, width=90)
+        self.recv_delim_opt.pack(side="left", padx=5)
 
         ctk.CTkLabel(cfg_bottom, text="发送格式：", width=80).pack(side="left", padx=20)
         ctk.CTkOptionMenu(cfg_bottom, values=["Text","HEX"], variable=controller.send_format, width=80).pack(side="left", padx=2)
@@ -223,6 +591,13 @@ class ConsolePage(ctk.CTkFrame):
         self.send_encoding_opt = ctk.CTkOptionMenu(cfg_bottom, values=["UTF-8","GBK"], variable=controller.send_encoding, width=80)
         self.send_encoding_opt.pack(side="left", padx=5)
 
+        # 接收合并计数（用于调整刷新帧预算）
+        self.merge_lbl = ctk.CTkLabel(cfg_bottom, text="合并: -")
+        self.merge_lbl.pack(side="right", padx=10)
+        self.tx_lbl = ctk.CTkLabel(cfg_bottom, text="发送队列: -")
+        self.tx_lbl.pack(side="right", padx=10)
+        self.after(500, self.refresh_tx_stats)
+
         # ====================== 核心修复：移除weight参数 ======================
         # 原生tkinter.PanedWindow仅保留基础属性，去掉所有无效参数
         self.paned = tk.PanedWindow(self, orient="vertical", sashwidth=10, bg="#333333", bd=0)
@@ -230,7 +605,10 @@ class ConsolePage(ctk.CTkFrame):
 
         # 接收区（仅add，无weight）
         self.recv_box = ctk.CTkTextbox(self.paned)
+        self.recv_box.scrollback = Scrollback()
         self.paned.add(self.recv_box)
+        self.recv_view = LogView(controller, self.recv_box, self.views[ALL_SESSIONS][1])
+        self.log_views = (self.recv_view,)
 
         # 发送区（仅add，无weight）
         send_frame = ctk.CTkFrame(self.paned)
@@ -250,75 +628,320 @@ class ConsolePage(ctk.CTkFrame):
                      ).pack(side="top", pady=5)
 
     def refresh_serial_ports(self):
-        """刷新串口列表"""
+        """刷新串口列表：先显示缓存，同时让后台立即重新枚举（有变化时再推送）"""
         ports = self.get_serial_ports()
         self.port_sel.configure(values=ports)
         if ports:
             self.port_sel.set(ports[0])
+        self.controller.port_watcher.rescan()
 
     def get_serial_ports(self):
-        """获取串口列表"""
-        return [p.device for p in serial.tools.list_ports.comports()] or ["COM1","COM2","COM3"]
+        """获取串口列表（后台枚举的缓存）"""
+        return self.controller.port_watcher.devices() or ["COM1","COM2","COM3"]
+
+    @staticmethod
+    def adapter_key(p):
+        """识别同一适配器：USB设备按VID:PID与序列号（忽略插在哪个USB口），其它按设备名"""
+        if p.hwid and p.hwid != "n/a":
+            return p.hwid.split(" LOCATION=")[0]
+        return p.device
+
+    def on_ports_changed(self, added, removed):
+        """后台枚举结果：更新串口列表；已打开的串口被拔出时关闭会话并记住参数，重新插入时按需重连"""
+        c = self.controller
+        for p in removed:
+            session = c.sessions.get(p.device)
+            if session:
+                self.lost[self.adapter_key(p)] = session.settings
+                self.close_session(p.device)
+                c.recv_buffer.append(f"[系统] {p.device} 已拔出，会话已关闭\n")
+        for p in added:
+            settings = self.lost.pop(self.adapter_key(p), None)
+            if settings is not None and c.auto_reconnect.get() and not c.sessions.get(p.device):
+                if self.open_session(p.device, **settings):
+                    c.recv_buffer.append(f"[系统] {p.device} 已重新插入，已自动重连\n")
+        ports = self.get_serial_ports()
+        self.port_sel.configure(values=ports)
+        if self.port_sel.get() not in ports:
+            self.port_sel.set(ports[0])
+        self.update_open_btn()
 
     def toggle_ser(self):
-        """打开/关闭串口"""
-        if self.controller.ser and self.controller.ser.is_open:
+        """打开/关闭所选串口（其它已打开的串口不受影响）"""
+        c = self.controller
+        port = self.port_sel.get()
+        if c.sessions.get(port):
             # 关闭串口
-            self.controller.running = False
-            self.controller.ser.close()
-            self.btn_open.configure(text="打开串口")
-            messagebox.showinfo("成功", "串口已关闭")
+            self.close_session(port)
+            messagebox.showinfo("成功", f"{port} 已关闭")
+            return
+
+        # 打开串口
+        b = int(c.baudrate.get())
+        d = int(c.databits.get())
+        st = {"1":serial.STOPBITS_ONE, "1.5":serial.STOPBITS_ONE_POINT_FIVE, "2":serial.STOPBITS_TWO}[c.stopbits.get()]
+        parity_str = c.parity.get()[0]
+        p = {"N":serial.PARITY_NONE,"E":serial.PARITY_EVEN,"O":serial.PARITY_ODD}[parity_str]
+        if self.open_session(port, baudrate=b, bytesize=d, stopbits=st, parity=p):
+            messagebox.showinfo("成功", f"{port} 已打开\n{b} 波特 | {d}数据位 | {c.stopbits.get()}停止位 | {c.parity.get()}")
+
+    def open_session(self, port, **settings):
+        """打开一个串口会话并建立其接收视图，失败时提示并返回None"""
+        c = self.controller
+        # 视图先于读线程建立，首批数据即可入缓冲
+        self.views[port] = (CoalescingBuffer(), ReceiveLog())
+        self.formatters[port] = RecvFormatter(c, port)
+        timeout, policy = c.writer_settings()
+        try:
+            session = c.sessions.open(port, timeout, policy, on_error=lambda e: c.on_write_error(port, e), **settings)
+        except (serial.SerialException, ValueError) as e:
+            self.views.pop(port, None)
+            self.formatters.pop(port, None)
+            messagebox.showerror("错误", f"串口打开失败: {e}")
+            return None
+        self.refresh_views()
+        self.update_open_btn()
+        c.update_tx_target()
+        return session
+
+    def close_session(self, port):
+        """关闭串口会话并移除其接收视图"""
+        self.controller.sessions.close(port)
+        self.views.pop(port, None)
+        self.formatters.pop(port, None)
+        self.refresh_views()
+        self.update_open_btn()
+        self.controller.update_tx_target()
+
+    def update_open_btn(self):
+        """按所选串口是否已打开切换按钮文字"""
+        opened = self.controller.sessions.get(self.port_sel.get()) is not None
+        self.btn_open.configure(text="关闭串口" if opened else "打开串口")
+
+    def refresh_views(self):
+        """更新视图选项；所查看的串口已关闭时回到汇合视图"""
+        names = [ALL_SESSIONS] + self.controller.sessions.names()
+        self.view_opt.configure(values=names)
+        if self.controller.view_session.get() not in names:
+            self.controller.view_session.set(ALL_SESSIONS)
+            self.switch_view()
+
+    def switch_view(self):
+        """切换查看的会话：用该视图的接收记录重建接收区"""
+        self.recv_view.attach(self.views[self.controller.view_session.get()][1])
+
+    def clear_recv(self, all_views=False):
+        """清除接收区及当前视图（或全部视图）的接收记录"""
+        for name, (_, log) in self.views.items():
+            if all_views or name == self.controller.view_session.get():
+                log.clear()
+        self.recv_view.clear()
+
+    def refresh_tx_stats(self):
+        """周期刷新发送队列深度与速率"""
+        session = self.controller.active_session()
+        if session:
+            w = session.writer
+            items, pending = w.depth()
+            self.tx_lbl.configure(text=f"{session.port} 发送队列: {items}块/{pending}B | {w.rate() / 1024:.1f}KB/s")
         else:
-            # 打开串口
-            s = self.controller
-            b = int(s.baudrate.get())
-            d = int(s.databits.get())
-            st = {"1":serial.STOPBITS_ONE, "1.5":serial.STOPBITS_ONE_POINT_FIVE, "2":serial.STOPBITS_TWO}[s.stopbits.get()]
-            parity_str = s.parity.get()[0]
-            p = {"N":serial.PARITY_NONE,"E":serial.PARITY_EVEN,"O":serial.PARITY_ODD}[parity_str]
-
-            self.controller.ser = serial.Serial(
-                port=self.port_sel.get(), 
-                baudrate=b, 
-                bytesize=d, 
-                stopbits=st, 
-                parity=p, 
-                timeout=0.1
-            )
-            self.btn_open.configure(text="关闭串口")
-            self.controller.running = True
-            self.controller.receive_thread = threading.Thread(target=self.recv_thread, daemon=True)
-            self.controller.receive_thread.start()
-            messagebox.showinfo("成功", f"串口已打开\n{b} 波特 | {d}数据位 | {s.stopbits.get()}停止位 | {s.parity.get()}")
-
-    def recv_thread(self):
-        """接收线程"""
-        while self.controller.running and self.controller.ser and self.controller.ser.is_open:
-            if self.controller.ser.in_waiting > 0:
-                b = self.controller.ser.read(self.controller.ser.in_waiting)
-                if self.controller.recv_format.get() == "Text":
-                    e = self.controller.recv_encoding.get()
-                    t = b.decode(e, errors="ignore")
-                    head = f"[接收({e})] "
-                else:
-                    t = self.controller.bytes_to_hex(b)
-                    head = "[接收(HEX)] "
-                self._update(head + t + "\n")
-            time.sleep(0.01)
-
-    @ui_thread_safe
-    def _update(self, s):
-        """更新接收显示"""
-        self.recv_box.insert("end", s)
-        self.recv_box.see("end")
-        self.controller.frames['ParamPage'].feedback_box.insert("end", s)
-        self.controller.frames['ParamPage'].feedback_box.see("end")
+            self.tx_lbl.configure(text="发送队列: -")
+        self.after(500, self.refresh_tx_stats)
+
+    def on_session_data(self, session, ts, b):
+        """会话读线程回调：格式化后写入该串口视图，并加时间戳与端口名汇入汇合视图"""
+        port = session.port
+        view, formatter = self.views.get(port), self.formatters.get(port)
+        if view is None or formatter is None:
+            return
+        # 读线程在read返回后直接回调，以此刻作为该块数据的读取时间
+        t0 = time.perf_counter() if tracing.ENABLED else None
+        s = formatter.format(b, ts)
+        if not s:
+            return
+        if t0 is not None:
+            tracing.record_since("rx.format", t0)
+        view[0].append(s)
+        prefix = f"[{time.strftime('%H:%M:%S', time.localtime(ts))}.{int(ts * 1000) % 1000:03d} {port}] "
+        self.controller.recv_buffer.append("".join(prefix + ln for ln in s.splitlines(True)), t0)
+
+    def flush_recv(self):
+        """按帧预算批量刷新接收显示（UI线程周期调用）"""
+        c = self.controller
+        traced = tracing.ENABLED
+        if traced:
+            t_flush = time.perf_counter()
+            if self._flush_due is not None:
+                tracing.record("ui.after_late", max(t_flush - self._flush_due, 0.0))
+        # 接收记录只保留文本框回滚上限能显示的量
+        limits = c.get_scrollback()
+        c.feedback_log.configure(*limits)
+        for name, (buf, log) in list(self.views.items()):
+            s = buf.drain()
+            if not s:
+                continue
+            log.configure(*limits)
+            log.append(s)
+            if name == ALL_SESSIONS:
+                c.recv_spill.write(s)
+                c.feedback_log.append(s)
+                st = buf.stats()
+                self.merge_lbl.configure(text=f"合并: {st['last']}块/帧 (均{st['avg']:.1f} 峰{st['max']})")
+        echo = c.tx_echo.drain()
+        if echo:
+            c.feedback_log.append(echo)
+        # 只有可见的视图插入文本，隐藏页面的视图在切换显示时补齐
+        if traced:
+            stamps = c.recv_buffer.stamps
+            for t in stamps:
+                tracing.record("rx.queue", t_flush - t)
+            t_ins = time.perf_counter()
+        for frame in list(c.frames.values()):
+            for view in getattr(frame, "log_views", ()):
+                view.sync()
+        interval = c.get_flush_interval()
+        if traced:
+            now = time.perf_counter()
+            if stamps:
+                tracing.record("ui.insert", now - t_ins)
+                for t in stamps:
+                    tracing.record("rx.total", now - t)
+            tracing.record("ui.flush", now - t_flush)
+            self._flush_due = now + interval / 1000
+        else:
+            self._flush_due = None
+        self.after(interval, self.flush_recv)
+
+# ====================== 文本视图 ======================
+class LogView:
+    """文本框对接收记录的视图：可见时随刷新追加新内容，隐藏时只保留游标，显示时一次性补齐"""
+    def __init__(self, controller, textbox, log):
+        self.controller = controller
+        self.tb = textbox
+        self.log = log
+        self.cursor = -1    # 首次同步时载入记录中已有的内容（页面可能晚于记录创建）
+        self.visible = True
+
+    def set_visible(self, visible):
+        self.visible = visible
+        self.sync()
+
+    def attach(self, log):
+        """改为显示另一份记录（重建文本框）"""
+        self.log = log
+        self.cursor = -1
+        self.sync()
+
+    def sync(self):
+        """把游标之后的内容一次插入文本框；游标已失效时重建
+
+        积压超过回滚上限时只插入能显示的末尾部分（原有内容反正会被裁掉，直接重建）。
+        """
+        log = self.log
+        if not self.visible or self.cursor == log.end:
+            return
+        text, contiguous = log.since(self.cursor)
+        sb = self.tb.scrollback
+        sb.configure(*self.controller.get_scrollback())
+        text, cut = sb.fit(text)
+        if cut or not contiguous:
+            self.controller.clear_textbox(self.tb)
+        if text:
+            self.controller.append_text(self.tb, text)
+        self.cursor = log.end
+
+    def clear(self):
+        """清空文本框与记录"""
+        self.log.clear()
+        self.controller.clear_textbox(self.tb)
+        self.cursor = self.log.end
+
+# ====================== 接收格式化 ======================
+class RecvFormatter:
+    """单个会话的接收格式化状态（分行解码器/协议解析器/转储偏移），在该会话读线程中使用"""
+    def __init__(self, controller, port=""):
+        self.controller = controller
+        self.port = port
+        self.dumper = HexDumper()
+        self.decoder = None
+        self.parser = None
+        self.extractor = None
+        self.last_plot_ts = None
+
+    def plot(self, ts, columns):
+        """把一批数值送入曲线缓冲（多个串口同时打开时通道名加端口前缀）"""
+        c = self.controller
+        prefix = f"{self.port}:" if len(c.sessions) > 1 else ""
+        for name, vs in columns.items():
+            if len(vs):
+                c.telemetry.extend(prefix + name, spread_times(self.last_plot_ts, ts, len(vs)), vs)
+        self.last_plot_ts = ts
+
+    def plot_lines(self, ts, lines, pattern):
+        """Text模式：按正则从各行提取数值"""
+        if self.extractor is None or self.extractor.regex.pattern != pattern:
+            try:
+                self.extractor = TextExtractor(pattern)
+            except re.error:
+                return
+        self.plot(ts, self.extractor.extract(lines))
+
+    def plot_frames(self, ts, schema, frames):
+        """协议模式：批量解码各数值字段（长度字段除外）"""
+        cols, _ = schema.decode_many(frames)
+        cols.pop(schema.length_field, None)
+        self.plot(ts, cols)
+
+    def format(self, b, ts=None):
+        """按当前接收格式将一批数据格式化为显示文本，b为空表示空闲超时"""
+        cfg = self.controller.recv_settings
+        fmt = cfg.format
+        plotting = ts is not None and cfg.plotting
+        if fmt == "Text":
+            e, delim = cfg.encoding, cfg.delimiter
+            decoder = self.decoder
+            lines = []
+            if decoder is None or decoder.encoding != e or decoder.delimiter != delim:
+                lines = decoder.flush() if decoder else []
+                decoder = self.decoder = StreamDecoder(e, delim)
+            if b:
+                lines += decoder.feed(b)
+            # 迟迟等不到分隔符的半行（如提示符）超时后也显示出来
+            if decoder.stale(PARTIAL_LINE_TIMEOUT):
+                lines += decoder.take_partial()
+            if plotting and lines:
+                self.plot_lines(ts, lines, cfg.plot_regex)
+            return "".join(f"[接收({e})] {ln}\n" for ln in lines)
+        if not b:
+            return ""
+        if fmt == "协议":
+            schema = protocol.SCHEMAS.get(cfg.protocol)
+            if schema is None:
+                return ""
+            if self.parser is None or self.parser.schema is not schema:
+                self.parser = schema.parser()
+            frames = self.parser.feed(b)
+            if plotting and frames:
+                self.plot_frames(ts, schema, frames)
+            return "".join(self.format_frame(schema, f) for f in frames)
+        if fmt == "HEX":
+            return f"[接收(HEX)] {to_hex(b)}\n"
+        return self.dumper.format(b)
+
+    @staticmethod
+    def format_frame(schema, frame):
+        """协议帧显示为字段值，帧长与定义不符时显示HEX"""
+        values = schema.decode(frame)
+        body = schema.format(values) if values is not None else to_hex(frame)
+        return f"[接收({schema.name})] {body}\n"
 
 # ====================== 参数页面 ======================
 class ParamPage(ctk.CTkFrame):
     def __init__(self, parent, controller):
         super().__init__(parent, fg_color="transparent")
         self.controller = controller
+        # 参数表数据模型：组件只是视图，增删参数不创建/销毁控件
+        self.model = ParamModel()
         
         # 工具区
         tools = ctk.CTkFrame(self, width=180)
@@ -326,32 +949,184 @@ class ParamPage(ctk.CTkFrame):
         ctk.CTkLabel(tools, text="组件工厂", font=("KaiTi", 18)).pack(pady=10)
         ctk.CTkButton(tools, text="+ 自定义参数组件", command=self.add_p).pack(pady=10, padx=10)
         ctk.CTkButton(tools, text="+ 纯文本指令组件", command=self.add_t).pack(pady=10, padx=10)
+        ctk.CTkButton(tools, text="加载协议定义", command=controller.load_protocols).pack(pady=10, padx=10)
+        ctk.CTkButton(tools, text="保存参数表", command=self.save_params).pack(pady=10, padx=10)
+        ctk.CTkButton(tools, text="加载参数表", command=self.load_params).pack(pady=10, padx=10)
 
-        # 滚动面板
-        self.scroll = ctk.CTkScrollableFrame(self, label_text="自定义参数控制台")
-        self.scroll.pack(side="top", fill="both", expand=True, padx=5, pady=5)
+        # 参数列表（只为可见条目创建组件，滚动时复用）
+        self.plist = VirtualParamList(self, controller, self.model, label_text="自定义参数控制台")
+        self.plist.pack(side="top", fill="both", expand=True, padx=5, pady=5)
 
         # 反馈区
         mon = ctk.CTkFrame(self)
         mon.pack(side="bottom", fill="x", padx=5, pady=5)
+
+        # 实时曲线（调PID时观察响应）
+        plot_frame = ctk.CTkFrame(self)
+        plot_frame.pack(side="bottom", fill="x", padx=5, pady=5)
+        bar = ctk.CTkFrame(plot_frame, fg_color="transparent")
+        bar.pack(fill="x", padx=5)
+        ctk.CTkCheckBox(bar, text="实时曲线", variable=controller.plot_enabled).pack(side="left", padx=5)
+        ctk.CTkLabel(bar, text="时间窗:").pack(side="left")
+        ctk.CTkOptionMenu(bar, values=["5s", "10s", "30s", "60s"], variable=controller.plot_span, width=70,
+                          command=lambda v: setattr(self.plot, "span", float(v[:-1]))).pack(side="left", padx=5)
+        ctk.CTkLabel(bar, text="文本提取正则:").pack(side="left")
+        ctk.CTkEntry(bar, textvariable=controller.plot_regex, width=220).pack(side="left", padx=5)
+        ctk.CTkButton(bar, text="清除曲线", width=80, command=lambda: self.plot.clear()).pack(side="right", padx=5)
+        self.plot_lbl = ctk.CTkLabel(bar, text="")
+        self.plot_lbl.pack(side="right", padx=10)
+        self.plot = PlotPanel(plot_frame, controller.telemetry, span=10.0, height=220)
+        self.plot.pack(fill="x", padx=5, pady=5)
+        self.visible = False
+        controller.plot_enabled.trace_add("write", lambda *a: self.update_plot_running())
+        self._plot_samples = 0
+        self.after(1000, self.refresh_plot_stats)
         ctk.CTkLabel(mon, text="📥 下位机反馈显示区:", font=("KaiTi",14)).pack(anchor="w", padx=10)
         self.feedback_box = ctk.CTkTextbox(mon, height=150)
+        self.feedback_box.scrollback = Scrollback()
         self.feedback_box.pack(fill="both", expand=True, padx=5, pady=5)
-        ctk.CTkButton(mon, text="清除反馈", width=80, command=lambda: self.feedback_box.delete("1.0","end")).pack(side="right", padx=5)
+        # 反馈区显示汇合接收数据与发送回显
+        self.feedback_view = LogView(controller, self.feedback_box, controller.feedback_log)
+        self.log_views = (self.feedback_view,)
+        ctk.CTkButton(mon, text="清除反馈", width=80, command=self.feedback_view.clear).pack(side="right", padx=5)
+
+    def refresh_plot_stats(self):
+        """每秒刷新曲线采样率与重绘耗时"""
+        n = self.controller.telemetry.samples
+        rate, self._plot_samples = max(n - self._plot_samples, 0), n
+        self.plot_lbl.configure(text=f"{rate}点/s | 重绘{self.plot.draw_ms:.1f}ms")
+        self.after(1000, self.refresh_plot_stats)
+
+    def set_visible(self, visible):
+        """页面显示/隐藏（由show_frame调用）"""
+        self.visible = visible
+        self.update_plot_running()
+
+    def update_plot_running(self):
+        """曲线只在页面可见且开启时定时重绘"""
+        self.plot.set_running(self.visible and self.controller.plot_enabled.get())
 
     def add_p(self):
         """添加参数组件"""
-        CustomParamComponent(self.scroll, self.controller).pack(fill="x", pady=8, padx=5)
+        self.plist.see(self.model.add(ParamDef(PARAM)))
         
     def add_t(self):
         """添加文本指令组件"""
-        TextCmdComponent(self.scroll, self.controller).pack(fill="x", pady=8, padx=5)
+        self.plist.see(self.model.add(ParamDef(TEXT)))
+
+    def remove(self, p):
+        """删除参数（先取消其自动发送任务）"""
+        self.stop_auto(p)
+        self.model.remove(p)
+
+    def save_params(self):
+        """保存参数表为JSON"""
+        from tkinter import filedialog
+        path = filedialog.asksaveasfilename(title="保存参数表", defaultextension=".json",
+                                            filetypes=[("JSON", "*.json"), ("所有文件", "*.*")])
+        if not path:
+            return
+        try:
+            self.model.save(path)
+        except OSError as e:
+            messagebox.showerror("错误", f"参数表保存失败: {e}")
+
+    def load_params(self):
+        """从JSON加载参数表，替换当前全部参数"""
+        from tkinter import filedialog
+        path = filedialog.askopenfilename(title="加载参数表", filetypes=[("JSON", "*.json"), ("所有文件", "*.*")])
+        if not path:
+            return
+        old = list(self.model)
+        try:
+            self.model.load(path)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            messagebox.showerror("错误", f"参数表加载失败: {e}")
+            return
+        for p in old:
+            self.stop_auto(p)
+
+    def send(self, p):
+        """发送参数"""
+        try:
+            b, txt = p.build_send(self.controller.encode_send)
+        except ValueError as e:
+            messagebox.showwarning("警告", f"数据格式错误: {e}")
+            return
+        self.controller.send_bytes(b, txt)
+
+    def send_text(self, p):
+        """发送文本指令"""
+        t = p.text.strip()
+        if not t: 
+            messagebox.showwarning("警告","不能为空")
+            return
+        self.controller.send_raw(t)
+
+    def refresh_payload(self, p):
+        """刷新自动发送缓存的数据（界面线程调用，调度线程只读取缓存）"""
+        p.payload = p.build_send(self.controller.encode_send)
+
+    def start_auto(self, p):
+        """启动自动发送：任务挂在参数上，组件滚出可见区后仍继续发送"""
+        if not self.controller.writer:
+            messagebox.showwarning("提示", "请先打开串口")
+            return
+        itv = max(int(p.interval), 1)
+        tms = int(p.times)
+        try:
+            self.refresh_payload(p)
+        except ValueError as e:
+            messagebox.showwarning("警告", f"数据格式错误: {e}")
+            return
+
+        def emit():
+            # 调度器触发：返回缓存的数据并记录回显
+            if not self.controller.tx_writer:
+                return None
+            b, txt = p.payload
+            self.controller.tx_echo.append(txt)
+            return b
+
+        task = PeriodicTask(itv / 1000, emit, tms, on_done=lambda: self.controller.after(0, lambda: self.stop_auto(p, task)))
+        p.task = self.controller.scheduler.add(task)
+        p.stats = ""
+        self.plist.refresh_item(p)
+
+    def stop_auto(self, p, task=None):
+        """停止自动发送并保留最终统计（task给出时只在其仍是当前任务时停止）"""
+        if task is not None and p.task is not task:
+            return
+        if p.task:
+            self.controller.scheduler.cancel(p.task)
+            self.stats_text(p)
+            p.task = None
+        self.plist.refresh_item(p)
+
+    @staticmethod
+    def stats_text(p):
+        """实际发送速率与抖动"""
+        if p.task:
+            st = p.task.stats()
+            p.stats = f"{st['rate']:.1f}Hz 抖动{st['jitter_ms']:.2f}ms"
+        return p.stats
+
+def set_entry(entry, text):
+    """替换输入框内容（为空时恢复占位提示）"""
+    entry.delete(0, "end")
+    if text:
+        entry.insert(0, text)
 
 class CustomParamComponent(ctk.CTkFrame):
-    def __init__(self, parent, controller):
+    """参数组件：显示并编辑绑定的参数，滚出可见区后解绑，供其它参数复用"""
+    kind = PARAM
+
+    def __init__(self, parent, controller, page):
         super().__init__(parent, border_width=2, border_color="#3498DB", corner_radius=8)
         self.controller = controller
-        self.auto_sending = False
+        self.page = page
+        self.param = None
+        self._stats_job = None
 
         # 第一行：名称和格式
         row1 = ctk.CTkFrame(self, fg_color="transparent")
@@ -361,22 +1136,27 @@ class CustomParamComponent(ctk.CTkFrame):
         self.name_entry.pack(side="left", padx=5)
         
         ctk.CTkLabel(row1, text="协议格式:", width=80).pack(side="left")
-        self.format_entry = ctk.CTkEntry(row1, placeholder_text="如：SPEED={VAL}", width=200)
+        # "文本"为{VAL}文本替换；选择二进制协议时格式填字段赋值，如 cmd=1 x={VAL} grip=0
+        self.proto = ctk.StringVar(value="文本")
+        self.proto_opt = ctk.CTkOptionMenu(row1, values=["文本"] + list(protocol.SCHEMAS), variable=self.proto, width=100,
+                                           command=lambda v: setattr(self.param, "proto", v))
+        self.proto_opt.pack(side="left", padx=5)
+        self.format_entry = ctk.CTkEntry(row1, placeholder_text="如：SPEED={VAL} / cmd=1 x={VAL}", width=200)
         self.format_entry.pack(side="left", padx=5)
         
-        ctk.CTkButton(row1, text="🗑️", width=30, fg_color="#e74c3c", command=self.destroy).pack(side="right", padx=5)
+        ctk.CTkButton(row1, text="🗑️", width=30, fg_color="#e74c3c", command=lambda: self.page.remove(self.param)).pack(side="right", padx=5)
 
         # 第二行：数值范围和滑块
         row2 = ctk.CTkFrame(self, fg_color="transparent")
         row2.pack(fill="x", padx=10, pady=5)
         ctk.CTkLabel(row2, text="数值范围:", width=80).pack(side="left")
-        self.min_entry = ctk.CTkEntry(row2, width=80); self.min_entry.insert(0,"0"); self.min_entry.pack(side="left", padx=2)
+        self.min_entry = ctk.CTkEntry(row2, width=80); self.min_entry.pack(side="left", padx=2)
         ctk.CTkLabel(row2, text="-").pack(side="left")
-        self.max_entry = ctk.CTkEntry(row2, width=80); self.max_entry.insert(0,"100"); self.max_entry.pack(side="left", padx=2)
+        self.max_entry = ctk.CTkEntry(row2, width=80); self.max_entry.pack(side="left", padx=2)
         ctk.CTkButton(row2, text="更新范围", width=80, command=self.update_range).pack(side="left", padx=5)
         self.slider = ctk.CTkSlider(row2, from_=0, to=100, command=self.on_slide)
         self.slider.pack(side="left", fill="x", expand=True, padx=10)
-        self.val_entry = ctk.CTkEntry(row2, width=80); self.val_entry.insert(0,"0.00"); self.val_entry.pack(side="left", padx=5)
+        self.val_entry = ctk.CTkEntry(row2, width=80); self.val_entry.pack(side="left", padx=5)
 
         # 第三行：发送模式
         row3 = ctk.CTkFrame(self, fg_color="transparent")
@@ -385,14 +1165,67 @@ class CustomParamComponent(ctk.CTkFrame):
         ctk.CTkRadioButton(row3, text="手动", variable=self.mode, value="manual", command=self.switch_mode).pack(side="left", padx=10)
         ctk.CTkRadioButton(row3, text="自动", variable=self.mode, value="auto", command=self.switch_mode).pack(side="left", padx=10)
         ctk.CTkLabel(row3, text="间隔(ms):", width=100).pack(side="left")
-        self.interval = ctk.CTkEntry(row3, width=80); self.interval.insert(0,"100"); self.interval.pack(side="left", padx=5)
+        self.interval = ctk.CTkEntry(row3, width=80); self.interval.pack(side="left", padx=5)
         ctk.CTkLabel(row3, text="次数(0=无限):", width=120).pack(side="left")
-        self.times = ctk.CTkEntry(row3, width=80); self.times.insert(0,"0"); self.times.pack(side="left", padx=5)
+        self.times = ctk.CTkEntry(row3, width=80); self.times.pack(side="left", padx=5)
         self.btn_manual = ctk.CTkButton(row3, text="手动发送", width=100, fg_color="#2ecc71", command=self.manual_send)
         self.btn_manual.pack(side="right", padx=5)
         self.btn_auto = ctk.CTkButton(row3, text="启动自动", width=120, fg_color="#f39c12", command=self.toggle_auto)
         self.btn_auto.pack(side="right", padx=5)
         self.btn_auto.configure(state="disabled")
+        self.stat_lbl = ctk.CTkLabel(row3, text="")
+        self.stat_lbl.pack(side="right", padx=5)
+
+        # 输入框内容随输入写回参数（不用textvariable，以保留占位提示）
+        self.entries = {"name": self.name_entry, "fmt": self.format_entry, "lo": self.min_entry, "hi": self.max_entry,
+                        "value": self.val_entry, "interval": self.interval, "times": self.times}
+        for e in self.entries.values():
+            e.bind("<KeyRelease>", self.commit)
+            e.bind("<FocusOut>", self.commit)
+        self.val_entry.bind("<Return>", lambda e: self.param.auto_sending and self.page.refresh_payload(self.param))
+
+    def attach(self, p):
+        """绑定参数并显示其内容"""
+        self.param = p
+        for field, e in self.entries.items():
+            set_entry(e, getattr(p, field))
+        self.proto.set(p.proto)
+        lo, hi = p.bounds
+        self.slider.configure(from_=lo, to=hi)
+        try:
+            self.slider.set(float(p.value))
+        except ValueError:
+            pass
+        self.mode.set(p.mode)
+        self.show_state()
+
+    def detach(self):
+        """解绑参数（写回未提交的输入）"""
+        self.commit()
+        self.param = None
+        if self._stats_job:
+            self.after_cancel(self._stats_job)
+            self._stats_job = None
+
+    def commit(self, event=None):
+        """把输入框内容写回参数"""
+        p = self.param
+        if p is None:
+            return
+        for field, e in self.entries.items():
+            setattr(p, field, e.get())
+
+    def show_state(self):
+        """按参数的发送状态刷新按钮与统计"""
+        p = self.param
+        if p.auto_sending:
+            self.btn_auto.configure(state="normal", text="停止自动", fg_color="#e74c3c")
+        else:
+            self.btn_auto.configure(state="normal" if p.mode == "auto" else "disabled", text="启动自动", fg_color="#f39c12")
+        if self._stats_job:
+            self.after_cancel(self._stats_job)
+            self._stats_job = None
+        self.refresh_stats()
 
     def update_range(self):
         """更新滑块范围"""
@@ -400,65 +1233,58 @@ class CustomParamComponent(ctk.CTkFrame):
         if mi >= ma: 
             messagebox.showwarning("警告","最小值<最大值")
             return
+        self.param.bounds = (mi, ma)
         self.slider.configure(from_=mi, to=ma)
-        self.val_entry.delete(0, "end")
-        self.val_entry.insert(0, f"{self.slider.get():.2f}")
+        set_entry(self.val_entry, f"{self.slider.get():.2f}")
+        self.commit()
 
     def on_slide(self, v):
         """滑块值变更"""
-        self.val_entry.delete(0,"end")
-        self.val_entry.insert(0,f"{v:.2f}")
-        if self.auto_sending: 
-            self.send()
+        set_entry(self.val_entry, f"{v:.2f}")
+        self.commit()
+        if self.param.auto_sending: 
+            self.page.refresh_payload(self.param)
 
     def switch_mode(self):
         """切换发送模式"""
-        if self.mode.get() == "manual":
-            self.auto_sending = False
-            self.btn_auto.configure(state="disabled", text="启动自动")
+        self.param.mode = self.mode.get()
+        if self.param.mode == "manual":
+            self.page.stop_auto(self.param)
         else:
-            self.btn_auto.configure(state="normal")
-
-    def send(self):
-        """发送参数"""
-        fmt = self.format_entry.get() or "{VAL}"
-        val = float(self.val_entry.get())
-        s = fmt.replace("{VAL}", f"{val:.2f}")
-        self.controller.send_raw(f"[{self.name_entry.get() or '参数'}] {s}")
+            self.show_state()
 
     def manual_send(self):
         """手动发送"""
-        self.send()
+        self.commit()
+        self.page.send(self.param)
 
     def toggle_auto(self):
         """启动/停止自动发送"""
-        if not self.auto_sending:
-            itv = int(self.interval.get())
-            tms = int(self.times.get())
-            if itv <10: itv=10
-            self.auto_sending = True
-            self.btn_auto.configure(text="停止自动", fg_color="#e74c3c")
-            threading.Thread(target=self.auto_task, args=(itv, tms), daemon=True).start()
+        self.commit()
+        if self.param.auto_sending:
+            self.page.stop_auto(self.param)
         else:
-            self.auto_sending = False
-            self.btn_auto.configure(text="启动自动", fg_color="#f39c12")
-
-    def auto_task(self, itv, tms):
-        """自动发送任务"""
-        cnt=0
-        while self.auto_sending:
-            self.send()
-            cnt +=1
-            if tms>0 and cnt>=tms:
-                self.auto_sending=False
-                self.controller.after(0, lambda: self.btn_auto.configure(text="启动自动", fg_color="#f39c12"))
-                break
-            time.sleep(itv/1000)
+            self.page.start_auto(self.param)
+
+    def refresh_stats(self):
+        """刷新实际发送速率与抖动（自动发送中每500ms一次）"""
+        self._stats_job = None
+        p = self.param
+        if p is None:
+            return
+        self.stat_lbl.configure(text=self.page.stats_text(p))
+        if p.auto_sending:
+            self._stats_job = self.after(500, self.refresh_stats)
 
 class TextCmdComponent(ctk.CTkFrame):
-    def __init__(self, parent, controller):
+    """文本指令组件：显示并编辑绑定的文本指令，可被其它文本指令复用"""
+    kind = TEXT
+
+    def __init__(self, parent, controller, page):
         super().__init__(parent, border_width=2, border_color="#1F538D", corner_radius=8)
         self.controller = controller
+        self.page = page
+        self.param = None
         
         line = ctk.CTkFrame(self, fg_color="transparent")
         line.pack(fill="x", padx=10, pady=10)
@@ -466,15 +1292,229 @@ class TextCmdComponent(ctk.CTkFrame):
         self.e = ctk.CTkEntry(line, placeholder_text="如：MOTOR_STOP", width=400)
         self.e.pack(side="left", padx=10, fill="x", expand=True)
         ctk.CTkButton(line, text="发送", width=100, fg_color="#2ecc71", command=self.send).pack(side="right", padx=5)
-        ctk.CTkButton(line, text="清空", width=80, command=lambda: self.e.delete(0,"end")).pack(side="right", padx=5)
+        ctk.CTkButton(line, text="清空", width=80, command=self.clear).pack(side="right", padx=5)
+        self.e.bind("<KeyRelease>", self.commit)
+        self.e.bind("<FocusOut>", self.commit)
+
+    def attach(self, p):
+        self.param = p
+        set_entry(self.e, p.text)
+
+    def detach(self):
+        self.commit()
+        self.param = None
+
+    def commit(self, event=None):
+        if self.param is not None:
+            self.param.text = self.e.get()
+
+    def show_state(self):
+        pass
+
+    def clear(self):
+        set_entry(self.e, "")
+        self.commit()
 
     def send(self):
         """发送文本指令"""
-        t = self.e.get().strip()
-        if not t: 
-            messagebox.showwarning("警告","不能为空")
+        self.commit()
+        self.page.send_text(self.param)
+
+class VirtualParamList(ctk.CTkFrame):
+    """参数组件虚拟列表：只为可见区内的参数创建组件，滚出可见区的组件解绑回池，供新进入的参数复用
+
+    每类组件高度固定（取实际需要的高度），条目顶部位置由前缀和得到，滚动时二分查找首个可见条目；
+    增删参数与滚动的控件开销只与可见行数有关，与参数总数无关。
+    """
+    ROW_CLASSES = {PARAM: CustomParamComponent, TEXT: TextCmdComponent}
+    GAP = 16    # 组件间距(像素)
+    UNIT = 40   # 滚轮一格滚动的像素
+
+    def __init__(self, parent, controller, model, label_text=""):
+        super().__init__(parent)
+        self.controller = controller
+        self.page = parent
+        self.model = model
+        self.heights = {PARAM: 150, TEXT: 60}  # 初始估计，按组件实际需要的高度增大
+        self.rows = {}      # 参数 -> 绑定的组件
+        self.pool = {kind: [] for kind in self.ROW_CLASSES}
+        self.created = 0    # 累计创建的组件数
+        self.offset = 0     # 滚动位置(像素)
+        self._tops = [0]
+        self._dirty = True
+        self._job = None
+
+        if label_text:
+            ctk.CTkLabel(self, text=label_text).pack(side="top", fill="x", padx=5, pady=(5, 0))
+        self.scrollbar = ctk.CTkScrollbar(self, command=self.yview)
+        self.scrollbar.pack(side="right", fill="y", padx=(0, 3), pady=3)
+        # 组件直接放在普通Frame上，坐标为实际像素（不经CTk缩放）
+        self.body = tk.Frame(self, highlightthickness=0, bg=self._apply_appearance_mode(self.cget("fg_color")))
+        self.body.pack(side="left", fill="both", expand=True, padx=(5, 0), pady=3)
+        self.body.bind("<Configure>", lambda e: self.schedule())
+        for seq in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.body.bind_all(seq, self.on_wheel, add="+")
+        model.subscribe(self.on_model)
+
+    def on_model(self, event, item):
+        """参数表变更：只回收被删条目的组件，其余在下次布局时按需绑定"""
+        if event == "remove" and item in self.rows:
+            self._release(item)
+        elif event == "reset":
+            for p in list(self.rows):
+                self._release(p)
+            self.offset = 0
+        self._dirty = True
+        self.schedule()
+
+    def schedule(self):
+        if self._job is None:
+            self._job = self.after_idle(self.layout)
+
+    def _rebuild(self):
+        """重算各条目顶部位置（前缀和）"""
+        tops = [0]
+        heights = self.heights
+        for p in self.model.items:
+            tops.append(tops[-1] + heights[p.kind])
+        self._tops = tops
+        self._dirty = False
+
+    def _acquire(self, kind):
+        """从池中取一个组件，池空时新建"""
+        pool = self.pool[kind]
+        if pool:
+            return pool.pop()
+        row = self.ROW_CLASSES[kind](self.body, self.controller, self.page)
+        self.controller.theme.register_tree(row)
+        self.created += 1
+        return row
+
+    def _release(self, p):
+        row = self.rows.pop(p)
+        row.detach()
+        row.place_forget()
+        self.pool[row.kind].append(row)
+
+    def layout(self):
+        """按滚动位置放置可见条目"""
+        if self._job is not None:
+            self.after_cancel(self._job)
+            self._job = None
+        if self._dirty:
+            self._rebuild()
+        tops, items = self._tops, self.model.items
+        view = self.body.winfo_height()
+        total = tops[-1]
+        self.offset = max(0, min(self.offset, total - view))
+        first = max(bisect.bisect_right(tops, self.offset) - 1, 0)
+        last = first
+        while last < len(items) and tops[last] < self.offset + view:
+            last += 1
+        visible = items[first:last]
+        keep = set(visible)
+        for p in [p for p in self.rows if p not in keep]:
+            self._release(p)
+        grew = False
+        for i, p in enumerate(visible, first):
+            row = self.rows.get(p)
+            if row is None:
+                row = self.rows[p] = self._acquire(p.kind)
+                row.attach(p)
+            tk.Frame.place_configure(row, x=0, y=tops[i] - self.offset + self.GAP // 2, relwidth=1)
+            need = row.winfo_reqheight() + self.GAP
+            if need > self.heights[p.kind]:
+                self.heights[p.kind] = need
+                grew = True
+        if total > view:
+            self.scrollbar.set(self.offset / total, (self.offset + view) / total)
+        else:
+            self.scrollbar.set(0, 1)
+        if grew:
+            self._dirty = True
+            self.schedule()
+
+    def yview(self, *args):
+        """滚动条回调：("moveto", 比例) 或 ("scroll", n, "units"/"pages")"""
+        if self._dirty:
+            self._rebuild()
+        if args[0] == "moveto":
+            self.offset = float(args[1]) * self._tops[-1]
+        elif args[0] == "scroll":
+            step = self.body.winfo_height() if args[2] == "pages" else self.UNIT
+            self.offset += int(args[1]) * step
+        self.layout()
+
+    def on_wheel(self, event):
+        if not str(event.widget).startswith(str(self.body)):
             return
-        self.controller.send_raw(t)
+        up = event.num == 4 or event.delta > 0
+        self.yview("scroll", -3 if up else 3, "units")
+
+    def see(self, p):
+        """滚动到使参数可见"""
+        if self._dirty:
+            self._rebuild()
+        i = self.model.index(p)
+        top, bottom = self._tops[i], self._tops[i + 1]
+        view = self.body.winfo_height()
+        if top < self.offset:
+            self.offset = top
+        elif bottom > self.offset + view:
+            self.offset = bottom - view
+        self.schedule()
+
+    def refresh_item(self, p):
+        """参数状态变化时刷新其组件（不可见时无组件，绑定时再显示）"""
+        row = self.rows.get(p)
+        if row is not None:
+            row.show_state()
+
+    def widgets(self):
+        """全部已创建的组件（含池中空闲的）"""
+        return list(self.rows.values()) + [row for pool in self.pool.values() for row in pool]
+
+# ====================== 诊断面板 ======================
+class DiagnosticsWindow(ctk.CTkToplevel):
+    """延迟诊断：开关追踪，每秒刷新各阶段耗时（p50/p99/max），可导出为JSON"""
+    def __init__(self, controller):
+        super().__init__(controller)
+        self.controller = controller
+        self.title("延迟诊断")
+        self.geometry("860x360")
+
+        bar = ctk.CTkFrame(self, fg_color="transparent")
+        bar.pack(fill="x", padx=10, pady=5)
+        self.enabled = tk.BooleanVar(value=tracing.ENABLED)
+        ctk.CTkCheckBox(bar, text="启用延迟追踪", variable=self.enabled,
+                        command=lambda: tracing.enable(self.enabled.get())).pack(side="left", padx=5)
+        ctk.CTkButton(bar, text="导出", width=80, command=self.export).pack(side="right", padx=5)
+        ctk.CTkButton(bar, text="重置", width=80, command=tracing.reset).pack(side="right", padx=5)
+        self.box = ctk.CTkTextbox(self, font=("Consolas", 13))
+        self.box.pack(fill="both", expand=True, padx=10, pady=5)
+        self._job = self.after(0, self.refresh)
+
+    def refresh(self):
+        """每秒刷新汇总表"""
+        self.box.delete("1.0", "end")
+        self.box.insert("end", tracing.format_table() if tracing.snapshot() else "尚无数据（启用追踪并接收数据后显示）")
+        self._job = self.after(1000, self.refresh)
+
+    def export(self):
+        """导出各阶段汇总为JSON"""
+        from tkinter import filedialog
+        path = filedialog.asksaveasfilename(parent=self, title="导出延迟统计", defaultextension=".json",
+                                            filetypes=[("JSON", "*.json"), ("所有文件", "*.*")])
+        if not path:
+            return
+        try:
+            tracing.dump(path)
+        except OSError as e:
+            messagebox.showerror("错误", f"导出失败: {e}", parent=self)
+
+    def destroy(self):
+        self.after_cancel(self._job)
+        super().destroy()
 
 # ====================== 设置页面 ======================
 class SettingPage(ctk.CTkFrame):
@@ -517,6 +1557,41 @@ class SettingPage(ctk.CTkFrame):
         self.slider.pack(side="right", fill="x", expand=True, padx=20)
         self.slider.set(controller.font_size.get())
 
+        # 接收刷新间隔
+        flush_row = ctk.CTkFrame(card, fg_color="transparent")
+        flush_row.pack(fill="x", pady=15, padx=20)
+        ctk.CTkLabel(flush_row, text="接收刷新间隔(ms):", font=("KaiTi",16)).pack(side="left", padx=5)
+        ctk.CTkOptionMenu(flush_row, values=["16","30","50","100"],
+                          variable=controller.flush_interval, width=100).pack(side="left", padx=5)
+        ctk.CTkButton(flush_row, text="重置合并计数", width=120,
+                      command=controller.recv_buffer.reset_stats).pack(side="right", padx=5)
+
+        # 接收区回滚上限
+        sb_row = ctk.CTkFrame(card, fg_color="transparent")
+        sb_row.pack(fill="x", pady=15, padx=20)
+        ctk.CTkLabel(sb_row, text="接收区上限(0=不限):", font=("KaiTi",16)).pack(side="left", padx=5)
+        ctk.CTkEntry(sb_row, textvariable=controller.scrollback_limit, width=100).pack(side="left", padx=5)
+        ctk.CTkOptionMenu(sb_row, values=["行","字节"], variable=controller.scrollback_unit, width=80).pack(side="left", padx=5)
+        ctk.CTkCheckBox(sb_row, text="完整记录到文件", variable=controller.spill_enabled,
+                        command=controller.toggle_spill).pack(side="right", padx=5)
+
+        # 发送队列
+        wr_row = ctk.CTkFrame(card, fg_color="transparent")
+        wr_row.pack(fill="x", pady=15, padx=20)
+        ctk.CTkLabel(wr_row, text="写超时(秒):", font=("KaiTi",16)).pack(side="left", padx=5)
+        ctk.CTkEntry(wr_row, textvariable=controller.write_timeout, width=80).pack(side="left", padx=5)
+        ctk.CTkLabel(wr_row, text="队列满时:", font=("KaiTi",16)).pack(side="left", padx=10)
+        ctk.CTkOptionMenu(wr_row, values=list(WRITE_POLICIES), variable=controller.write_policy,
+                          width=120).pack(side="left", padx=5)
+        ctk.CTkCheckBox(wr_row, text="串口拔出后重新插入时自动重连", variable=controller.auto_reconnect).pack(side="right", padx=5)
+
+        # 运行指标
+        mt_row = ctk.CTkFrame(card, fg_color="transparent")
+        mt_row.pack(fill="x", pady=15, padx=20)
+        ctk.CTkLabel(mt_row, text="运行指标:", font=("KaiTi",16)).pack(side="left", padx=5)
+        ctk.CTkCheckBox(mt_row, text="每秒写出快照 metrics.json", variable=controller.metrics_json).pack(side="left", padx=5)
+        ctk.CTkButton(mt_row, text="延迟诊断面板", width=120, command=controller.open_diagnostics).pack(side="right", padx=5)
+
         # 预设样式
         pre = ctk.CTkFrame(self, fg_color="transparent")
         pre.pack(pady=20)
@@ -528,10 +1603,10 @@ class SettingPage(ctk.CTkFrame):
     def on_font_change(self, v):
         """字体大小变更"""
         self.fs_lbl.configure(text=str(int(v)))
-        self.controller.apply_global_theme()
 
     def set_bg(self):
         """设置背景色"""
+        from tkinter import colorchooser
         c = colorchooser.askcolor(initialcolor=self.controller.text_bg_color.get())[1]
         if c: 
             self.controller.text_bg_color.set(c)
@@ -539,6 +1614,7 @@ class SettingPage(ctk.CTkFrame):
             
     def set_fg(self):
         """设置文字色"""
+        from tkinter import colorchooser
         c = colorchooser.askcolor(initialcolor=self.controller.text_fg_color.get())[1]
         if c: 
             self.controller.text_fg_color.set(c)
@@ -554,10 +1630,20 @@ if __name__ == "__main__":
     
     def on_close():
         """关闭程序"""
-        if app.ser and app.ser.is_open:
-            app.running=False
-            app.ser.close()
+        app.stop_replay()
+        app.stop_capture()
+        app.port_watcher.stop()
+        app.sessions.close_all()
+        app.scheduler.stop()
+        app.recv_spill.close()
         app.destroy()
         
     app.protocol("WM_DELETE_WINDOW", on_close)
+    if "--startup-report" in sys.argv:
+        # 启动计时：主窗口首次显示后输出各阶段耗时(JSON)并退出
+        def report():
+            print(json.dumps({k: {"ms": round(d, 2), "total_ms": round(t, 2)}
+                              for k, (d, t) in app.startup_times().items()}, ensure_ascii=False))
+            on_close()
+        app.on_first_window = report
     app.mainloop()
\ No newline at end of file
@@ -0,0 +1,396 @@
+import os
+import select
+import threading
+import time
+from collections import deque, namedtuple
+import serial
+from capture import RX, TX
+from metrics import RX_BYTES, TX_BYTES
+
+# -------------------- 事件驱动读取 --------------------
+def _select_fd(ser):
+    """POSIX本地串口返回可select的文件描述符，其它情况（Windows、URL端口）返回None"""
+    if os.name != "posix" or not isinstance(ser, serial.Serial):
+        return None
+    try:
+        return ser.fileno()
+    except (AttributeError, serial.SerialException, ValueError):
+        return None
+
+def iter_bursts(ser, alive=None, idle_timeout=0.2, max_read=65536, yield_idle=False):
+    """阻塞等待串口数据，数据一到即整批产出bytes
+
+    Linux等POSIX平台对端口fd做select，无数据时不占CPU、有数据时立即返回；
+    其它平台退化为带超时的阻塞读（依赖串口timeout>0）。
+    idle_timeout 决定多久检查一次 alive()；yield_idle=True 时每次空闲超时产出 b""，
+    便于调用方处理超时逻辑。端口被关闭时静默结束。
+    """
+    fd = _select_fd(ser)
+    while ser.is_open and (alive is None or alive()):
+        try:
+            if fd is not None:
+                ready, _, _ = select.select([fd], [], [], idle_timeout)
+                if not ready:
+                    if yield_idle:
+                        yield b""
+                    continue
+                data = ser.read(min(ser.in_waiting, max_read) or 1)
+            else:
+                data = ser.read(1)
+                if not data:
+                    if yield_idle:
+                        yield b""
+                    continue
+                n = ser.in_waiting
+                if n:
+                    data += ser.read(min(n, max_read))
+        except (OSError, ValueError, TypeError, serial.SerialException):
+            # 其它线程关闭端口时select/read会报错，属于正常退出
+            if not ser.is_open:
+                return
+            raise
+        if data:
+            yield data
+
+# -------------------- 异步批量写入 --------------------
+class SerialWriter:
+    """后台写线程：有界队列缓存待发数据，合并多个小块为一次write，界面线程不再阻塞在串口上
+
+    policy 决定队列满时的行为：
+      block       - 等待至多 write_timeout 秒，仍无空间则丢弃本次数据
+      drop_oldest - 丢弃队列中最旧的数据腾出空间
+      drop_newest - 直接丢弃本次数据
+    """
+    POLICIES = ("block", "drop_oldest", "drop_newest")
+    WRITE_SLICE = 4096  # 合并后的数据分片写出：超时时已写完的分片仍计入发送，只有超时的那一片计为丢弃
+
+    def __init__(self, ser, max_pending=256 * 1024, max_batch=16 * 1024,
+                 write_timeout=1.0, policy="block", on_error=None, on_sent=None):
+        self.ser = ser
+        self.max_pending = max_pending  # 队列最大待发字节数
+        self.max_batch = max_batch      # 单次合并写入的最大字节数
+        self.on_error = on_error
+        self.on_sent = on_sent          # 每次成功写出后在写线程中以实际写出的bytes调用（如抓包录制）
+        self._q = deque()
+        self._pending = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self.sent_bytes = 0
+        self.dropped_bytes = 0
+        self.writes = 0
+        self.write_errors = 0
+        self._rate_sample = (time.monotonic(), 0)
+        self.configure(write_timeout, policy)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def configure(self, write_timeout, policy):
+        """更新写超时与队列满策略（可在运行中调用）
+
+        write_timeout 为None表示一直等待；0会让pyserial变成非阻塞写（可能只写出一部分），不支持。
+        """
+        if policy not in self.POLICIES:
+            raise ValueError(f"未知的队列满策略: {policy}")
+        if write_timeout is not None and write_timeout <= 0:
+            raise ValueError("写超时必须大于0")
+        self.write_timeout = write_timeout
+        self.policy = policy
+        self.ser.write_timeout = write_timeout
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def write(self, data):
+        """将数据放入发送队列（线程安全），数据被丢弃时返回False"""
+        if not data:
+            return True
+        n = len(data)
+        with self._cond:
+            if self._closed:
+                return False
+            if self._pending + n > self.max_pending and self._q:
+                if self.policy == "drop_newest":
+                    self.dropped_bytes += n
+                    return False
+                if self.policy == "drop_oldest":
+                    while self._q and self._pending + n > self.max_pending:
+                        old = self._q.popleft()
+                        self._pending -= len(old)
+                        self.dropped_bytes += len(old)
+                else:
+                    deadline = time.monotonic() + (self.write_timeout or 0)
+                    while self._q and self._pending + n > self.max_pending and not self._closed:
+                        left = deadline - time.monotonic()
+                        if left <= 0:
+                            self.dropped_bytes += n
+                            return False
+                        self._cond.wait(left)
+                    if self._closed:
+                        return False
+            self._q.append(bytes(data))
+            self._pending += n
+            self._cond.notify_all()
+        return True
+
+    def _run(self):
+        """写线程：取出队列中的小块合并写出（单次不超过max_batch）"""
+        while True:
+            with self._cond:
+                while not self._q and not self._closed:
+                    self._cond.wait()
+                if not self._q:
+                    return
+                parts = [self._q.popleft()]
+                size = len(parts[0])
+                while self._q and size + len(self._q[0]) <= self.max_batch:
+                    b = self._q.popleft()
+                    parts.append(b)
+                    size += len(b)
+                self._pending -= size
+                self._cond.notify_all()
+            data = parts[0] if len(parts) == 1 else b"".join(parts)
+            sent, error = 0, None
+            try:
+                while sent < size:
+                    piece = data[sent:sent + self.WRITE_SLICE]
+                    n = self.ser.write(piece)
+                    sent += len(piece) if n is None else n
+                    if n is not None and n < len(piece):
+                        break  # 写被中止（cancel_write），余下数据丢弃
+            except (OSError, ValueError, TypeError, serial.SerialException) as e:
+                # 含SerialTimeoutException：超时的分片中可能已有部分发出，无法得知，按丢弃计
+                if not self.ser.is_open:
+                    return
+                error = e
+            if sent:
+                self.sent_bytes += sent
+                TX_BYTES.add(sent)
+                self.writes += 1
+                if self.on_sent:
+                    self.on_sent(data if sent == size else data[:sent])
+            if sent < size:
+                self.dropped_bytes += size - sent
+            if error is not None:
+                self.write_errors += 1
+                if self.on_error:
+                    self.on_error(error)
+
+    def depth(self):
+        """队列深度：(待发块数, 待发字节数)"""
+        return len(self._q), self._pending
+
+    def rate(self):
+        """距上次调用以来的发送速率(字节/秒)"""
+        now, sent = time.monotonic(), self.sent_bytes
+        t0, s0 = self._rate_sample
+        self._rate_sample = (now, sent)
+        return (sent - s0) / (now - t0) if now > t0 else 0.0
+
+    def close(self, timeout=1.0):
+        """停止写线程，尽量在timeout内发完队列中剩余数据"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+
+# -------------------- 多串口会话 --------------------
+class SerialSession:
+    """单个串口会话：独立的端口参数、读线程与后台写线程
+
+    读线程每收到一批数据调用 on_data(session, 时间戳, bytes)；空闲超时时也以 b"" 调用，
+    便于调用方处理超时逻辑。port 可为设备名或pyserial URL（如 loop://）。
+    """
+    def __init__(self, port, on_data, **settings):
+        self.port = port
+        self.settings = settings  # 传给serial_for_url的端口参数：baudrate/bytesize/stopbits/parity等
+        self.on_data = on_data
+        self.ser = None
+        self.writer = None
+        self.recorder = None      # capture.CaptureWriter，非None时录制本会话的收发数据
+        self.rx_bytes = 0
+        self._alive = False
+        self._thread = None
+
+    @property
+    def is_open(self):
+        return self.ser is not None and self.ser.is_open
+
+    def open(self, write_timeout=1.0, policy="block", on_error=None):
+        """打开端口并启动读写线程"""
+        self.ser = serial.serial_for_url(self.port, timeout=0.1, **self.settings)
+        self.writer = SerialWriter(self.ser, write_timeout=write_timeout, policy=policy,
+                                   on_error=on_error, on_sent=self._record_tx).start()
+        self._alive = True
+        self._thread = threading.Thread(target=self._read, daemon=True, name=f"rx-{self.port}")
+        self._thread.start()
+        return self
+
+    def _read(self):
+        """读线程：每个会话各自阻塞读取，端口之间互不等待"""
+        on_data = self.on_data
+        for b in iter_bursts(self.ser, lambda: self._alive, idle_timeout=0.1, yield_idle=True):
+            self.rx_bytes += len(b)
+            RX_BYTES.add(len(b))
+            rec = self.recorder
+            if rec and b:
+                rec.record(RX, self.port, b)
+            on_data(self, time.time(), b)
+
+    def _record_tx(self, data):
+        rec = self.recorder
+        if rec:
+            rec.record(TX, self.port, data)
+
+    def close(self):
+        """停止读写线程并关闭端口"""
+        self._alive = False
+        if self.writer:
+            self.writer.close()
+        if self.ser:
+            self.ser.close()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(0.5)
+
+class SessionManager:
+    """同时管理多个串口会话，各会话数据通过同一个 on_data 回调汇合"""
+    def __init__(self, on_data):
+        self.on_data = on_data
+        self.sessions = {}  # 端口名 -> SerialSession，按打开顺序
+        self.recorder = None
+        self._lock = threading.Lock()
+
+    def open(self, port, write_timeout=1.0, policy="block", on_error=None, **settings):
+        """打开一个新会话；端口已打开时抛出ValueError"""
+        with self._lock:
+            if port in self.sessions:
+                raise ValueError(f"{port} 已打开")
+            session = SerialSession(port, self.on_data, **settings)
+            session.recorder = self.recorder
+            self.sessions[port] = session
+        try:
+            session.open(write_timeout, policy, on_error)
+        except Exception:
+            with self._lock:
+                del self.sessions[port]
+            raise
+        return session
+
+    def set_recorder(self, recorder):
+        """为所有会话（包括之后打开的）开始/停止录制，recorder为None时停止"""
+        self.recorder = recorder
+        for s in list(self.sessions.values()):
+            s.recorder = recorder
+
+    def close(self, port):
+        """关闭指定会话"""
+        with self._lock:
+            session = self.sessions.pop(port, None)
+        if session:
+            session.close()
+
+    def close_all(self):
+        with self._lock:
+            sessions, self.sessions = list(self.sessions.values()), {}
+        for s in sessions:
+            s.close()
+
+    def get(self, port):
+        return self.sessions.get(port)
+
+    def names(self):
+        return list(self.sessions)
+
+    def __len__(self):
+        return len(self.sessions)
+
+# -------------------- 串口热插拔监视 --------------------
+PortInfo = namedtuple("PortInfo", "device description hwid")
+
+# POSIX下串口设备节点名前缀：只列/dev目录即可发现增删，无需遍历sysfs
+DEV_PREFIXES = ("ttyUSB", "ttyACM", "ttyS", "ttyAMA", "rfcomm", "cu.", "tty.")
+
+def scan_ports():
+    """完整枚举串口（comports()，Linux下会遍历sysfs，较慢）"""
+    import serial.tools.list_ports
+    return {p.device: PortInfo(p.device, p.description, p.hwid) for p in serial.tools.list_ports.comports()}
+
+def dev_fingerprint():
+    """低成本的设备增删指纹：POSIX下为/dev中串口节点名集合，其它平台返回None（每次都完整枚举）"""
+    if os.name != "posix":
+        return None
+    try:
+        return frozenset(n for n in os.listdir("/dev") if n.startswith(DEV_PREFIXES))
+    except OSError:
+        return None
+
+class PortWatcher:
+    """后台线程枚举串口并缓存结果，端口增删时回调 on_change(新增, 移除)（在监视线程中调用）
+
+    每 interval 秒先比对/dev指纹，只有变化（或距上次完整枚举超过 full_interval 秒）时才调用comports()，
+    界面与命令行只读缓存，启动和点击刷新都不会阻塞在枚举上。
+    """
+    def __init__(self, on_change=None, interval=1.0, full_interval=30.0, scan=scan_ports):
+        self.on_change = on_change
+        self.interval = interval
+        self.full_interval = full_interval
+        self.scan = scan
+        self.ports = {}                 # 设备名 -> PortInfo
+        self.ready = threading.Event()  # 首次枚举完成
+        self.scans = 0
+        self._force = True
+        self._wake = threading.Event()
+        self._alive = False
+        self._thread = None
+
+    def start(self):
+        """启动监视线程（已启动时不重复启动）"""
+        if self._thread is not None:
+            return self
+        self._alive = True
+        self._thread = threading.Thread(target=self._run, daemon=True, name="port-watcher")
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._alive = False
+        self._wake.set()
+
+    def rescan(self):
+        """立即完整枚举一次（不等待结果）"""
+        self._force = True
+        self._wake.set()
+
+    def devices(self, wait=None):
+        """缓存的设备名列表；wait 秒内等待首次枚举完成"""
+        if wait:
+            self.ready.wait(wait)
+        return list(self.ports)
+
+    def _run(self):
+        last_fp, last_full = None, 0.0
+        while self._alive:
+            fp = dev_fingerprint()
+            now = time.monotonic()
+            if self._force or fp is None or fp != last_fp or now - last_full > self.full_interval:
+                self._force = False
+                try:
+                    ports = self.scan()
+                except Exception:  # 枚举偶发失败（设备正在插拔）时下轮重试
+                    ports = None
+                if ports is not None:
+                    last_fp, last_full = fp, now
+                    self.scans += 1
+                    self._update(ports)
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def _update(self, ports):
+        old = self.ports
+        added = [p for d, p in ports.items() if d not in old]
+        removed = [p for d, p in old.items() if d not in ports]
+        self.ports = ports
+        first = not self.ready.is_set()
+        self.ready.set()
+        if (added or removed or first) and self.on_change:
+            self.on_change(added, removed)
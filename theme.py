@@ -0,0 +1,108 @@
+import tkinter as tk
+import customtkinter as ctk
+
+# -------------------- 控件类别 --------------------
+# 类别 -> {configure选项: 主题键}；主题键: bg 文本背景色 / fg 文字色 / font (字体, 字号)
+KIND_STYLES = {
+    "textbox": {"fg_color": "bg", "text_color": "fg", "font": "font"},
+    "table":   {"fg_color": "bg", "text_color": "fg"},   # 对齐用等宽字体的文本框，只跟随颜色
+    "text":    {"bg": "bg", "fg": "fg", "font": "font"},
+    "label":   {"text_color": "fg", "font": "font"},
+    "button":  {"font": "font"},
+    "entry":   {"fg_color": "bg", "text_color": "fg", "font": "font"},
+    "option":  {"font": "font"},
+    "radio":   {"font": "font"},
+    "preview_bg": {"fg_color": "bg"},
+    "preview_fg": {"fg_color": "fg"},
+}
+
+def classify(widget):
+    """返回控件需要跟随主题的类别列表（与原递归遍历的判断顺序一致）"""
+    kinds = []
+    if isinstance(widget, ctk.CTkTextbox):
+        kinds.append("textbox")
+    elif isinstance(widget, tk.Text):
+        kinds.append("text")
+    elif isinstance(widget, ctk.CTkLabel):
+        kinds.append("label")
+    elif isinstance(widget, ctk.CTkButton):
+        kinds.append("button")
+    elif isinstance(widget, ctk.CTkEntry):
+        kinds.append("entry")
+    elif isinstance(widget, ctk.CTkOptionMenu):
+        kinds.append("option")
+    elif isinstance(widget, ctk.CTkRadioButton):
+        kinds.append("radio")
+    tag = getattr(widget, "preview_tag", None)
+    if tag:
+        kinds.append("preview_" + tag)
+    return kinds
+
+# -------------------- 主题注册表 --------------------
+class ThemeRegistry:
+    """按类别登记需要跟随主题的控件
+
+    主题变更合并为一次延迟执行，只对受影响类别的控件设置变化了的选项；
+    主题未变时（如切换页面）不做任何事。新登记的控件立即套用当前主题。
+    没有显式注销：参数列表的界面行复用而不销毁，已销毁的控件在下次应用主题时移除。
+    """
+    def __init__(self, root, delay=50):
+        self.root = root
+        self.delay = delay      # 合并窗口(ms)：窗口内的多次变更只应用一次
+        self.widgets = {kind: {} for kind in KIND_STYLES}
+        self.theme = {}         # 目标主题
+        self.applied = {}       # 已应用到控件的主题
+        self.passes = 0
+        self._job = None
+
+    def register(self, widget, kinds=None):
+        """登记控件（kinds缺省时自动判断类别），并立即套用已应用的主题"""
+        for kind in kinds or classify(widget):
+            self.widgets[kind][str(widget)] = widget
+            if self.applied:
+                self._configure(widget, kind, KIND_STYLES[kind], self.applied)
+        return widget
+
+    def register_tree(self, parent, skip=()):
+        """登记parent及其所有子孙控件（仅在创建时遍历一次），skip中的控件及其子孙不登记"""
+        stack = [parent]
+        while stack:
+            w = stack.pop()
+            if w in skip:
+                continue
+            self.register(w)
+            stack.extend(w.winfo_children())
+
+    def set(self, **theme):
+        """更新目标主题，合并窗口结束后统一应用"""
+        self.theme.update(theme)
+        if self._job is None:
+            self._job = self.root.after(self.delay, self.flush)
+
+    def flush(self):
+        """立即应用与已应用主题之间的差异"""
+        self._job = None
+        changed = {k for k, v in self.theme.items() if self.applied.get(k) != v}
+        if not changed:
+            return
+        self.passes += 1
+        for kind, style in KIND_STYLES.items():
+            opts = {opt: key for opt, key in style.items() if key in changed}
+            if not opts:
+                continue
+            widgets = self.widgets[kind]
+            for name, w in list(widgets.items()):
+                if not self._configure(w, kind, opts, self.theme):
+                    del widgets[name]
+        self.applied = dict(self.theme)
+
+    @staticmethod
+    def _configure(widget, kind, opts, theme):
+        """按选项表设置控件，控件已销毁时返回False"""
+        try:
+            if not widget.winfo_exists():
+                return False
+            widget.configure(**{opt: theme[key] for opt, key in opts.items() if key in theme})
+        except tk.TclError:
+            return False
+        return True
@@ -0,0 +1,141 @@
+import json
+import math
+import threading
+import time
+import unicodedata
+
+# 追踪开关：热路径只检查这一个模块属性，关闭时不取时间戳、不记录
+ENABLED = False
+
+# -------------------- 对数分桶直方图 --------------------
+class Histogram:
+    """固定内存的对数分桶直方图（微秒）：每个2的幂区间再等分SUB个子桶，相对误差不超过1/SUB
+
+    覆盖 1us ~ 2^OCTAVES us（约4.6小时），超出范围的值计入两端桶，max 始终精确。
+    """
+    SUB = 8
+    OCTAVES = 34
+
+    def __init__(self):
+        self.counts = [0] * (self.OCTAVES * self.SUB)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def _index(self, us):
+        if us < 1.0:
+            return 0
+        m, e = math.frexp(us)  # us = m * 2**e, 0.5 <= m < 1
+        i = (e - 1) * self.SUB + int((m - 0.5) * 2 * self.SUB)
+        return min(i, len(self.counts) - 1)
+
+    def _upper(self, i):
+        """桶i的上界(微秒)"""
+        e, sub = divmod(i, self.SUB)
+        return 2.0 ** e * (1 + (sub + 1) / self.SUB)
+
+    def record(self, seconds):
+        us = seconds * 1e6
+        i = self._index(us)
+        with self._lock:
+            self.counts[i] += 1
+            self.count += 1
+            self.total += us
+            if us > self.max:
+                self.max = us
+
+    def percentile(self, p):
+        """第p百分位的近似值(微秒)：所在桶的上界，且不超过最大值"""
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(self.count * p / 100))
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return min(self._upper(i), self.max)
+        return self.max
+
+    def summary(self):
+        """{count, mean_ms, p50_ms, p99_ms, max_ms}"""
+        with self._lock:
+            n = self.count
+            return {
+                "count": n,
+                "mean_ms": self.total / n / 1000 if n else 0.0,
+                "p50_ms": self.percentile(50) / 1000,
+                "p99_ms": self.percentile(99) / 1000,
+                "max_ms": self.max / 1000,
+            }
+
+# -------------------- 各阶段耗时 --------------------
+# 阶段说明（界面与导出文件中按此顺序列出）
+STAGES = {
+    "rx.format": "读线程: 解码/协议解析/格式化",
+    "rx.queue": "读线程入缓冲 -> 界面刷新取出",
+    "ui.after_late": "刷新定时器相对预定时间的延迟",
+    "ui.insert": "文本框插入（每次刷新）",
+    "ui.flush": "一次刷新的总耗时",
+    "rx.total": "读到数据 -> 插入文本框完成",
+    "cli.parse": "命令行: 帧解析",
+    "cli.queue": "命令行: 接收队列等待",
+    "cli.print": "命令行: 解码与打印",
+}
+
+_hists = {}
+_hists_lock = threading.Lock()
+
+def enable(on=True):
+    global ENABLED
+    ENABLED = on
+
+def record(stage, seconds):
+    """记录一次阶段耗时（调用方先检查ENABLED）"""
+    h = _hists.get(stage)
+    if h is None:
+        with _hists_lock:
+            h = _hists.setdefault(stage, Histogram())
+    h.record(seconds)
+
+def record_since(stage, t0):
+    """记录从 t0（time.perf_counter()）到现在的耗时"""
+    record(stage, time.perf_counter() - t0)
+
+def reset():
+    with _hists_lock:
+        _hists.clear()
+
+def snapshot():
+    """{阶段: 汇总}，按STAGES顺序，未知阶段排在最后"""
+    order = list(STAGES) + sorted(set(_hists) - set(STAGES))
+    return {name: _hists[name].summary() for name in order if name in _hists}
+
+# 表格各列宽度（终端显示宽度，中文按2列计）：阶段、次数、p50、p99、max
+COLUMNS = (16, 10, 10, 10, 10)
+
+def _width(s):
+    return sum(2 if unicodedata.east_asian_width(ch) in "WF" else 1 for ch in s)
+
+def _row(cells):
+    """按COLUMNS对齐一行：首列左对齐，其余右对齐"""
+    out = []
+    for i, (cell, w) in enumerate(zip(cells, COLUMNS)):
+        pad = " " * max(w - _width(cell), 0)
+        out.append(cell + pad if i == 0 else pad + cell)
+    return "".join(out)
+
+def format_table(snap=None):
+    """文本表格，用于诊断面板与命令行退出时输出"""
+    snap = snapshot() if snap is None else snap
+    lines = [_row(("阶段", "次数", "p50(ms)", "p99(ms)", "max(ms)")) + "  说明"]
+    for name, s in snap.items():
+        lines.append(_row((name, str(s["count"]), f"{s['p50_ms']:.3f}", f"{s['p99_ms']:.3f}", f"{s['max_ms']:.3f}"))
+                     + f"  {STAGES.get(name, '')}")
+    return "\n".join(lines)
+
+def dump(path):
+    """写出JSON：时间与各阶段汇总"""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"time": time.strftime("%Y-%m-%d %H:%M:%S"), "stages": snapshot()},
+                  f, ensure_ascii=False, indent=2)